@@ -0,0 +1,67 @@
+"""Password hashing cost and verification off the event loop.
+
+`PBKDF2PasswordHasher` takes its iteration count from the cost profile in
+settings.PASSWORD_HASH_ITERATIONS. Hashes stored with another count still
+verify, and are rehashed with the current one when their user logs in, so
+changing the profile migrates accounts as they come back.
+
+Async logins check passwords with `averify()` on a pool of
+settings.LOGIN_WORKERS threads. PBKDF2 releases the GIL, so the pool uses
+that many cores while the event loop keeps serving pages. At most
+settings.LOGIN_QUEUE_SIZE more checks wait for a free thread. Beyond that,
+`LoginsOverloaded` is raised at once instead of queueing behind a login
+storm.
+"""
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import cache
+
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+class LoginsOverloaded(Exception):
+    pass
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    @property
+    def iterations(self):
+        return settings.PASSWORD_HASH_ITERATIONS
+
+
+@cache
+def _pool(workers, queue_size):
+    executor = ThreadPoolExecutor(workers, thread_name_prefix='passwords')
+    return executor, threading.BoundedSemaphore(workers + queue_size)
+
+
+async def run(func, *args):
+    """Run `func(*args)` on the password pool, or raise LoginsOverloaded if it is full."""
+    executor, slots = _pool(settings.LOGIN_WORKERS, settings.LOGIN_QUEUE_SIZE)
+    if not slots.acquire(blocking=False):
+        raise LoginsOverloaded
+    try:
+        return await asyncio.get_running_loop().run_in_executor(executor, func, *args)
+    finally:
+        slots.release()
+
+
+def verify(password, encoded):
+    """Return whether `password` matches `encoded`, and its new hash if it is outdated."""
+    rehashed = []
+    valid = hashers.check_password(
+        password, encoded, setter=lambda raw: rehashed.append(hashers.make_password(raw))
+    )
+    return valid, rehashed[0] if rehashed else None
+
+
+async def averify(user, password):
+    """Async `user.check_password(password)`, hashing on the password pool."""
+    valid, rehashed = await run(verify, password, user.password)
+    if rehashed:
+        user.password = rehashed
+        await user.asave(update_fields=['password'])
+    return valid
@@ -1,22 +1,32 @@
+from django.conf import settings
 from django.contrib import messages
-from django.contrib.auth import authenticate, login, logout
+from django.contrib.auth import aauthenticate, alogin, login, logout
 from django.shortcuts import redirect, render
 from django.urls import reverse
 
 from .forms import LoginForm, SignupForm
+from .passwords import LoginsOverloaded
 
 
-def user_login(request):
+async def user_login(request):
     FALLBACK_REDIRECT = 'index'
 
+    request.user = await request.auser()
     if request.user.is_authenticated:
         return redirect(reverse(FALLBACK_REDIRECT))
     if request.method == 'POST':
         if (form := LoginForm(request.POST)).is_valid():
             username = form.cleaned_data['username']
             password = form.cleaned_data['password']
-            if user := authenticate(request, username=username, password=password):
-                login(request, user)
+            try:
+                user = await aauthenticate(request, username=username, password=password)
+            except LoginsOverloaded:
+                messages.error(request, 'Too many people are logging in, try again in a moment')
+                response = render(request, 'accounts/login.html', {'form': form}, status=503)
+                response['Retry-After'] = settings.LOGIN_RETRY_AFTER
+                return response
+            if user:
+                await alogin(request, user)
                 return redirect(request.GET.get('next', reverse(FALLBACK_REDIRECT)))
             else:
                 messages.error(request, 'Incorrect username or password')
@@ -0,0 +1,142 @@
+"""Compare the read views served through ASGI (async ORM) and WSGI.
+
+A throwaway SQLite file is seeded with `manage.py seed`, then the same
+uvicorn build serves the project once through `main.asgi` and once through
+`main.wsgi` (uvicorn's WSGI interface, which runs every request in a thread
+pool like any threaded WSGI server). Each read view is hit by `--concurrency`
+clients with a logged-in session and the table reports throughput and
+latency per path.
+
+uvicorn is not a project dependency, so pull it in for the run:
+
+    uv run --with uvicorn python -m benchmarks.asgi [--users N] [--requests N] [--concurrency N ...]
+"""
+
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from http.client import HTTPConnection
+from pathlib import Path
+
+from benchmarks import common
+
+SERVERS = {
+    'wsgi': ['main.wsgi:application', '--interface', 'wsgi'],
+    'asgi': ['main.asgi:application', '--interface', 'asgi3'],
+}
+
+
+def views(username, echo_pk):
+    return {
+        'echo_list': '/echos/',
+        'echo_detail': f'/echos/{echo_pk}/',
+        'echo_waves': f'/echos/{echo_pk}/waves/',
+        'user_detail': f'/users/{username}/',
+        'user_echos': f'/users/{username}/echos/',
+    }
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def serve(interface, env):
+    port = free_port()
+    command = [sys.executable, '-m', 'uvicorn', *SERVERS[interface], '--port', str(port)]
+    server = subprocess.Popen(
+        [*command, '--log-level', 'warning', '--no-access-log'], cwd=common.BASE_DIR, env=env
+    )
+    try:
+        for _ in range(100):
+            try:
+                HTTPConnection('127.0.0.1', port, timeout=1).request('HEAD', '/')
+                break
+            except OSError:
+                time.sleep(0.1)
+        yield port
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def fetch(port, path, cookie, count):
+    connection = HTTPConnection('127.0.0.1', port)
+    timings = []
+    for _ in range(count):
+        start = time.perf_counter()
+        connection.request('GET', path, headers={'Cookie': cookie})
+        response = connection.getresponse()
+        response.read()
+        if response.status != 200:
+            raise SystemExit(f'GET {path} returned {response.status}')
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def load(port, path, cookie, requests, concurrency):
+    """Return (requests/s, p50 ms, p95 ms) for `requests` GETs by `concurrency` clients."""
+    fetch(port, path, cookie, 5)
+    per_client = max(1, requests // concurrency)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        runs = pool.map(lambda _: fetch(port, path, cookie, per_client), range(concurrency))
+        timings = [timing for run in runs for timing in run]
+    elapsed = time.perf_counter() - start
+    p95 = statistics.quantiles(timings, n=20)[-1] if len(timings) > 1 else timings[0]
+    return len(timings) / elapsed, statistics.median(timings), p95
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--concurrency', type=int, action='append')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        env = {**os.environ, 'TRIBU_DB_PATH': str(Path(directory) / 'bench.sqlite3')}
+        os.environ.update(env)
+        common.setup()
+
+        from django.contrib.auth import get_user_model
+        from django.core.management import call_command
+        from django.test import Client
+
+        from echos.models import Echo
+
+        call_command('migrate', verbosity=0)
+        call_command('seed', users=args.users, stdout=open(os.devnull, 'w'))
+        user = get_user_model().objects.order_by('pk').first()
+        echo = Echo.objects.order_by('-waves_count').first()
+        client = Client()
+        client.force_login(user)
+        cookie = f'sessionid={client.cookies["sessionid"].value}'
+
+        rows = []
+        for interface in SERVERS:
+            with serve(interface, env) as port:
+                for view, path in views(user.username, echo.pk).items():
+                    for concurrency in args.concurrency or [1, 16]:
+                        throughput, p50, p95 = load(port, path, cookie, args.requests, concurrency)
+                        rows.append((
+                            view, interface, concurrency,
+                            f'{throughput:.0f}', f'{p50:.1f}', f'{p95:.1f}',
+                        ))
+
+    rows.sort(key=lambda row: (row[0], row[2], row[1]))
+    print(f'== sqlite: {args.users} seeded users, {args.requests} requests per run')
+    common.print_table(rows, headers=('view', 'path', 'clients', 'req/s', 'p50 ms', 'p95 ms'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""Shared helpers for the benchmark scripts.
+
+Benchmarks run against a throwaway test database (in-memory for SQLite), never
+against `db.sqlite3`. Set `BENCH_POSTGRES=1` plus the usual `PG*` environment
+variables to run them on a local PostgreSQL instead.
+"""
+
+import os
+import statistics
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import django
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+def setup():
+    sys.path.insert(0, str(BASE_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'main.settings')
+
+    from django.conf import settings
+
+    if os.environ.get('BENCH_POSTGRES'):
+        settings.DATABASES['default'] = {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('PGDATABASE', 'tribu'),
+            'USER': os.environ.get('PGUSER', ''),
+            'PASSWORD': os.environ.get('PGPASSWORD', ''),
+            'HOST': os.environ.get('PGHOST', 'localhost'),
+            'PORT': os.environ.get('PGPORT', '5432'),
+        }
+    django.setup()
+
+
+@contextmanager
+def test_database():
+    from django.db import connection
+
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def timeit(func, repeat=20):
+    """Run `func` `repeat` times and return the median duration in milliseconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def seed(users=200, echos_per_user=50, waves_per_echo=10, batch_size=5000):
+    """Insert a synthetic dataset with the `seed` command's generator and return (users, echos).
+
+    Echo and wave counts are averages per user and per echo.
+    """
+    from shared.management.commands.seed import generate
+
+    return generate(users, echos_per_user, waves_per_echo, batch_size=batch_size)
+
+
+def print_table(rows, headers):
+    widths = [max(len(str(cell)) for cell in column) for column in zip(headers, *rows)]
+    for row in (headers, *rows):
+        print('  '.join(str(cell).ljust(width) for cell, width in zip(row, widths)))
@@ -0,0 +1,77 @@
+"""Compare Tribu's main access paths with and without the composite indexes.
+
+    uv run python -m benchmarks.indexes [--users N] [--echos-per-user N] [--waves-per-echo N]
+"""
+
+import argparse
+
+from benchmarks import common
+
+
+def access_paths(user, echo):
+    from echos.models import Echo
+    from users.models import Profile
+    from waves.models import Wave
+
+    return {
+        'feed page': Echo.objects.for_feed().order_by('-created_at', '-pk')[:20],
+        'profile echos': Echo.objects.filter(user=user).order_by('-created_at', '-pk')[:5],
+        'thread page': Wave.objects.filter(echo=echo).order_by('created_at', 'pk')[:20],
+        'latest waves': Wave.objects.filter(echo=echo).order_by('-created_at', '-pk')[:5],
+        'profile lookup': Profile.objects.filter(user__username=user.username),
+    }
+
+
+def measure(user, echo, explain):
+    results = {}
+    for name, queryset in access_paths(user, echo).items():
+        results[name] = common.timeit(lambda: list(queryset.all()))
+        if explain:
+            print(f'--- {name}')
+            print(queryset.explain())
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--echos-per-user', type=int, default=100)
+    parser.add_argument('--waves-per-echo', type=int, default=5)
+    parser.add_argument('--no-explain', dest='explain', action='store_false')
+    args = parser.parse_args()
+
+    common.setup()
+    from echos.models import Echo
+    from waves.models import Wave
+
+    with common.test_database() as connection:
+        users, echos = common.seed(args.users, args.echos_per_user, args.waves_per_echo)
+        user, echo = users[len(users) // 2], echos[len(echos) // 2]
+        indexes = [(model, index) for model in (Echo, Wave) for index in model._meta.indexes]
+
+        with connection.schema_editor() as editor:
+            for model, index in indexes:
+                editor.remove_index(model, index)
+        connection.cursor().execute('ANALYZE')
+        print(f'== {connection.vendor}: without composite indexes')
+        before = measure(user, echo, args.explain)
+
+        with connection.schema_editor() as editor:
+            for model, index in indexes:
+                editor.add_index(model, index)
+        connection.cursor().execute('ANALYZE')
+        print(f'== {connection.vendor}: with composite indexes')
+        after = measure(user, echo, args.explain)
+
+    print()
+    common.print_table(
+        [
+            (name, f'{before[name]:.3f}', f'{after[name]:.3f}', f'{before[name] / after[name]:.1f}x')
+            for name in before
+        ],
+        headers=('access path', 'before ms', 'after ms', 'speedup'),
+    )
+
+
+if __name__ == '__main__':
+    main()
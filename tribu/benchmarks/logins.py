@@ -0,0 +1,124 @@
+"""Logins per second and per core, by hashing cost profile and verification path.
+
+Users are created with passwords hashed under each profile of
+settings.PASSWORD_HASH_PROFILES, then `--logins` logins run with
+`--concurrency` of them in flight, through two paths:
+
+- shared thread: `authenticate()` through sync_to_async, as a sync login view
+  runs under ASGI, every check on the one thread shared by all sync code;
+- password pool: the async backend (users.backends), checks on the
+  `--workers` threads of accounts.passwords.
+
+Meanwhile a page view runs a query through the async ORM (on the shared
+thread) in a loop: the "page ms" column is its median latency during the
+storm.
+
+    uv run python -m benchmarks.logins [--logins N] [--concurrency N] [--workers N]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+from benchmarks import common
+
+PASSWORD = 'correct horse battery staple'
+
+
+async def page_views(timings):
+    from django.contrib.auth import get_user_model
+
+    while True:
+        start = time.perf_counter()
+        await get_user_model().objects.filter(pk=1).aexists()
+        timings.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(0.01)
+
+
+async def login_storm(authenticate, usernames, concurrency):
+    gate = asyncio.Semaphore(concurrency)
+    timings, pages = [], []
+
+    async def login(username):
+        async with gate:
+            start = time.perf_counter()
+            user = await authenticate(username=username, password=PASSWORD)
+            timings.append((time.perf_counter() - start) * 1000)
+            assert user is not None, username
+
+    viewer = asyncio.create_task(page_views(pages))
+    start = time.perf_counter()
+    await asyncio.gather(*(login(username) for username in usernames))
+    elapsed = time.perf_counter() - start
+    viewer.cancel()
+    return elapsed, timings, pages
+
+
+def create_users(prefix, count, iterations):
+    from django.contrib.auth import get_user_model
+    from django.contrib.auth.hashers import make_password
+    from django.test.utils import override_settings
+
+    with override_settings(PASSWORD_HASH_ITERATIONS=iterations):
+        password = make_password(PASSWORD)
+    usernames = [f'{prefix}{i}' for i in range(count)]
+    User = get_user_model()
+    User.objects.bulk_create(User(username=username, password=password) for username in usernames)
+    return usernames
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--logins', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    common.setup()
+    from asgiref.sync import sync_to_async
+    from django.conf import settings
+    from django.contrib.auth import aauthenticate, authenticate
+    from django.test.utils import override_settings
+
+    paths = {
+        'shared thread': (sync_to_async(authenticate), 1),
+        'password pool': (aauthenticate, min(args.workers, os.cpu_count())),
+    }
+    rows = []
+    with common.test_database() as connection:
+        for profile, iterations in settings.PASSWORD_HASH_PROFILES.items():
+            usernames = create_users(profile, args.logins, iterations)
+            for path, (login, cores) in paths.items():
+                with override_settings(
+                    PASSWORD_HASH_ITERATIONS=iterations,
+                    LOGIN_WORKERS=args.workers,
+                    LOGIN_QUEUE_SIZE=args.concurrency,
+                ):
+                    elapsed, timings, pages = asyncio.run(
+                        login_storm(login, usernames, args.concurrency)
+                    )
+                throughput = args.logins / elapsed
+                rows.append(
+                    (
+                        profile,
+                        f'{iterations:,}',
+                        path,
+                        f'{throughput:.1f}',
+                        f'{throughput / cores:.1f}',
+                        f'{statistics.median(timings):.0f}',
+                        f'{statistics.median(pages):.1f}',
+                    )
+                )
+
+    print(
+        f'== {connection.vendor}: {args.logins} logins, {args.concurrency} in flight, '
+        f'{args.workers} pool workers on {os.cpu_count()} cores'
+    )
+    headers = ('profile', 'iterations', 'path', 'logins/s', 'logins/s/core', 'login ms', 'page ms')
+    common.print_table(rows, headers)
+
+
+if __name__ == '__main__':
+    main()
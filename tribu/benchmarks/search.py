@@ -0,0 +1,87 @@
+"""Compare the full-text index with a naive `icontains` scan.
+
+The fixture echos and waves are loaded `--scale` times (100x by default) into
+a throwaway database, then each query is timed through both code paths.
+
+    uv run python -m benchmarks.search [--scale N] [--query TERM ...]
+"""
+
+import argparse
+import json
+
+from benchmarks import common
+
+DEFAULT_QUERIES = ['hospital', 'garden market', 'prof', 'international worker', 'zebra']
+
+
+def load_scaled_fixtures(scale, batch_size=5000):
+    from django.contrib.auth import get_user_model
+
+    from echos.models import Echo
+    from waves.models import Wave
+
+    echo_contents = [row['fields']['content'] for row in fixture('echos.json')]
+    wave_contents = [row['fields']['content'] for row in fixture('waves.json')]
+
+    User = get_user_model()
+    users = User.objects.bulk_create(User(username=f'user{i}') for i in range(10))
+    echos = Echo.objects.bulk_create(
+        (
+            Echo(user=users[i % len(users)], content=content)
+            for _ in range(scale)
+            for i, content in enumerate(echo_contents)
+        ),
+        batch_size=batch_size,
+    )
+    Wave.objects.bulk_create(
+        (
+            Wave(echo=echos[i % len(echos)], user=users[i % len(users)], content=content)
+            for _ in range(scale)
+            for i, content in enumerate(wave_contents)
+        ),
+        batch_size=batch_size,
+    )
+
+
+def fixture(name):
+    with open(common.BASE_DIR / 'fixtures' / name) as file:
+        return json.load(file)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--scale', type=int, default=100)
+    parser.add_argument('--query', action='append', dest='queries')
+    parser.add_argument('--page-size', type=int, default=20)
+    args = parser.parse_args()
+
+    common.setup()
+    from search import engine
+
+    with common.test_database() as connection:
+        load_scaled_fixtures(args.scale)
+        indexed = engine.BACKENDS.get(connection.vendor)
+        if indexed is None:
+            raise SystemExit(f'No full-text index for {connection.vendor}')
+
+        rows = []
+        for kind, (model, fts) in engine.SEARCHABLE.items():
+            for query in args.queries or DEFAULT_QUERIES:
+                terms = engine.tokenize(query)
+                index_ms = common.timeit(
+                    lambda: indexed(model, fts, terms, args.page_size, 0), repeat=10
+                )
+                scan_ms = common.timeit(
+                    lambda: engine.search_icontains(model, fts, terms, args.page_size, 0),
+                    repeat=10,
+                )
+                rows.append(
+                    (kind, query, f'{scan_ms:.2f}', f'{index_ms:.2f}', f'{scan_ms / index_ms:.1f}x')
+                )
+
+    print(f'== {connection.vendor}: fixtures x{args.scale}')
+    common.print_table(rows, headers=('in', 'query', 'icontains ms', 'index ms', 'speedup'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""Session and message storage queries per request, before and after.
+
+A logged-in client browses a seeded throwaway database through the Django
+test client: the feed, a thread, a profile, and adding a wave (which queues a
+flash message, shown on the page it redirects to). The same visits are run
+with each storage profile and the table reports, per request, the queries
+reading and writing `django_session`, all queries, and the time taken.
+
+    uv run python -m benchmarks.sessions [--users N] [--visits N]
+"""
+
+import argparse
+import time
+
+from benchmarks import common
+
+PROFILES = {
+    'database (before)': {
+        'SESSION_ENGINE': 'django.contrib.sessions.backends.db',
+        'MESSAGE_STORAGE': 'django.contrib.messages.storage.fallback.FallbackStorage',
+    },
+    'cached_db': {
+        'SESSION_ENGINE': 'django.contrib.sessions.backends.cached_db',
+        'MESSAGE_STORAGE': 'django.contrib.messages.storage.cookie.CookieStorage',
+    },
+    'signed_cookies': {
+        'SESSION_ENGINE': 'django.contrib.sessions.backends.signed_cookies',
+        'MESSAGE_STORAGE': 'django.contrib.messages.storage.cookie.CookieStorage',
+    },
+}
+
+
+def visit(client, user, echo):
+    """Yield after each request of one visit."""
+    for path in ('/echos/', f'/echos/{echo.pk}/', f'/users/{user.username}/'):
+        yield client.get(path)
+    response = client.post(f'/echos/{echo.pk}/waves/add/', {'content': 'Bench wave'})
+    yield response
+    yield client.get(response.url)
+
+
+def measure(user, echo, visits):
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import CaptureQueriesContext
+
+    client = Client()
+    client.force_login(user)
+    requests = reads = writes = queries = 0
+    start = time.perf_counter()
+    with CaptureQueriesContext(connection) as context:
+        for _ in range(visits):
+            for response in visit(client, user, echo):
+                assert response.status_code in (200, 302), response.status_code
+                requests += 1
+    ms = (time.perf_counter() - start) * 1000
+    for query in context.captured_queries:
+        queries += 1
+        if 'django_session' in query['sql']:
+            if query['sql'].startswith('SELECT'):
+                reads += 1
+            else:
+                writes += 1
+    return requests, reads / requests, writes / requests, queries / requests, ms / requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--visits', type=int, default=50)
+    args = parser.parse_args()
+
+    common.setup()
+    from django.test.utils import override_settings, setup_test_environment
+
+    # Lets the test client reach the 'testserver' host.
+    setup_test_environment()
+    with common.test_database() as connection:
+        users, echos = common.seed(args.users, echos_per_user=5, waves_per_echo=2)
+        user, echo = users[len(users) // 2], echos[len(echos) // 2]
+        rows = []
+        for name, profile in PROFILES.items():
+            with override_settings(**profile):
+                requests, reads, writes, queries, ms = measure(user, echo, args.visits)
+            rows.append(
+                (name, requests, f'{reads:.2f}', f'{writes:.2f}', f'{queries:.1f}', f'{ms:.2f}')
+            )
+
+    print(f'== {connection.vendor}: {args.visits} visits of 5 requests, figures per request')
+    headers = ('profile', 'requests', 'session reads', 'session writes', 'queries', 'ms')
+    common.print_table(rows, headers)
+
+
+if __name__ == '__main__':
+    main()
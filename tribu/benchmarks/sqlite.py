@@ -0,0 +1,162 @@
+"""Mixed read/write load on a SQLite file, with and without the tuning profile.
+
+For each profile (TRIBU_SQLITE_TUNING=0 and 1) a fresh database file is
+migrated and seeded, then `--workers` processes hammer it for `--seconds`:
+each operation is a write with probability `--write-ratio`, otherwise a read.
+Writes go through the same code as the views: adding a wave (with its counter
+signals), adding an echo (with the timeline fan-out) and following a user
+(which reads before writing in one transaction). Reads fetch a feed page and
+a thread page. The table reports throughput, latency and how many operations
+failed with "database is locked".
+
+    uv run python -m benchmarks.sqlite [--workers N] [--seconds N] [--write-ratio F]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+
+from benchmarks import common
+
+PROFILES = {'default': '0', 'tuned': '1'}
+
+
+def init_worker(env):
+    os.environ.update(env)
+    common.setup()
+
+
+def prepare(users):
+    from django.core.management import call_command
+
+    call_command('migrate', verbosity=0)
+    common.seed(users, echos_per_user=20, waves_per_echo=5)
+
+
+def add_wave(rng, user_ids, echo_ids):
+    from django.db import transaction
+
+    from waves.models import Wave
+
+    with transaction.atomic():
+        Wave.objects.create(
+            echo_id=rng.choice(echo_ids), user_id=rng.choice(user_ids), content='Bench wave'
+        )
+
+
+def add_echo(rng, user_ids, echo_ids):
+    from django.db import transaction
+
+    from echos import timeline
+    from echos.models import Echo
+
+    with transaction.atomic():
+        timeline.fan_out(Echo.objects.create(user_id=rng.choice(user_ids), content='Bench echo'))
+
+
+def follow(rng, user_ids, echo_ids):
+    from django.contrib.auth import get_user_model
+    from django.db import transaction
+
+    from echos import timeline
+
+    follower, followed = get_user_model().objects.filter(pk__in=rng.sample(user_ids, 2))
+    with transaction.atomic():
+        timeline.follow(follower, followed)
+
+
+def read(rng, user_ids, echo_ids):
+    from echos.models import Echo
+    from waves.models import Wave
+
+    list(Echo.objects.for_feed()[:20])
+    list(Wave.objects.for_thread().filter(echo_id=rng.choice(echo_ids))[:20])
+
+
+def work(seconds, write_ratio, seed):
+    from django.contrib.auth import get_user_model
+    from django.db import OperationalError
+
+    from echos.models import Echo
+
+    rng = random.Random(seed)
+    user_ids = list(get_user_model().objects.values_list('pk', flat=True))
+    echo_ids = list(Echo.objects.values_list('pk', flat=True))
+    timings = {'read': [], 'write': []}
+    locked = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        kind = 'write' if rng.random() < write_ratio else 'read'
+        operation = rng.choice((add_wave, add_echo, follow)) if kind == 'write' else read
+        start = time.perf_counter()
+        try:
+            operation(rng, user_ids, echo_ids)
+        except OperationalError as error:
+            if 'locked' not in str(error):
+                raise
+            locked += 1
+            continue
+        timings[kind].append((time.perf_counter() - start) * 1000)
+    return timings, locked
+
+
+def p95(timings):
+    return statistics.quantiles(timings, n=20)[-1] if len(timings) > 1 else sum(timings)
+
+
+def run(profile, args):
+    with tempfile.TemporaryDirectory() as directory:
+        env = {
+            'TRIBU_DB_PATH': str(Path(directory) / 'bench.sqlite3'),
+            'TRIBU_SQLITE_TUNING': PROFILES[profile],
+        }
+        context = get_context('spawn')
+        with ProcessPoolExecutor(1, context, init_worker, (env,)) as pool:
+            pool.submit(prepare, args.users).result()
+        with ProcessPoolExecutor(args.workers, context, init_worker, (env,)) as pool:
+            runs = [
+                pool.submit(work, args.seconds, args.write_ratio, seed)
+                for seed in range(args.workers)
+            ]
+            results = [run.result() for run in runs]
+
+    reads = [timing for timings, _ in results for timing in timings['read']]
+    writes = [timing for timings, _ in results for timing in timings['write']]
+    locked = sum(locked for _, locked in results)
+    return (
+        profile,
+        f'{len(reads) / args.seconds:.0f}',
+        f'{len(writes) / args.seconds:.0f}',
+        f'{p95(reads):.1f}',
+        f'{p95(writes):.1f}',
+        locked,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--write-ratio', type=float, default=0.2)
+    args = parser.parse_args()
+
+    rows = [run(profile, args) for profile in PROFILES]
+    print(
+        f'== sqlite: {args.workers} workers for {args.seconds:g}s, '
+        f'{args.write_ratio:.0%} writes'
+    )
+    common.print_table(
+        rows,
+        headers=('profile', 'reads/s', 'writes/s', 'read p95 ms', 'write p95 ms', 'locked'),
+    )
+
+
+if __name__ == '__main__':
+    main()
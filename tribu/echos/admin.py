@@ -1,7 +1,24 @@
 from django.contrib import admin
 
+from shared.admin import ContentAdmin
+from shared.deletion import hide_echos
+from shared.management.commands.recount import count_of
+from waves.models import Wave
+
 from .models import Echo
 
 @admin.register(Echo)
-class EchoAdmin(admin.ModelAdmin):
-    list_display = ('pk', 'content', 'created_at', 'updated_at', 'user')
\ No newline at end of file
+class EchoAdmin(ContentAdmin):
+    list_display = ('pk', 'content_excerpt', 'created_at', 'updated_at', 'user', 'waves_count')
+    list_select_related = ('user',)
+    raw_id_fields = ('user',)
+    search_kind = 'echos'
+    actions = ('recount_waves',)
+    hide = staticmethod(hide_echos)
+
+    @admin.action(permissions=['change'], description='Recount waves of selected echos')
+    def recount_waves(self, request, queryset):
+        updated = Echo.objects.filter(pk__in=queryset.values('pk')).update(
+            waves_count=count_of(Wave, 'echo', 'pk')
+        )
+        self.message_user(request, f'Recounted waves of {updated} echos.')
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:31
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_waves_count(apps, schema_editor):
+    Echo = apps.get_model('echos', 'Echo')
+    Wave = apps.get_model('waves', 'Wave')
+    waves = Wave.objects.filter(echo=OuterRef('pk')).order_by().values('echo')
+    Echo.objects.update(
+        waves_count=Coalesce(Subquery(waves.annotate(c=Count('pk')).values('c')), 0)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('echos', '0001_initial'),
+        ('waves', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='echo',
+            name='waves_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_waves_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:32
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('echos', '0002_echo_waves_count'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='echo',
+            index=models.Index(fields=['-created_at', '-id'], name='echo_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='echo',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='echo_user_created_idx'),
+        ),
+    ]
@@ -1,8 +1,58 @@
 from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.utils import make_template_fragment_key
 from django.db import models
+from django.db.models import Prefetch
 from django.urls import reverse
 
-class Echo(models.Model):
+from shards import directory
+from shards.models import ShardedModel
+
+ECHO_COUNT_CACHE_KEY = 'count'
+
+
+class EchoQuerySet(models.QuerySet):
+    def for_feed(self):
+        return self.select_related('user').only(
+            'content', 'created_at', 'updated_at', 'user__username'
+        )
+
+    def for_detail(self):
+        return self.select_related('user')
+
+    def with_latest_waves(self, limit):
+        from waves.models import Wave
+
+        # A sliced Prefetch is resolved with a window function, so only
+        # `limit` waves per echo are ever fetched.
+        latest = Wave.objects.for_thread().order_by('-created_at', '-pk')[:limit]
+        return (
+            self.for_detail()
+            .prefetch_related(Prefetch('waves', queryset=latest, to_attr='latest_waves'))
+        )
+
+
+class EchoManager(models.Manager.from_queryset(EchoQuerySet)):
+    def get_queryset(self):
+        # Deleted echos are hidden at once and removed later by `manage.py purge`.
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+    def cached_count(self):
+        return caches['echos'].get_or_set(
+            ECHO_COUNT_CACHE_KEY,
+            lambda: directory.count(self.all()),
+            settings.ECHO_COUNT_CACHE_TIMEOUT,
+        )
+
+    async def acached_count(self):
+        cache = caches['echos']
+        if (count := await cache.aget(ECHO_COUNT_CACHE_KEY)) is None:
+            count = await directory.acount(self.all())
+            await cache.aset(ECHO_COUNT_CACHE_KEY, count, settings.ECHO_COUNT_CACHE_TIMEOUT)
+        return count
+
+
+class Echo(ShardedModel):
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -11,12 +61,67 @@ class Echo(models.Model):
         on_delete=models.CASCADE,
         related_name='echos' 
     )
+    waves_count = models.PositiveIntegerField(default=0, editable=False)
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    objects = EchoManager()
+    all_objects = models.Manager.from_queryset(EchoQuerySet)()
 
     def __str__(self):
         return f'Pk: {self.pk}'
     
     def get_absolute_url(self):
         return reverse('echos:echo-detail', kwargs={'echo_pk': self.pk})
+
+    @property
+    def card_cache_key(self):
+        # Must match the {% cache %} tag in echos/echo/card.html
+        return make_template_fragment_key('echo-card', [self.pk, self.updated_at.timestamp()])
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Global feed, keyset paginated on (created_at, pk).
+            models.Index(fields=['-created_at', '-id'], name='echo_feed_idx'),
+            # Echos of a user on profile pages, newest first.
+            models.Index(fields=['user', '-created_at', '-id'], name='echo_user_created_idx'),
+            # Rows waiting for `manage.py purge`, usually none.
+            models.Index(
+                fields=['deleted_at'],
+                name='echo_deleted_idx',
+                condition=models.Q(deleted_at__isnull=False),
+            ),
+        ]
+
+
+
+class TimelineEntry(models.Model):
+    """An echo materialized into a user's home timeline (see echos.timeline)."""
+
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries'
+    )
+    # Without a constraint: the echo may be on another shard (see shards.directory).
+    echo = models.ForeignKey(
+        Echo, on_delete=models.CASCADE, related_name='+', db_constraint=False
+    )
+    # Copied from the echo so pages are read straight from the index below.
+    author = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='+',
+        db_index=False
+    )
+    created_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['owner', 'echo'], name='unique_timeline_entry'),
+        ]
+        indexes = [
+            models.Index(fields=['owner', '-created_at', '-echo'], name='timeline_owner_created_idx'),
+            # Removing an author's echos from a timeline on unfollow.
+            models.Index(fields=['owner', 'author'], name='timeline_owner_author_idx'),
+        ]
@@ -0,0 +1,47 @@
+from django.core.cache import caches
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from users.models import Profile
+
+from .models import ECHO_COUNT_CACHE_KEY, Echo
+
+
+@receiver(post_save, sender=Echo)
+def invalidate_echo_count_on_save(sender, instance, created, **kwargs):
+    if created:
+        caches['echos'].delete(ECHO_COUNT_CACHE_KEY)
+
+
+@receiver(post_delete, sender=Echo)
+def invalidate_echo_count_on_delete(sender, instance, **kwargs):
+    caches['echos'].delete(ECHO_COUNT_CACHE_KEY)
+
+
+@receiver(post_save, sender=Echo)
+def increment_echo_counters(sender, instance, created, raw=False, **kwargs):
+    # Fixtures (raw saves) are recounted in bulk with `manage.py recount`.
+    if created and not raw:
+        Profile.objects.filter(user_id=instance.user_id).update(
+            echos_count=F('echos_count') + 1
+        )
+
+
+@receiver(post_delete, sender=Echo)
+def decrement_echo_counters(sender, instance, **kwargs):
+    Profile.objects.filter(user_id=instance.user_id, echos_count__gt=0).update(
+        echos_count=F('echos_count') - 1
+    )
+
+
+@receiver(pre_save, sender=Echo)
+def invalidate_echo_card_on_edit(sender, instance, raw=False, **kwargs):
+    # updated_at still holds the previous version here (auto_now runs later).
+    if instance.pk and instance.updated_at and not raw:
+        caches['echos'].delete(instance.card_cache_key)
+
+
+@receiver(post_delete, sender=Echo)
+def invalidate_echo_card_on_delete(sender, instance, **kwargs):
+    caches['echos'].delete(instance.card_cache_key)
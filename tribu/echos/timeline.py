@@ -0,0 +1,153 @@
+"""Home timelines.
+
+Each user's home timeline is materialized as a bounded list of
+`TimelineEntry` rows (at most HOME_TIMELINE_LENGTH per user), written when an
+echo is posted (fan-out on write). Authors with more than
+HOME_TIMELINE_FANOUT_LIMIT followers are not fanned out: their echos are
+pulled from `Echo` when a follower reads the timeline (fan-out on read) and
+merged with the materialized entries.
+
+Both sources are read with keyset conditions on (created_at, echo pk), so a
+page costs O(page size) queries and rows however big the follow graph is.
+"""
+
+import heapq
+from itertools import groupby, islice
+
+from django.conf import settings
+from django.db.models import Count, Q, Window
+from django.db.models.functions import RowNumber
+
+from shared.pagination import NEXT, CursorPage, InvalidCursor, decode_cursor, encode_cursor
+from shards import directory
+from users.models import Follow, Profile
+
+from .models import Echo, TimelineEntry
+
+
+def is_pulled(user_id):
+    """Whether the echos of `user_id` are fanned out on read."""
+    followers = (
+        Profile.objects.filter(user_id=user_id).values_list('followers_count', flat=True).first()
+    )
+    return (followers or 0) > settings.HOME_TIMELINE_FANOUT_LIMIT
+
+
+def trim(owner_ids):
+    """Keep only the newest HOME_TIMELINE_LENGTH entries of each owner."""
+    # Counting reads the owner index alone; only owners past the cap need the
+    # window over their entries, and usually there are none.
+    full = list(
+        TimelineEntry.objects.filter(owner_id__in=owner_ids)
+        .values('owner')
+        .annotate(entries=Count('pk'))
+        .filter(entries__gt=settings.HOME_TIMELINE_LENGTH)
+        .values_list('owner', flat=True)
+    )
+    if not full:
+        return
+    overflow = (
+        TimelineEntry.objects.filter(owner_id__in=full)
+        .annotate(
+            position=Window(
+                RowNumber(), partition_by='owner', order_by=('-created_at', '-echo_id')
+            )
+        )
+        .filter(position__gt=settings.HOME_TIMELINE_LENGTH)
+        .values_list('pk', flat=True)
+    )
+    TimelineEntry.objects.filter(pk__in=list(overflow)).delete()
+
+
+def push(echos, owner_ids):
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(
+                owner_id=owner_id, echo=echo, author_id=echo.user_id, created_at=echo.created_at
+            )
+            for owner_id in owner_ids
+            for echo in echos
+        ),
+        ignore_conflicts=True,
+    )
+    trim(owner_ids)
+
+
+def fan_out(echo):
+    """Add a new echo to its author's timeline and, unless pulled, to its followers'."""
+    push([echo], [echo.user_id])
+    if is_pulled(echo.user_id):
+        return
+    followers = (
+        Follow.objects.filter(followed_id=echo.user_id)
+        .values_list('follower_id', flat=True)
+        .iterator(chunk_size=settings.HOME_TIMELINE_FANOUT_BATCH_SIZE)
+    )
+    while batch := list(islice(followers, settings.HOME_TIMELINE_FANOUT_BATCH_SIZE)):
+        push([echo], batch)
+
+
+def follow(follower, followed):
+    """Make `follower` follow `followed` and backfill their recent echos."""
+    _, created = Follow.objects.get_or_create(follower=follower, followed=followed)
+    if created and not is_pulled(followed.pk):
+        latest = directory.for_user(Echo.objects.filter(user=followed), followed.pk)
+        latest = latest.only('created_at', 'user_id')
+        push(list(latest[: settings.HOME_TIMELINE_LENGTH]), [follower.pk])
+    return created
+
+
+def unfollow(follower, followed):
+    # Delete the instance (not the queryset) so the counter signals fire.
+    if relation := Follow.objects.filter(follower=follower, followed=followed).first():
+        relation.delete()
+        TimelineEntry.objects.filter(owner=follower, author=followed).delete()
+
+
+def _before(position, pk_field):
+    created_at, pk = position
+    return Q(created_at__lt=created_at) | Q(created_at=created_at, **{f'{pk_field}__lt': pk})
+
+
+def page(user, cursor=None, page_size=None):
+    """Return a CursorPage of `user`'s home timeline, newest first.
+
+    Timelines are only paged forwards (towards older echos).
+    """
+    page_size = page_size or settings.HOME_TIMELINE_PAGE_SIZE
+    direction, position = decode_cursor(cursor) if cursor else (NEXT, None)
+    if direction != NEXT:
+        raise InvalidCursor(cursor)
+
+    pulled = list(
+        Follow.objects.filter(
+            follower=user,
+            followed__profile__followers_count__gt=settings.HOME_TIMELINE_FANOUT_LIMIT,
+        ).values_list('followed_id', flat=True)
+    )
+
+    entries = (
+        TimelineEntry.objects.filter(owner=user)
+        .exclude(author_id__in=pulled)
+        .order_by('-created_at', '-echo_id')
+    )
+    if position is not None:
+        entries = entries.filter(_before(position, 'echo_id'))
+    sources = [entries.values_list('created_at', 'echo_id')[: page_size + 1]]
+    if pulled:
+        echos = Echo.objects.filter(user_id__in=pulled).order_by('-created_at', '-pk')
+        if position is not None:
+            echos = echos.filter(_before(position, 'pk'))
+        sources += directory.scatter(echos.values_list('created_at', 'pk')[: page_size + 1])
+
+    # groupby() drops the copies of echos being moved between shards.
+    merged = (position for position, _ in groupby(heapq.merge(*sources, reverse=True)))
+    positions = list(islice(merged, page_size + 1))
+    has_next = len(positions) > page_size
+    positions = positions[:page_size]
+
+    echos = directory.in_bulk(Echo.objects.for_feed(), [pk for _, pk in positions])
+    result = CursorPage([echos[pk] for _, pk in positions if pk in echos])
+    if has_next:
+        result.next_cursor = encode_cursor(NEXT, positions[-1])
+    return result
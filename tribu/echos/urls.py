@@ -8,9 +8,11 @@ app_name = 'echos'
 
 urlpatterns = [
     path('', views.echo_list, name='echo-list'),
+    path('home/', views.home, name='home'),
     path('add/', views.add_echo, name='add-echo'),
     path('<int:echo_pk>/', views.echo_detail, name='echo-detail'),
     path('<int:echo_pk>/waves/', views.echo_waves, name='echo-waves'),
+    path('<int:echo_pk>/waves/more/', views.echo_waves_more, name='echo-waves-more'),
     path('<int:echo_pk>/waves/add/', views.add_wave, name='add-wave'),
     path('<int:echo_pk>/delete/', views.delete_echo, name='delete-echo'),
     path('<int:echo_pk>/edit/', views.edit_echo, name='edit-echo'),
@@ -1,39 +1,147 @@
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.http import HttpResponse
-from django.shortcuts import get_object_or_404, render, redirect
+from django.http import HttpResponseBadRequest, StreamingHttpResponse
+from django.shortcuts import render, redirect
+from django.template.loader import render_to_string
 from django.core.exceptions import PermissionDenied
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
 
 from .forms import AddEchoForm
 from .forms import EditEchoForm
 from .forms import AddWaveForm
 
+from . import timeline
 from .models import Echo
 from django.contrib import messages
+from shared.decorators import async_condition, async_login_required, viewer_etag
+from shared.deletion import hide_echos
+from shared.pagination import CursorPaginator, InvalidCursor, MergedCursorPaginator
+from shards import directory
+from waves import live
+from waves.models import Wave
 
-@login_required
-def echo_list(request):
+WAVES_STREAM_PLACEHOLDER = '<!-- waves -->'
+
+@async_login_required
+async def echo_list(request):
+    # Scatter-gather: the newest echos of every shard, merged.
+    paginator = MergedCursorPaginator(
+        directory.scatter(Echo.objects.for_feed()), settings.ECHO_LIST_PAGE_SIZE
+    )
     try:
-        echos = Echo.objects.all()
-    except Echo.DoesNotExist:
-        return HttpResponse('There are no Echos currently!')    
-    return render(request, 'echos/list.html', {'echos': echos})
+        echos = await paginator.apage(request.GET.get('cursor'))
+    except InvalidCursor:
+        return redirect('echos:echo-list')
+    echo_count = await Echo.objects.acached_count()
+    return render(request, 'echos/list.html', {'echos': echos, 'echo_count': echo_count})
 
 @login_required
-def echo_detail(request, echo_pk):
-    echo = get_object_or_404(Echo, pk=echo_pk)
-    return render(request, 'echos/echo/detail.html', {'echo': echo})
+def home(request):
+    # Without a follow graph there is nothing to materialize: use the global feed.
+    if not request.user.following.exists():
+        return redirect('echos:echo-list')
+    try:
+        echos = timeline.page(request.user, request.GET.get('cursor'))
+    except InvalidCursor:
+        return redirect('echos:home')
+    return render(request, 'echos/home.html', {'echos': echos})
+
+async def thread_validators(request, echo_pk):
+    """Validators for the echo detail and waves pages, from one indexed query."""
+    last_wave = Wave.objects.filter(echo=OuterRef('pk')).order_by('-updated_at')
+    echo = await directory.afirst(
+        Echo.objects.filter(pk=echo_pk)
+        .annotate(last_wave=Subquery(last_wave.values('updated_at')[:1]))
+        .values('updated_at', 'waves_count', 'last_wave')
+    )
+    if echo is None:
+        return None, None
+    # No Last-Modified: deleting the latest wave moves this timestamp backwards,
+    # and only waves_count, in the ETag, tells that page apart.
+    last_modified = max(filter(None, (echo['updated_at'], echo['last_wave'])))
+    etag = viewer_etag(
+        request, request.path, request.GET.urlencode(), echo['waves_count'], last_modified
+    )
+    return etag, None
+
+@async_login_required
+@async_condition(thread_validators)
+async def echo_detail(request, echo_pk):
+    echos = Echo.objects.with_latest_waves(settings.ECHO_DETAIL_WAVES_LIMIT)
+    echo = await directory.aget_object_or_404(echos, pk=echo_pk)
+    live_waves_url = live.live_waves_url(echo.pk)
+    return render(
+        request, 'echos/echo/detail.html', {'echo': echo, 'live_waves_url': live_waves_url}
+    )
+
+@async_login_required
+@async_condition(thread_validators)
+async def echo_waves(request, echo_pk):
+    echo = await directory.aget_object_or_404(Echo.objects.for_detail(), pk=echo_pk)
+    if 'stream' in request.GET:
+        # An async stream: ASGI sends each chunk as soon as it is rendered.
+        return StreamingHttpResponse(stream_echo_waves(request, echo))
+    try:
+        waves = await echo_waves_paginator(echo).apage(request.GET.get('cursor'))
+    except InvalidCursor:
+        return redirect('echos:echo-waves', echo_pk=echo.pk)
+    live_waves_url = live.live_waves_url(echo.pk)
+    return render(
+        request,
+        'echos/echo/detail-waves.html',
+        {'echo': echo, 'waves': waves, 'live_waves_url': live_waves_url},
+    )
 
 @login_required
-def echo_waves(request, echo_pk):
-    echo = get_object_or_404(Echo, pk=echo_pk)
-    return render(request, 'echos/echo/detail-waves.html', {'echo': echo})
+def echo_waves_more(request, echo_pk):
+    echo = directory.get_object_or_404(Echo.objects.only('pk'), pk=echo_pk)
+    try:
+        waves = echo_waves_paginator(echo).page(request.GET.get('cursor'))
+    except InvalidCursor:
+        return HttpResponseBadRequest('Invalid cursor')
+    return render(request, 'echos/echo/waves-page.html', {'echo': echo, 'waves': waves})
+
+def echo_waves_paginator(echo):
+    waves = echo.waves.for_thread()
+    return CursorPaginator(waves, settings.ECHO_WAVES_PAGE_SIZE, descending=False)
+
+async def stream_echo_waves(request, echo):
+    page = render_to_string(
+        'echos/echo/detail-waves.html', {'echo': echo, 'streaming': True}, request
+    )
+    head, tail = page.split(WAVES_STREAM_PLACEHOLDER)
+    yield head
+
+    waves = echo.waves.for_thread().order_by('created_at', 'pk')
+    chunk_size = settings.ECHO_WAVES_STREAM_CHUNK_SIZE
+    chunk = []
+    empty = True
+    async for wave in waves.aiterator(chunk_size=chunk_size):
+        chunk.append(wave)
+        if len(chunk) == chunk_size:
+            yield render_to_string(
+                'echos/echo/waves-page.html', {'echo': echo, 'waves': chunk}, request
+            )
+            chunk, empty = [], False
+    if chunk:
+        yield render_to_string(
+            'echos/echo/waves-page.html', {'echo': echo, 'waves': chunk}, request
+        )
+    elif empty:
+        yield '<p>No waves yet</p>'
+    yield tail
 
 @login_required
 def add_echo(request):
     if request.method == 'POST':
         form = AddEchoForm(request.POST)
         if form.is_valid():
-            echo = form.save(request.user)
+            # The echo's shard commits last, so a failed fan-out leaves no echo behind.
+            with transaction.atomic(using=directory.shard_of(request.user.pk)):
+                echo = form.save(request.user)
+                with transaction.atomic():
+                    timeline.fan_out(echo)
             messages.success(request, 'Echo added successfully')  
             return redirect('echos:echo-detail', echo_pk=echo.pk)
     else:
@@ -45,9 +153,9 @@ def add_echo(request):
 @login_required
 def edit_echo(request, echo_pk):
 
-    echo = get_object_or_404(Echo, pk=echo_pk)
+    echo = directory.get_object_or_404(Echo.objects, pk=echo_pk)
 
-    if echo.user != request.user:
+    if echo.user_id != request.user.pk:
         raise PermissionDenied
     
     if request.method == 'POST':
@@ -62,24 +170,27 @@ def edit_echo(request, echo_pk):
 
 @login_required
 def delete_echo(request, echo_pk):
-    echo = get_object_or_404(Echo, pk=echo_pk)
+    echo = directory.get_object_or_404(Echo.objects, pk=echo_pk)
 
-    if echo.user != request.user:
+    if echo.user_id != request.user.pk:
         raise PermissionDenied
-    echo.delete()
+    # Hidden at once; its waves are removed in batches by `manage.py purge`.
+    hide_echos(Echo.objects.filter(pk=echo.pk))
     messages.success(request, 'Echo deleted successfully')  
     
     return redirect('echos:echo-list')
 
 @login_required
 def add_wave(request, echo_pk):
-    echo = get_object_or_404(Echo, pk=echo_pk)
+    echo = directory.get_object_or_404(Echo.objects, pk=echo_pk)
     if request.method == 'POST':
         if (form := AddWaveForm(request.POST)).is_valid():
             wave = form.save(commit=False)
             wave.echo = echo
             wave.user = request.user
-            wave.save()
+            with transaction.atomic(using=echo._state.db):
+                wave.save()
+                live.publish(live.ADDED, wave)
             messages.success(request, 'Wave added successfully')  
             return redirect('echos:echo-detail', echo_pk=echo.pk)
     else:
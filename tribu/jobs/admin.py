@@ -0,0 +1,23 @@
+from django.contrib import admin
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'task', 'status', 'priority', 'attempts', 'run_at', 'key')
+    list_filter = ('status',)
+    search_fields = ('task__exact',)
+    show_full_result_count = False
+    ordering = ('-priority', 'run_at')
+    actions = ('retry',)
+
+    @admin.action(permissions=['change'], description='Run selected failed jobs again')
+    def retry(self, request, queryset):
+        queued_keys = Job.objects.filter(status=Job.QUEUED).exclude(key='').values('key')
+        failed = queryset.filter(status=Job.FAILED).exclude(key__in=queued_keys)
+        updated = failed.update(
+            status=Job.QUEUED, run_at=timezone.now(), max_attempts=F('attempts') + 1
+        )
+        self.message_user(request, f'Queued {updated} jobs again.')
@@ -0,0 +1,59 @@
+"""Minimal cron expressions for scheduled jobs.
+
+Five fields: minute, hour, day of month, month and day of week (0 or 7 is
+Sunday). Each field is `*`, a number, a range `a-b`, a step `*/n` or `a-b/n`,
+or a comma-separated list of those. Unlike cron, a restricted day of month
+and day of week must both match. Times are in settings.TIME_ZONE.
+"""
+
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+
+FIELDS = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+
+def parse_field(field, low, high):
+    values = set()
+    for part in field.split(','):
+        spec, _, step = part.partition('/')
+        if spec == '*':
+            start, end = low, high
+        elif '-' in spec:
+            start, end = map(int, spec.split('-'))
+        else:
+            start = end = int(spec)
+        if not low <= start <= end <= high:
+            raise ValueError(f'{part!r} is out of range {low}-{high}')
+        values.update(range(start, end + 1, int(step or 1)))
+    return values
+
+
+def parse(expression):
+    fields = expression.split()
+    if len(fields) != len(FIELDS):
+        raise ValueError(f'{expression!r} must have {len(FIELDS)} fields')
+    minutes, hours, days, months, weekdays = (
+        parse_field(field, *bounds) for field, bounds in zip(fields, FIELDS)
+    )
+    if 7 in weekdays:
+        weekdays.add(0)
+    return sorted(minutes), sorted(hours), days, months, weekdays
+
+
+def next_run(expression, after):
+    """Return the first time strictly after `after` matching `expression`."""
+    minutes, hours, days, months, weekdays = parse(expression)
+    after = timezone.localtime(after)
+    start = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+    day = start.date()
+    # February 29th on a given weekday comes back within 28 years.
+    for _ in range(366 * 28):
+        if day.month in months and day.day in days and day.isoweekday() % 7 in weekdays:
+            for hour in hours:
+                for minute in minutes:
+                    candidate = timezone.make_aware(datetime.combine(day, time(hour, minute)))
+                    if candidate >= start:
+                        return candidate
+        day += timedelta(days=1)
+    raise ValueError(f'{expression!r} never matches')
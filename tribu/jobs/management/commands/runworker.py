@@ -0,0 +1,59 @@
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from jobs import queue
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs (see jobs.queue) until stopped'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--burst',
+            action='store_true',
+            help='Exit once no job is due instead of waiting for more',
+        )
+        parser.add_argument(
+            '--max-jobs',
+            type=int,
+            help='Exit after running this many jobs',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=settings.JOBS_POLL_INTERVAL,
+            help='Seconds to wait between polls when the queue is empty',
+        )
+
+    def handle(self, *args, **options):
+        self.stopping = False
+        # Finish the current job on SIGTERM/SIGINT, then exit.
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        ran = failed = 0
+        housekeeping_at = 0
+        while not self.stopping and (options['max_jobs'] is None or ran < options['max_jobs']):
+            close_old_connections()
+            if time.monotonic() >= housekeeping_at:
+                queue.requeue_expired()
+                queue.schedule()
+                housekeeping_at = time.monotonic() + settings.JOBS_HOUSEKEEPING_INTERVAL
+            if job := queue.claim():
+                ran += 1
+                if not queue.run(job):
+                    failed += 1
+                    self.stderr.write(f'{job} failed (attempt {job.attempts}/{job.max_attempts})')
+            elif options['burst']:
+                break
+            else:
+                time.sleep(options['sleep'])
+
+        self.stdout.write(f'Ran {ran} jobs ({failed} failed)')
+
+    def stop(self, signum, frame):
+        self.stopping = True
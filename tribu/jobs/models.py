@@ -0,0 +1,54 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    """A call to a registered task (see jobs.queue), waiting to be run by a worker.
+
+    Finished jobs are deleted; jobs out of attempts stay as FAILED.
+    """
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(QUEUED, 'Queued'), (RUNNING, 'Running'), (FAILED, 'Failed')]
+
+    task = models.CharField(max_length=100)
+    kwargs = models.JSONField(default=dict, blank=True)
+    # At most one queued job per non-empty key (e.g. one pending purge).
+    key = models.CharField(max_length=100, blank=True)
+    # Higher runs first.
+    priority = models.SmallIntegerField(default=0)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'{self.task} #{self.pk}'
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['key'],
+                condition=models.Q(status='queued') & ~models.Q(key=''),
+                name='unique_queued_job_key',
+            ),
+        ]
+        indexes = [
+            # Claiming: the next queued job by priority, then due time.
+            models.Index(
+                fields=['-priority', 'run_at', 'id'],
+                condition=models.Q(status='queued'),
+                name='job_queued_idx',
+            ),
+            # Reclaiming jobs of workers that died.
+            models.Index(
+                fields=['locked_at'],
+                condition=models.Q(status='running'),
+                name='job_running_idx',
+            ),
+        ]
@@ -0,0 +1,166 @@
+"""A job queue stored in the database, run by `manage.py runworker`.
+
+Tasks are plain functions registered with `@task` in an app's `tasks.py`,
+taking JSON-serializable keyword arguments:
+
+    @task(priority=10)
+    def process_avatar(profile_pk, name): ...
+
+    process_avatar.enqueue(profile_pk=profile.pk, name=profile.avatar.name)
+
+`enqueue()` inserts a `Job` row in the caller's transaction, so the job only
+becomes visible to workers if the view's own writes commit. Workers claim the
+highest-priority due job with `SELECT ... FOR UPDATE SKIP LOCKED` where the
+database supports it (PostgreSQL). SQLite has no row locks and serializes
+writers anyway, so there a job is claimed with a conditional UPDATE and the
+worker moves on to the next candidate if another one won the race.
+
+Failed jobs are retried with exponential backoff until `max_attempts`.
+Jobs of a worker that died are requeued once their lease (JOBS_LEASE) runs
+out, so tasks must be safe to run twice. settings.JOBS_SCHEDULE adds
+cron-like recurring jobs (see jobs.cron).
+"""
+
+import traceback
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import Callable
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import cron
+from .models import Job
+
+# Due jobs a SQLite worker tries to claim before giving up for this round
+CLAIM_CANDIDATES = 10
+
+TASKS = {}
+
+
+@dataclass(frozen=True)
+class Task:
+    func: Callable = field(repr=False)
+    name: str
+    priority: int = 0
+    max_attempts: int = 3
+
+    def __call__(self, **kwargs):
+        return self.func(**kwargs)
+
+    def enqueue(self, **options):
+        return enqueue(self.name, **options)
+
+
+def task(func=None, *, name=None, priority=0, max_attempts=3):
+    """Register `func` as a task named `<app>.<function>` unless `name` is given."""
+
+    def register(func):
+        label = name or f'{func.__module__.partition(".")[0]}.{func.__name__}'
+        TASKS[label] = Task(func, label, priority, max_attempts)
+        return TASKS[label]
+
+    return register(func) if func else register
+
+
+def enqueue(name, /, *, key='', priority=None, run_at=None, delay=0, **kwargs):
+    """Queue a call to task `name` with `kwargs`.
+
+    Return the job, or None if a job with the same `key` is already queued.
+    """
+    task = TASKS[name]
+    job = Job(
+        task=name,
+        kwargs=kwargs,
+        key=key,
+        priority=task.priority if priority is None else priority,
+        max_attempts=task.max_attempts,
+        run_at=run_at or timezone.now() + timedelta(seconds=delay),
+    )
+    try:
+        with transaction.atomic():
+            job.save()
+    except IntegrityError:
+        return None
+    return job
+
+
+def claim():
+    """Mark the next due job as RUNNING and return it, or None."""
+    now = timezone.now()
+    due = Job.objects.filter(status=Job.QUEUED, run_at__lte=now).order_by(
+        '-priority', 'run_at', 'pk'
+    )
+    running = {'status': Job.RUNNING, 'locked_at': now, 'attempts': F('attempts') + 1}
+
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            locked = due.select_for_update(skip_locked=True).values_list('pk', flat=True)
+            if (pk := locked.first()) is None:
+                return None
+            Job.objects.filter(pk=pk).update(**running)
+        return Job.objects.get(pk=pk)
+
+    for pk in due.values_list('pk', flat=True)[:CLAIM_CANDIDATES]:
+        if Job.objects.filter(pk=pk, status=Job.QUEUED).update(**running):
+            return Job.objects.get(pk=pk)
+    return None
+
+
+def run(job):
+    """Run a claimed job; return whether it succeeded."""
+    try:
+        TASKS[job.task](**job.kwargs)
+    except Exception:
+        error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            delay = settings.JOBS_RETRY_DELAY * 2 ** (job.attempts - 1)
+            requeue(
+                Job.objects.filter(pk=job.pk),
+                last_error=error,
+                run_at=timezone.now() + timedelta(seconds=delay),
+            )
+        else:
+            Job.objects.filter(pk=job.pk).update(status=Job.FAILED, last_error=error)
+        return False
+    Job.objects.filter(pk=job.pk).delete()
+    return True
+
+
+def requeue(jobs, **fields):
+    """Put `jobs` back in the queue, dropping those whose key was queued again meanwhile."""
+    queued_keys = Job.objects.filter(status=Job.QUEUED).exclude(key='').values('key')
+    with transaction.atomic():
+        jobs.filter(key__in=queued_keys).delete()
+        return jobs.update(status=Job.QUEUED, locked_at=None, **fields)
+
+
+def requeue_expired():
+    """Put back jobs claimed longer than JOBS_LEASE seconds ago (their worker died)."""
+    expired = timezone.now() - timedelta(seconds=settings.JOBS_LEASE)
+    return requeue(Job.objects.filter(status=Job.RUNNING, locked_at__lt=expired))
+
+
+def schedule():
+    """Queue the next run of every settings.JOBS_SCHEDULE entry not already queued."""
+    now = timezone.now()
+    for name, entry in settings.JOBS_SCHEDULE.items():
+        key = f'schedule:{name}'
+        if not Job.objects.filter(key=key, status=Job.QUEUED).exists():
+            enqueue(
+                entry['task'],
+                key=key,
+                run_at=cron.next_run(entry['cron'], now),
+                **entry.get('kwargs', {}),
+            )
+
+
+def run_pending(limit=None):
+    """Run due jobs until none is left (or `limit` ran); return how many ran."""
+    ran = 0
+    while (limit is None or ran < limit) and (job := claim()):
+        run(job)
+        ran += 1
+    return ran
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -42,10 +43,14 @@ INSTALLED_APPS = [
     'echos.apps.EchosConfig',
     'waves.apps.WavesConfig',
     'users.apps.UsersConfig',
+    'search.apps.SearchConfig',
+    'jobs.apps.JobsConfig',
+    'shards.apps.ShardsConfig',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'shared.middleware.primary_pin_middleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -77,17 +82,147 @@ WSGI_APPLICATION = 'main.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Production profile for SQLite, on unless TRIBU_SQLITE_TUNING=0:
+# - WAL lets readers run alongside the (single) writer, and synchronous=NORMAL
+#   only fsyncs at checkpoints instead of on every commit.
+# - Writers wait up to busy_timeout ms for the lock instead of failing with
+#   "database is locked", and transactions start with BEGIN IMMEDIATE so a
+#   read-then-write transaction can't deadlock on the lock upgrade.
+# - mmap_size, cache_size (negative: KiB) and temp_store keep hot pages and
+#   sort/temp tables in memory.
+# The PRAGMAs are run on each new connection by shared.db.
+
+SQLITE_TUNING = os.environ.get('TRIBU_SQLITE_TUNING', '1') != '0'
+
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64000,
+    'temp_store': 'MEMORY',
+} if SQLITE_TUNING else {}
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': os.environ.get('TRIBU_DB_PATH', BASE_DIR / 'db.sqlite3'),
+        'OPTIONS': {'transaction_mode': 'IMMEDIATE'} if SQLITE_TUNING else {},
+    }
+}
+
+# Shards
+# Echos live on the shard of their author and waves with their echo
+# (shards.directory). DATABASE_SHARDS lists the aliases holding them, the
+# primary database first. TRIBU_DB_SHARD_PATHS is a comma-separated list of
+# SQLite files added as shards; PostgreSQL shards are added to DATABASES and
+# DATABASE_SHARDS the same way. After adding a shard, run `manage.py migrate
+# --database shardN` and `manage.py reshard --sync-users`; `manage.py reshard`
+# moves users between shards.
+
+SHARD_PATHS = [path for path in os.environ.get('TRIBU_DB_SHARD_PATHS', '').split(',') if path]
+
+for number, path in enumerate(SHARD_PATHS, 1):
+    DATABASES[f'shard{number}'] = {**DATABASES['default'], 'NAME': path}
+
+DATABASE_SHARDS = ['default', *(f'shard{number}' for number in range(1, len(SHARD_PATHS) + 1))]
+
+# Read replicas
+# Reads made while serving requests go to one of DATABASE_REPLICAS, writes to
+# the primary (shared.routers). A client that wrote reads from the primary for
+# the next REPLICA_PIN_SECONDS, so it sees its own writes despite the replica
+# lag. TRIBU_DB_REPLICA_PATHS is a comma-separated list of SQLite copies of
+# the primary (kept in sync by e.g. Litestream or LiteFS); PostgreSQL replicas
+# are added to DATABASES and DATABASE_REPLICAS the same way. Shards are read
+# from directly.
+
+REPLICA_PATHS = [path for path in os.environ.get('TRIBU_DB_REPLICA_PATHS', '').split(',') if path]
+
+for number, path in enumerate(REPLICA_PATHS, 1):
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'],
+        'NAME': path,
+        'TEST': {'MIRROR': 'default'},
     }
+
+DATABASE_REPLICAS = [f'replica{number}' for number in range(1, len(REPLICA_PATHS) + 1)]
+
+DATABASE_ROUTERS = [
+    *(['shards.routers.ShardRouter'] if len(DATABASE_SHARDS) > 1 else []),
+    *(['shared.routers.ReplicaRouter'] if DATABASE_REPLICAS else []),
+]
+
+REPLICA_PIN_SECONDS = 5
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Each app has its own namespaced alias: a size-bounded in-process LRU tier in
+# front of the shared tier. The shared tier lives on the filesystem unless
+# TRIBU_REDIS_URL points to a Redis-protocol server.
+
+if REDIS_URL := os.environ.get('TRIBU_REDIS_URL'):
+    SHARED_CACHE = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+    }
+else:
+    SHARED_CACHE = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / '.cache',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
+
+CACHES = {
+    'shared': SHARED_CACHE,
+    **{
+        alias: {
+            'BACKEND': 'shared.cache.TieredCache',
+            'LOCATION': alias,
+            'KEY_PREFIX': prefix,
+            'OPTIONS': {'SHARED': 'shared', 'LOCAL_MAX_ENTRIES': 1000, 'LOCAL_TIMEOUT': 5},
+        }
+        for alias, prefix in [('default', ''), ('echos', 'echos'), ('waves', 'waves'), ('users', 'users')]
+    },
 }
 
 
+# Sessions
+# https://docs.djangoproject.com/en/5.2/topics/http/sessions/
+# Sessions are read from the shared cache tier (not the per-process one, so a
+# logout is seen by every worker at once) and only fall back to django_session
+# on a cache miss: a request that doesn't modify its session runs no session
+# query. TRIBU_SESSION_BACKEND=signed_cookies keeps the whole session in a
+# signed cookie instead, with no storage at all but no way to end a session
+# server-side before it expires. Expired rows are deleted by the
+# 'clear-sessions' job.
+
+SESSION_ENGINE = 'django.contrib.sessions.backends.' + os.environ.get(
+    'TRIBU_SESSION_BACKEND', 'cached_db'
+)
+
+SESSION_CACHE_ALIAS = 'shared'
+
+# Flash messages wait in a cookie until shown, never in the session
+MESSAGE_STORAGE = 'django.contrib.messages.storage.cookie.CookieStorage'
+
+
+# Live updates
+# Pub/sub broker behind the live waves WebSocket (waves.live). The in-process
+# broker only reaches clients of the same worker; with TRIBU_REDIS_URL set,
+# events go through the Redis-protocol server so every worker sees them.
+
+if REDIS_URL:
+    LIVE_BROKER = {'BACKEND': 'shared.broker.RedisBroker', 'LOCATION': REDIS_URL}
+else:
+    LIVE_BROKER = {'BACKEND': 'shared.broker.InProcessBroker'}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
+AUTHENTICATION_BACKENDS = ['users.backends.ProfileModelBackend']
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -104,6 +239,43 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Password hashing
+# https://docs.djangoproject.com/en/5.2/topics/auth/passwords/
+# PBKDF2 iterations per profile; TRIBU_PASSWORD_HASH_PROFILE picks one. Each
+# login costs one hash, so the profile sets how many logins a core verifies
+# per second. Passwords hashed with another profile are rehashed when their
+# user next logs in (accounts.passwords).
+
+PASSWORD_HASH_PROFILES = {
+    # Django 5.2's own default
+    'django': 1_000_000,
+    # OWASP's minimum for PBKDF2-HMAC-SHA256 (2023)
+    'owasp': 600_000,
+}
+
+PASSWORD_HASH_ITERATIONS = PASSWORD_HASH_PROFILES[
+    os.environ.get('TRIBU_PASSWORD_HASH_PROFILE', 'django')
+]
+
+PASSWORD_HASHERS = [
+    'accounts.passwords.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
+# Logins
+# Threads verifying passwords for the async login view, and how many more
+# logins may wait for one before the next are turned away with a 503 and a
+# Retry-After of LOGIN_RETRY_AFTER seconds.
+LOGIN_WORKERS = os.cpu_count()
+
+LOGIN_QUEUE_SIZE = 32
+
+LOGIN_RETRY_AFTER = 5
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
 
@@ -134,3 +306,78 @@ MEDIA_ROOT = BASE_DIR / 'media'
 
 
 LOGIN_URL = 'login'
+
+
+# Echo feed
+# Number of echos per page on the global feed (keyset paginated)
+ECHO_LIST_PAGE_SIZE = 20
+
+# Seconds the "Tribu has posted N echos" total is cached for
+ECHO_COUNT_CACHE_TIMEOUT = 300
+
+# Number of latest waves shown on the echo detail page
+ECHO_DETAIL_WAVES_LIMIT = 5
+
+# Number of waves per page on the full thread page and its "load more" fragment
+ECHO_WAVES_PAGE_SIZE = 20
+
+# Waves rendered per chunk when the full thread is streamed (?stream)
+ECHO_WAVES_STREAM_CHUNK_SIZE = 100
+
+# Seconds the session user (with its profile) is cached between requests, 0 disables it
+CURRENT_USER_CACHE_TIMEOUT = 300
+
+# Echos per page on the home timeline
+HOME_TIMELINE_PAGE_SIZE = 20
+
+# Echo ids kept in each materialized home timeline
+HOME_TIMELINE_LENGTH = 800
+
+# Authors with more followers than this are merged into timelines on read
+# instead of being fanned out when they post
+HOME_TIMELINE_FANOUT_LIMIT = 10000
+
+# Timelines written per INSERT when fanning out an echo
+HOME_TIMELINE_FANOUT_BATCH_SIZE = 1000
+
+# Latest echos shown on a profile page
+PROFILE_ECHOS_LIMIT = 5
+
+# Echos per page on a user's full echo listing
+PROFILE_ECHOS_PAGE_SIZE = 20
+
+# Results per page on /search/
+SEARCH_PAGE_SIZE = 20
+
+# Deepest /search/ page served: results are ranked and skipped on every shard
+SEARCH_MAX_PAGES = 50
+
+# Rows deleted per statement (and transaction) by `manage.py purge` and the
+# expired session cleanup
+PURGE_BATCH_SIZE = 1000
+
+# Rows copied per statement by `manage.py reshard` when moving a user
+RESHARD_BATCH_SIZE = 1000
+
+# Background jobs (jobs.queue, run by `manage.py runworker`)
+# Seconds an idle worker waits before polling the queue again
+JOBS_POLL_INTERVAL = 1
+
+# Seconds between a worker's checks for schedules due and expired leases
+JOBS_HOUSEKEEPING_INTERVAL = 60
+
+# Seconds a claimed job may run before it is handed to another worker
+JOBS_LEASE = 600
+
+# Seconds before the first retry of a failed job, doubled on each attempt
+JOBS_RETRY_DELAY = 10
+
+# Recurring jobs: name -> {'task', 'cron' (see jobs.cron), optional 'kwargs'}
+JOBS_SCHEDULE = {
+    'purge': {'task': 'shared.purge', 'cron': '*/10 * * * *'},
+    'recount': {'task': 'shared.recount', 'cron': '30 4 * * *'},
+    'clear-sessions': {'task': 'shared.clear_sessions', 'cron': '0 * * * *'},
+}
+
+# Side in pixels uploaded avatars are cropped and resized to
+AVATAR_SIZE = 256
@@ -0,0 +1,197 @@
+"""Ranked full-text search over echo and wave content.
+
+SQLite uses the FTS5 tables created by the search migration (kept in sync by
+triggers), PostgreSQL uses the GIN expression indexes on to_tsvector(). Other
+backends fall back to a plain `icontains` scan. With several shards, each one
+is searched and the results are merged by rank.
+"""
+
+import re
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+from django.utils.text import Truncator
+
+from echos.models import Echo
+from shards import directory
+from waves.models import Wave
+
+SEARCHABLE = {
+    'echos': (Echo, 'search_echo_fts'),
+    'waves': (Wave, 'search_wave_fts'),
+}
+
+MAX_TERMS = 10
+SNIPPET_WORDS = 16
+
+# Control characters used to delimit matches inside snippets, so the content
+# can be HTML-escaped before the highlight tags are put in.
+MARK_START, MARK_END = '\x02', '\x03'
+
+
+@dataclass
+class SearchResult:
+    object: Echo | Wave
+    snippet: str
+    rank: float
+
+
+@dataclass
+class SearchPage:
+    results: list = field(default_factory=list)
+    number: int = 1
+    has_next: bool = False
+
+    @property
+    def has_previous(self):
+        return self.number > 1
+
+    @property
+    def next_page_number(self):
+        return self.number + 1
+
+    @property
+    def previous_page_number(self):
+        return self.number - 1
+
+    def __iter__(self):
+        return iter(self.results)
+
+    def __len__(self):
+        return len(self.results)
+
+
+def tokenize(query):
+    return re.findall(r'\w+', query.lower())[:MAX_TERMS]
+
+
+def highlight(snippet):
+    html = escape(snippet).replace(MARK_START, '<mark>').replace(MARK_END, '</mark>')
+    return mark_safe(html)
+
+
+def sqlite_match(terms):
+    # Every term must match; the last one as a prefix to support partial words.
+    return ' '.join(f'"{term}"' for term in terms) + '*'
+
+
+def postgresql_query(terms):
+    from django.contrib.postgres.search import SearchQuery
+
+    return SearchQuery(
+        ' & '.join(terms[:-1] + [f'{terms[-1]}:*']), search_type='raw', config='simple'
+    )
+
+
+def search_sqlite(model, fts, terms, limit, offset, using=None):
+    match = sqlite_match(terms)
+    with connections[using or DEFAULT_DB_ALIAS].cursor() as cursor:
+        cursor.execute(
+            f'SELECT rowid, snippet({fts}, 0, %s, %s, %s, %s), bm25({fts}) '
+            f'FROM {fts} WHERE {fts} MATCH %s ORDER BY bm25({fts}) LIMIT %s OFFSET %s',
+            [MARK_START, MARK_END, '…', SNIPPET_WORDS, match, limit, offset],
+        )
+        return [(pk, snippet, -rank) for pk, snippet, rank in cursor.fetchall()]
+
+
+def search_postgresql(model, fts, terms, limit, offset, using=None):
+    from django.contrib.postgres.search import SearchHeadline, SearchRank, SearchVector
+
+    query = postgresql_query(terms)
+    rows = (
+        model.objects.using(using)
+        .annotate(document=SearchVector('content', config='simple'))
+        .filter(document=query)
+        .annotate(
+            rank=SearchRank('document', query),
+            snippet=SearchHeadline(
+                'content',
+                query,
+                config='simple',
+                start_sel=MARK_START,
+                stop_sel=MARK_END,
+                max_words=SNIPPET_WORDS,
+            ),
+        )
+        .order_by('-rank', '-pk')
+        .values_list('pk', 'snippet', 'rank')
+    )
+    return list(rows[offset : offset + limit])
+
+
+def search_icontains(model, fts, terms, limit, offset, using=None):
+    rows = model.objects.using(using)
+    for term in terms:
+        rows = rows.filter(content__icontains=term)
+    rows = rows.order_by('-created_at', '-pk').values_list('pk', 'content')
+    return [
+        (pk, Truncator(content).words(SNIPPET_WORDS), 0.0)
+        for pk, content in rows[offset : offset + limit]
+    ]
+
+
+BACKENDS = {'sqlite': search_sqlite, 'postgresql': search_postgresql}
+
+
+def ranked(model, fts, terms, limit, offset):
+    """(pk, snippet, rank) of the matching rows, best first."""
+    if not directory.is_sharded():
+        backend = BACKENDS.get(connection.vendor, search_icontains)
+        return backend(model, fts, terms, limit, offset)
+    # Any shard may hold the whole page: each one returns as many rows.
+    rows = []
+    for alias in settings.DATABASE_SHARDS:
+        backend = BACKENDS.get(connections[alias].vendor, search_icontains)
+        rows += backend(model, fts, terms, offset + limit, 0, alias)
+    rows.sort(key=lambda row: row[2], reverse=True)
+    # A row being moved between shards is briefly found on both.
+    unique = {}
+    for row in rows:
+        unique.setdefault(row[0], row)
+    return list(unique.values())[offset : offset + limit]
+
+
+def find(query, kind='echos', page=1, page_size=20):
+    model, fts = SEARCHABLE[kind]
+    if not (terms := tokenize(query)):
+        return SearchPage(number=page)
+
+    # Fetch one extra row to know whether there is a next page.
+    rows = ranked(model, fts, terms, page_size + 1, (page - 1) * page_size)
+    has_next = len(rows) > page_size
+    rows = rows[:page_size]
+
+    objects = model.objects.select_related('user')
+    if model is Wave:
+        # Waves of a deleted echo are only hidden through their echo.
+        objects = objects.filter(echo__deleted_at__isnull=True)
+    objects = directory.in_bulk(objects, [pk for pk, _, _ in rows])
+    results = [
+        SearchResult(objects[pk], highlight(snippet), rank)
+        for pk, snippet, rank in rows
+        if pk in objects
+    ]
+    return SearchPage(results, page, has_next)
+
+
+def matching(query, kind='echos'):
+    """Unranked pks of the `kind` rows matching `query`, for use as a subquery."""
+    model, fts = SEARCHABLE[kind]
+    rows = model.objects.order_by()
+    if not (terms := tokenize(query)):
+        return rows.none().values('pk')
+    if connection.vendor == 'sqlite':
+        match = RawSQL(f'SELECT rowid FROM {fts} WHERE {fts} MATCH %s', [sqlite_match(terms)])
+        return rows.filter(pk__in=match).values('pk')
+    if connection.vendor == 'postgresql':
+        from django.contrib.postgres.search import SearchVector
+
+        rows = rows.annotate(document=SearchVector('content', config='simple'))
+        return rows.filter(document=postgresql_query(terms)).values('pk')
+    for term in terms:
+        rows = rows.filter(content__icontains=term)
+    return rows.values('pk')
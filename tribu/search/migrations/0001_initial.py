@@ -0,0 +1,77 @@
+from django.db import migrations
+
+# (table, fts table) pairs kept in sync by triggers on SQLite.
+INDEXED_TABLES = [('echos_echo', 'search_echo_fts'), ('waves_wave', 'search_wave_fts')]
+
+SQLITE_CREATE = [
+    """
+    CREATE VIRTUAL TABLE {fts} USING fts5(
+        content, content='{table}', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER {fts}_ai AFTER INSERT ON {table} BEGIN
+        INSERT INTO {fts}(rowid, content) VALUES (new.id, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER {fts}_ad AFTER DELETE ON {table} BEGIN
+        INSERT INTO {fts}({fts}, rowid, content) VALUES ('delete', old.id, old.content);
+    END
+    """,
+    """
+    CREATE TRIGGER {fts}_au AFTER UPDATE OF content ON {table} BEGIN
+        INSERT INTO {fts}({fts}, rowid, content) VALUES ('delete', old.id, old.content);
+        INSERT INTO {fts}(rowid, content) VALUES (new.id, new.content);
+    END
+    """,
+    "INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+]
+
+SQLITE_DROP = [
+    'DROP TRIGGER IF EXISTS {fts}_ai',
+    'DROP TRIGGER IF EXISTS {fts}_ad',
+    'DROP TRIGGER IF EXISTS {fts}_au',
+    'DROP TABLE IF EXISTS {fts}',
+]
+
+# Must match the expression Django generates for SearchVector('content', config='simple')
+POSTGRESQL_CREATE = [
+    """
+    CREATE INDEX IF NOT EXISTS {fts} ON {table}
+    USING GIN (to_tsvector('simple'::regconfig, COALESCE(content, '')))
+    """,
+]
+
+POSTGRESQL_DROP = ['DROP INDEX IF EXISTS {fts}']
+
+
+def run(statements, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor not in statements:
+        return
+    for table, fts in INDEXED_TABLES:
+        for statement in statements[vendor]:
+            schema_editor.execute(statement.format(table=table, fts=fts))
+
+
+def create_search_index(apps, schema_editor):
+    run({'sqlite': SQLITE_CREATE, 'postgresql': POSTGRESQL_CREATE}, schema_editor)
+
+
+def drop_search_index(apps, schema_editor):
+    run({'sqlite': SQLITE_DROP, 'postgresql': POSTGRESQL_DROP}, schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('echos', '0003_echo_echo_feed_idx_echo_echo_user_created_idx'),
+        ('waves', '0002_wave_wave_echo_created_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
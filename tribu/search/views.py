@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from django.shortcuts import render
+
+from .engine import SEARCHABLE, find
+
+
+@login_required
+def search(request):
+    query = request.GET.get('q', '').strip()
+    kind = request.GET.get('in', 'echos')
+    if kind not in SEARCHABLE:
+        kind = 'echos'
+    try:
+        page = min(max(int(request.GET.get('page', 1)), 1), settings.SEARCH_MAX_PAGES)
+    except ValueError:
+        page = 1
+
+    results = find(query, kind, page, settings.SEARCH_PAGE_SIZE) if query else None
+    if results and results.number == settings.SEARCH_MAX_PAGES:
+        results.has_next = False
+    return render(
+        request, 'search/results.html', {'query': query, 'kind': kind, 'results': results}
+    )
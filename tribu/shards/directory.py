@@ -0,0 +1,167 @@
+"""Where echos and waves live.
+
+Each user's echos are stored on one of settings.DATABASE_SHARDS, chosen from
+the user id when the user is created and recorded as a `Placement`, so adding
+a shard moves nobody (`manage.py reshard` does). Waves live with their echo,
+so a whole thread is read from one shard. Users are copied to every shard as
+a reference table: echo and wave queries keep joining their authors.
+
+Per-user reads go to a single shard (`for_user()`). Reads that can't know
+the shard run the same query on every shard and gather the results
+(`scatter()`, `get_object_or_404()`, `in_bulk()`...). With a single shard,
+the default, all of these leave the queryset as is.
+"""
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.http import Http404
+
+from .models import Placement
+
+
+def is_sharded():
+    return len(settings.DATABASE_SHARDS) > 1
+
+
+def choose(user_id):
+    """The shard of a new user."""
+    return settings.DATABASE_SHARDS[user_id % len(settings.DATABASE_SHARDS)]
+
+
+def shard_of(user_id):
+    """The shard holding the echos of `user_id`."""
+    if not is_sharded():
+        return DEFAULT_DB_ALIAS
+    shard = Placement.objects.filter(user_id=user_id).values_list('shard', flat=True).first()
+    return shard or choose(user_id)
+
+
+async def ashard_of(user_id):
+    if not is_sharded():
+        return DEFAULT_DB_ALIAS
+    shards = Placement.objects.filter(user_id=user_id).values_list('shard', flat=True)
+    return await shards.afirst() or choose(user_id)
+
+
+def for_user(queryset, user_id):
+    """`queryset` on the shard of `user_id`."""
+    return queryset.using(shard_of(user_id)) if is_sharded() else queryset
+
+
+async def afor_user(queryset, user_id):
+    return queryset.using(await ashard_of(user_id)) if is_sharded() else queryset
+
+
+def scatter(queryset):
+    """`queryset` on each shard."""
+    if not is_sharded():
+        return [queryset]
+    return [queryset.using(alias) for alias in settings.DATABASE_SHARDS]
+
+
+def count(queryset):
+    return sum(rows.count() for rows in scatter(queryset))
+
+
+async def acount(queryset):
+    return sum([await rows.acount() for rows in scatter(queryset)])
+
+
+def first(queryset):
+    """The first row of `queryset` on the first shard that has one."""
+    for rows in scatter(queryset):
+        if (row := rows.first()) is not None:
+            return row
+    return None
+
+
+async def afirst(queryset):
+    for rows in scatter(queryset):
+        if (row := await rows.afirst()) is not None:
+            return row
+    return None
+
+
+def _not_found(queryset):
+    return Http404(f'No {queryset.model._meta.object_name} matches the given query.')
+
+
+def get_object_or_404(queryset, **lookup):
+    """Like django.shortcuts.get_object_or_404(), looking on every shard."""
+    for rows in scatter(queryset.filter(**lookup)):
+        try:
+            return rows.get()
+        except rows.model.DoesNotExist:
+            pass
+    raise _not_found(queryset)
+
+
+async def aget_object_or_404(queryset, **lookup):
+    for rows in scatter(queryset.filter(**lookup)):
+        try:
+            return await rows.aget()
+        except rows.model.DoesNotExist:
+            pass
+    raise _not_found(queryset)
+
+
+def in_bulk(queryset, pks):
+    objects = {}
+    for rows in scatter(queryset):
+        if missing := [pk for pk in pks if pk not in objects]:
+            objects.update(rows.in_bulk(missing))
+    return objects
+
+
+def locate(queryset):
+    """The first shard where `queryset` has rows, or None."""
+    for rows in scatter(queryset):
+        if rows.exists():
+            return rows.db
+    return None
+
+
+def replicate_users(users, shards=None, batch_size=1000):
+    """Copy `users` (a queryset) to `shards`, all but the primary database by default.
+
+    Copies have an unusable password: they are only there to be joined.
+    """
+    User = get_user_model()
+    shards = [alias for alias in shards or settings.DATABASE_SHARDS if alias != DEFAULT_DB_ALIAS]
+    fields = [
+        field.name
+        for field in User._meta.concrete_fields
+        if not field.primary_key and field.name != 'password'
+    ]
+    password = make_password(None)
+    rows = users.using(DEFAULT_DB_ALIAS).order_by('pk').values_list('pk', *fields)
+    replicated = last = 0
+    while batch := list(rows.filter(pk__gt=last)[:batch_size]):
+        copies = [
+            User(pk=pk, password=password, **dict(zip(fields, values))) for pk, *values in batch
+        ]
+        for alias in shards:
+            User.objects.using(alias).bulk_create(
+                copies, update_conflicts=True, unique_fields=['pk'], update_fields=fields
+            )
+        replicated += len(batch)
+        last = batch[-1][0]
+    return replicated
+
+
+def place_users(users, shard=None):
+    """Place `users` created without post_save signals (by bulk_create) like new users.
+
+    `shard` places them all on one shard, the one their echos were written to.
+    Call inside the transaction creating them: they are copied to the other
+    shards once it commits.
+    """
+    Placement.objects.bulk_create(
+        [Placement(user_id=user.pk, shard=shard or choose(user.pk)) for user in users],
+        ignore_conflicts=True,
+    )
+    if is_sharded():
+        rows = get_user_model().objects.filter(pk__in=[user.pk for user in users])
+        transaction.on_commit(lambda: replicate_users(rows))
@@ -0,0 +1,82 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+
+from echos.models import Echo
+from shards import directory
+from shards.moves import move_user
+
+
+class Command(BaseCommand):
+    help = 'Move users and their echos between shards, or copy users to every shard'
+
+    def add_arguments(self, parser):
+        parser.add_argument('usernames', nargs='*', help='Users to move (with --to)')
+        parser.add_argument('--to', metavar='SHARD', help='Shard to move the users to')
+        parser.add_argument(
+            '--rebalance',
+            action='store_true',
+            help='Move users from the fullest shard to the emptiest until echos are spread evenly',
+        )
+        parser.add_argument(
+            '--limit', type=int, default=100, help='Users moved at most by --rebalance'
+        )
+        parser.add_argument(
+            '--sync-users',
+            action='store_true',
+            help='Copy every user to every shard (after adding a shard)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            help='Rows copied per statement (defaults to settings.RESHARD_BATCH_SIZE)',
+        )
+
+    def handle(self, *args, **options):
+        if not (options['usernames'] or options['rebalance'] or options['sync_users']):
+            raise CommandError('Give usernames with --to, --rebalance or --sync-users')
+        if options['sync_users']:
+            users = directory.replicate_users(get_user_model().objects.all())
+            self.stdout.write(f'{users} users copied to {len(settings.DATABASE_SHARDS) - 1} shards')
+        if options['usernames']:
+            self.move(options['usernames'], options['to'], options['batch_size'])
+        if options['rebalance']:
+            self.rebalance(options['limit'], options['batch_size'])
+
+    def move(self, usernames, target, batch_size):
+        if target not in settings.DATABASE_SHARDS:
+            raise CommandError(f'--to must be one of: {", ".join(settings.DATABASE_SHARDS)}')
+        users = dict(
+            get_user_model().objects.filter(username__in=usernames).values_list('username', 'pk')
+        )
+        if unknown := [username for username in usernames if username not in users]:
+            raise CommandError(f'Unknown users: {", ".join(unknown)}')
+        for username in usernames:
+            self.report(username, target, move_user(users[username], target, batch_size))
+
+    def rebalance(self, limit, batch_size):
+        load = {alias: Echo.all_objects.using(alias).count() for alias in settings.DATABASE_SHARDS}
+        for _ in range(limit):
+            fullest, emptiest = max(load, key=load.get), min(load, key=load.get)
+            # Only moves that narrow the gap: the largest user fitting in half of it
+            echos = Echo.all_objects.using(fullest).order_by().values('user_id')
+            candidate = (
+                echos.annotate(n=Count('pk'))
+                .filter(n__lte=(load[fullest] - load[emptiest]) // 2)
+                .order_by('-n')
+                .first()
+            )
+            if candidate is None:
+                break
+            moved = move_user(candidate['user_id'], emptiest, batch_size)
+            load[fullest] -= moved['echos']
+            load[emptiest] += moved['echos']
+            username = get_user_model().objects.get(pk=candidate['user_id']).username
+            self.report(username, emptiest, moved)
+        self.stdout.write(', '.join(f'{alias}: {n} echos' for alias, n in load.items()))
+
+    def report(self, username, target, moved):
+        self.stdout.write(
+            f'{username}: {moved["echos"]} echos and {moved["waves"]} waves moved to {target}'
+        )
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:22
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def place_existing_users(apps, schema_editor):
+    # Their echos and waves are all on the primary database so far.
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    Placement = apps.get_model('shards', 'Placement')
+    db = schema_editor.connection.alias
+    users = User.objects.using(db).values_list('pk', flat=True)
+    Placement.objects.using(db).bulk_create(
+        (Placement(user_id=pk, shard='default') for pk in users.iterator()), batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Placement',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('shard', models.CharField(max_length=100)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Sequence',
+            fields=[
+                ('name', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('next_id', models.BigIntegerField()),
+            ],
+        ),
+        migrations.RunPython(place_existing_users, migrations.RunPython.noop),
+    ]
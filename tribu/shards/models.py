@@ -0,0 +1,108 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, connections, models, router, transaction
+from django.db.models import F, Max
+
+# Ids reserved at once for a model in the Sequence table
+ID_BLOCK_SIZE = 100
+
+_blocks = {}
+_blocks_lock = threading.Lock()
+# Reservations run on this thread's own connection, see reserve_ids().
+_reserver = ThreadPoolExecutor(1, thread_name_prefix='shards-ids')
+
+
+class Placement(models.Model):
+    """The shard holding a user's echos and the waves on them (see shards.directory)."""
+
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        primary_key=True,
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    shard = models.CharField(max_length=100)
+
+    def __str__(self):
+        return f'{self.user_id} on {self.shard}'
+
+
+class Sequence(models.Model):
+    """The next id to reserve for a sharded model."""
+
+    name = models.CharField(max_length=100, primary_key=True)
+    next_id = models.BigIntegerField()
+
+    def __str__(self):
+        return f'{self.name}: {self.next_id}'
+
+
+def _reserve(model, size):
+    name = model._meta.label_lower
+    try:
+        with transaction.atomic(using=DEFAULT_DB_ALIAS):
+            if Sequence.objects.filter(name=name).update(next_id=F('next_id') + size):
+                return Sequence.objects.get(name=name).next_id - size
+            # First reservation: start after the rows created before sharding.
+            start = 1 + max(
+                model._base_manager.using(alias).aggregate(Max('pk'))['pk__max'] or 0
+                for alias in settings.DATABASE_SHARDS
+            )
+            Sequence.objects.create(name=name, next_id=start + size)
+            return start
+    except IntegrityError:
+        # Another process created the sequence first.
+        return _reserve(model, size)
+
+
+def reserve_ids(model, size=ID_BLOCK_SIZE):
+    """Reserve `size` consecutive ids for `model` and return the first one.
+
+    The reservation is committed on a connection of its own, so ids handed
+    out before the caller's transaction rolls back are never handed out again.
+    """
+    return _reserver.submit(_reserve, model, size).result()
+
+
+def next_id(model, using):
+    """Return an id for a new `model` row saved to `using`, unique across all shards."""
+    primary = connections[DEFAULT_DB_ALIAS]
+    if primary.vendor == 'sqlite' and primary.in_atomic_block:
+        # The caller's transaction holds the SQLite write lock the reserving
+        # thread would wait for. An id taken in that transaction is only safe
+        # for a row it also rolls back: one on the primary database.
+        if using != DEFAULT_DB_ALIAS:
+            raise transaction.TransactionManagementError(
+                f'New {model._meta.object_name} rows on {using!r} must be saved outside '
+                'transactions on the primary database.'
+            )
+        return _reserve(model, 1)
+    name = model._meta.label_lower
+    with _blocks_lock:
+        if (pk := next(_blocks.get(name, iter(())), None)) is None:
+            start = reserve_ids(model)
+            _blocks[name] = iter(range(start + 1, start + ID_BLOCK_SIZE))
+            pk = start
+    return pk
+
+
+class ShardedModel(models.Model):
+    """Rows spread over settings.DATABASE_SHARDS (see shards.routers).
+
+    With several shards, new rows take their id from `next_id()` instead of
+    their shard's own sequence, so ids stay unique when users are moved.
+    """
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        if self.pk is None and len(settings.DATABASE_SHARDS) > 1:
+            using = kwargs['using'] = kwargs.get('using') or router.db_for_write(
+                type(self), instance=self
+            )
+            self.pk = next_id(type(self), using)
+            kwargs['force_insert'] = True
+        super().save(*args, **kwargs)
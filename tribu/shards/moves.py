@@ -0,0 +1,104 @@
+"""Moving users between shards while the site keeps running.
+
+`move_user()` moves a user's echos, with the waves on them, in two passes:
+
+1. The rows are copied to the target shard in batches, without locking
+   anything: the threads stay readable and writable on the source.
+2. The rows are locked on the source: SELECT ... FOR UPDATE keeps edits and
+   new waves off the threads on PostgreSQL, and on SQLite the first write of
+   the transaction takes the database write lock. The rows that changed
+   since the first pass are copied again, the user's Placement is pointed at
+   the target and the source rows are deleted before the lock is released.
+
+Writers that looked up the placement just before the switch may still add an
+echo to the source: those stragglers are moved by running the second pass
+again. Until then, the global feed and search drop rows found on two shards.
+"""
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F
+
+from echos.models import Echo
+from shared.db import manual_timestamps
+from waves.models import Wave
+
+from . import directory
+from .models import Placement
+
+# Columns telling whether a row changed since it was copied (updated_at only
+# moves on save(), not on the bulk UPDATEs of counters and deletions).
+FINGERPRINTS = {
+    Echo: ('updated_at', 'waves_count', 'deleted_at'),
+    Wave: ('updated_at', 'deleted_at'),
+}
+
+
+def copy_rows(rows, target, batch_size):
+    """Upsert `rows` (a queryset on the source shard) into `target`, keeping their ids."""
+    model = rows.model
+    fields = [field.name for field in model._meta.concrete_fields if not field.primary_key]
+    copied = last = 0
+    with manual_timestamps(model):
+        while batch := list(rows.filter(pk__gt=last).order_by('pk')[:batch_size]):
+            model._base_manager.using(target).bulk_create(
+                batch, update_conflicts=True, unique_fields=['pk'], update_fields=fields
+            )
+            copied += len(batch)
+            last = batch[-1].pk
+    return copied
+
+
+def sync_rows(rows, target, batch_size):
+    """Make `target` hold the same `rows` as the source shard, copying only what changed."""
+    fields = FINGERPRINTS[rows.model]
+    here = {pk: state for pk, *state in rows.values_list('pk', *fields)}
+    there = {pk: state for pk, *state in rows.using(target).values_list('pk', *fields)}
+    changed = [pk for pk, state in here.items() if there.get(pk) != state]
+    for start in range(0, len(changed), batch_size):
+        copy_rows(rows.filter(pk__in=changed[start : start + batch_size]), target, batch_size)
+    if gone := there.keys() - here.keys():
+        stale = rows.model._base_manager.using(target).filter(pk__in=gone)
+        stale._raw_delete(target)
+    return len(here)
+
+
+def move_user(user_id, target, batch_size=None):
+    """Move the echos of `user_id` and their threads to shard `target`.
+
+    Return the number of echos and waves moved.
+    """
+    batch_size = batch_size or settings.RESHARD_BATCH_SIZE
+    moved = {'echos': 0, 'waves': 0}
+    while (source := directory.shard_of(user_id)) != target or stragglers(user_id, target):
+        if source == target:
+            source = stragglers(user_id, target)
+        echos = Echo.all_objects.using(source).filter(user_id=user_id)
+        waves = Wave.all_objects.using(source).filter(echo__user_id=user_id)
+
+        # The copies join their authors, who must be on the target too.
+        authors = {user_id, *waves.values_list('user_id', flat=True).distinct()}
+        directory.replicate_users(get_user_model().objects.filter(pk__in=authors), [target])
+        copy_rows(echos, target, batch_size)
+        copy_rows(waves, target, batch_size)
+
+        with transaction.atomic(using=source):
+            echos.update(deleted_at=F('deleted_at'))
+            list(echos.select_for_update().values_list('pk', flat=True))
+            list(waves.select_for_update().values_list('pk', flat=True))
+            with transaction.atomic(using=target):
+                moved['echos'] += sync_rows(echos, target, batch_size)
+                moved['waves'] += sync_rows(waves, target, batch_size)
+            Placement.objects.update_or_create(user_id=user_id, defaults={'shard': target})
+            waves._raw_delete(source)
+            echos._raw_delete(source)
+    return moved
+
+
+def stragglers(user_id, target):
+    """A shard other than `target` still holding echos of `user_id`, or None."""
+    for alias in settings.DATABASE_SHARDS:
+        if alias != target and Echo.all_objects.using(alias).filter(user_id=user_id).exists():
+            return alias
+    return None
@@ -0,0 +1,56 @@
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS
+
+from echos.models import Echo
+from waves.models import Wave
+
+from . import directory
+
+SHARDED_MODELS = (Echo, Wave)
+
+
+class ShardRouter:
+    """Send echos and waves to their shard, everything else to the primary database.
+
+    Rows already read or saved stay on their shard, and so do the rows reached
+    through them (`echo.waves`, `wave.echo`). A new echo goes to the shard of
+    its author, a new wave to the shard of its echo. Querysets without an
+    instance to go by must pick their shard with shards.directory.
+    """
+
+    def _shard(self, model, instance):
+        if isinstance(instance, SHARDED_MODELS) and not instance._state.adding:
+            return instance._state.db
+        if isinstance(instance, SHARDED_MODELS) and instance.user_id is None:
+            # Forms validate rows before their author is set.
+            return None
+        if isinstance(instance, Echo):
+            return directory.shard_of(instance.user_id)
+        if isinstance(instance, Wave):
+            if Wave.echo.is_cached(instance) and instance.echo is not None:
+                return instance.echo._state.db
+            if instance.echo_id is None:
+                return directory.shard_of(instance.user_id)
+            return directory.locate(Echo.all_objects.filter(pk=instance.echo_id))
+        if model is Echo and isinstance(instance, get_user_model()):
+            return directory.shard_of(instance.pk)
+        return None
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label == 'shards':
+            return DEFAULT_DB_ALIAS
+        if issubclass(model, SHARDED_MODELS):
+            return self._shard(model, hints.get('instance'))
+        return None
+
+    db_for_write = db_for_read
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if isinstance(obj1, SHARDED_MODELS) or isinstance(obj2, SHARDED_MODELS):
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, **hints):
+        if app_label == 'shards':
+            return db == DEFAULT_DB_ALIAS
+        return None
@@ -0,0 +1,40 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .directory import choose, is_sharded, replicate_users
+from .models import Placement
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def place_new_users(sender, instance, created, raw=False, **kwargs):
+    # Recorded even with a single shard, so that adding shards moves nobody.
+    if created and not raw:
+        Placement.objects.bulk_create(
+            [Placement(user_id=instance.pk, shard=choose(instance.pk))], ignore_conflicts=True
+        )
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def replicate_saved_users(sender, instance, raw=False, update_fields=None, **kwargs):
+    # Logins only touch last_login, which the copies don't need.
+    if not is_sharded() or raw or (update_fields and set(update_fields) <= {'last_login'}):
+        return
+    users = get_user_model().objects.filter(pk=instance.pk)
+    transaction.on_commit(lambda: replicate_users(users))
+
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def delete_user_copies(sender, instance, **kwargs):
+    if not is_sharded():
+        return
+
+    def delete():
+        for alias in settings.DATABASE_SHARDS:
+            if alias != DEFAULT_DB_ALIAS:
+                users = get_user_model().objects.using(alias).filter(pk=instance.pk)
+                users._raw_delete(alias)
+
+    transaction.on_commit(delete)
@@ -1,3 +1,56 @@
 from django.contrib import admin
+from django.db.models import QuerySet
+from django.utils.text import Truncator
 
-# Register your models here.
+from search import engine
+
+EXCERPT_LENGTH = 60
+
+# Objects listed on the delete confirmation page
+DELETE_PREVIEW_LENGTH = 20
+
+
+class HideOnDeleteMixin:
+    """Delete by hiding the rows with `hide` (see shared.deletion).
+
+    The confirmation page only lists the selection: collecting every cascaded
+    row is the cost `manage.py purge` spreads over batches.
+    """
+
+    hide = None
+
+    def get_deleted_objects(self, objs, request):
+        count = objs.count() if isinstance(objs, QuerySet) else len(objs)
+        preview = [str(obj) for obj in objs[:DELETE_PREVIEW_LENGTH]]
+        return preview, {self.opts.verbose_name_plural: count}, set(), []
+
+    def delete_model(self, request, obj):
+        self.hide(self.model._default_manager.filter(pk=obj.pk))
+
+    def delete_queryset(self, request, queryset):
+        self.hide(queryset)
+
+
+class ContentAdmin(HideOnDeleteMixin, admin.ModelAdmin):
+    """Changelist for echos and waves, which are too many to count or scan.
+
+    Searches go through the full-text index (or `@username` for an author),
+    the date hierarchy and the default ordering through the created_at indexes.
+    """
+
+    search_kind = None
+    search_fields = ('content',)
+    search_help_text = 'Words in the content, or @username for everything by a user.'
+    date_hierarchy = 'created_at'
+    show_full_result_count = False
+
+    @admin.display(description='content')
+    def content_excerpt(self, obj):
+        return Truncator(obj.content).chars(EXCERPT_LENGTH)
+
+    def get_search_results(self, request, queryset, search_term):
+        if not (search_term := search_term.strip()):
+            return queryset, False
+        if search_term.startswith('@'):
+            return queryset.filter(user__username=search_term[1:]), False
+        return queryset.filter(pk__in=engine.matching(search_term, self.search_kind)), False
@@ -0,0 +1,169 @@
+"""Pub/sub brokers for pushing live updates to WebSocket clients.
+
+`publish()` is synchronous so views can call it (usually from
+`transaction.on_commit`); `subscribe()` is an async context manager yielding
+an `asyncio.Queue` of messages for the ASGI side. The broker in use is chosen
+by settings.LIVE_BROKER, in the same shape as a CACHES entry:
+
+    LIVE_BROKER = {'BACKEND': 'shared.broker.RedisBroker', 'LOCATION': 'redis://...'}
+
+`InProcessBroker` only reaches subscribers in the publishing process, which is
+enough for a single ASGI worker. `RedisBroker` speaks the Redis protocol
+(PUBLISH/SUBSCRIBE) to any compatible server, so every worker sees every
+message.
+
+Subscribers that fall `MAX_PENDING` messages behind lose the newest ones
+rather than growing without bound. A `None` message means the subscription
+was lost and the subscriber should give up.
+"""
+
+import asyncio
+import socket
+from contextlib import asynccontextmanager
+from functools import cache
+from threading import Lock
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+MAX_PENDING = 100
+
+
+@cache
+def get_broker():
+    config = settings.LIVE_BROKER
+    return import_string(config['BACKEND'])(config.get('LOCATION'), config.get('OPTIONS', {}))
+
+
+class BaseBroker:
+    def __init__(self, location, options):
+        self.location = location
+        self.max_pending = options.get('MAX_PENDING', MAX_PENDING)
+
+    def publish(self, channel, message):
+        raise NotImplementedError
+
+    def subscribe(self, channel):
+        raise NotImplementedError
+
+
+def _offer(queue, message):
+    if not queue.full():
+        queue.put_nowait(message)
+
+
+class InProcessBroker(BaseBroker):
+    def __init__(self, location, options):
+        super().__init__(location, options)
+        self._subscribers = {}
+        self._lock = Lock()
+
+    def publish(self, channel, message):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for loop, queue in subscribers:
+            # Views run in worker threads: hand the message to the subscriber's loop.
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(_offer, queue, message)
+        return len(subscribers)
+
+    @asynccontextmanager
+    async def subscribe(self, channel):
+        subscriber = (asyncio.get_running_loop(), asyncio.Queue(self.max_pending))
+        with self._lock:
+            self._subscribers.setdefault(channel, set()).add(subscriber)
+        try:
+            yield subscriber[1]
+        finally:
+            with self._lock:
+                self._subscribers[channel].discard(subscriber)
+                if not self._subscribers[channel]:
+                    del self._subscribers[channel]
+
+
+def encode_command(*args):
+    parts = [f'*{len(args)}\r\n'.encode()]
+    for arg in args:
+        arg = arg if isinstance(arg, bytes) else str(arg).encode()
+        parts.append(b'$%d\r\n%s\r\n' % (len(arg), arg))
+    return b''.join(parts)
+
+
+async def read_reply(reader):
+    """Read one RESP reply from an asyncio stream."""
+    line = (await reader.readline()).rstrip(b'\r\n')
+    if not line:
+        raise ConnectionError('Connection closed by the broker')
+    kind, rest = line[:1], line[1:]
+    if kind == b'+':
+        return rest.decode()
+    if kind == b'-':
+        raise ConnectionError(rest.decode())
+    if kind == b':':
+        return int(rest)
+    if kind == b'$':
+        if (size := int(rest)) < 0:
+            return None
+        return (await reader.readexactly(size + 2))[:-2]
+    if kind == b'*':
+        return [await read_reply(reader) for _ in range(int(rest))]
+    raise ConnectionError(f'Unexpected reply from the broker: {line!r}')
+
+
+class RedisBroker(BaseBroker):
+    def __init__(self, location, options):
+        super().__init__(location, options)
+        url = urlsplit(location)
+        self.host = url.hostname or 'localhost'
+        self.port = url.port or 6379
+        self.password = url.password
+        self.timeout = options.get('TIMEOUT', 1)
+
+    def _handshake(self):
+        return encode_command('AUTH', self.password) if self.password else b''
+
+    def publish(self, channel, message):
+        # A short-lived connection per publish: writes are rare next to reads.
+        with socket.create_connection((self.host, self.port), self.timeout) as sock:
+            sock.sendall(self._handshake() + encode_command('PUBLISH', channel, message))
+            replies = sock.makefile('rb')
+            if self.password:
+                self._check(replies.readline())
+            return int(self._check(replies.readline())[1:])
+
+    @staticmethod
+    def _check(line):
+        if line.startswith(b'-'):
+            raise ConnectionError(line[1:].strip().decode())
+        return line.strip()
+
+    @asynccontextmanager
+    async def subscribe(self, channel):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        queue = asyncio.Queue(self.max_pending)
+
+        async def listen():
+            try:
+                while True:
+                    reply = await read_reply(reader)
+                    if isinstance(reply, list) and reply[0] == b'message':
+                        _offer(queue, reply[2].decode())
+            except (ConnectionError, asyncio.IncompleteReadError):
+                while queue.full():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+
+        try:
+            writer.write(self._handshake() + encode_command('SUBSCRIBE', channel))
+            await writer.drain()
+            if self.password:
+                await read_reply(reader)
+            await read_reply(reader)  # Subscription confirmation.
+            listener = asyncio.create_task(listen())
+            try:
+                yield queue
+            finally:
+                listener.cancel()
+        finally:
+            writer.close()
@@ -0,0 +1,148 @@
+"""Cache backends for Tribu.
+
+`TieredCache` keeps a small, size-bounded LRU copy of hot keys in process
+memory in front of a shared cache (file based or any Redis-protocol server),
+so repeated reads within a worker never leave the process while every worker
+still sees the same data. Each app gets its own alias (`echos`, `waves`,
+`users`) whose KEY_PREFIX namespaces its keys.
+
+Entries only live in the local tier for LOCAL_TIMEOUT seconds, which bounds
+how stale a worker can be after another worker writes or deletes a key.
+
+`clear()` only drops the keys of its own alias. The shared tier can't list
+keys by prefix, so each alias keeps a generation in it that is part of every
+key: clearing starts a new generation, and the old keys expire unread. Workers
+pick up a new generation within LOCAL_TIMEOUT seconds, like any other write.
+"""
+
+import time
+from collections import Counter
+from threading import Lock
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.locmem import LocMemCache
+
+_stats = {}
+_stats_lock = Lock()
+
+
+class TieredCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.location = location
+        self._shared_alias = options.get('SHARED', 'shared')
+        self._local_timeout = options.get('LOCAL_TIMEOUT', 5)
+        self._local = LocMemCache(
+            f'tiered:{location}',
+            {'OPTIONS': {'MAX_ENTRIES': options.get('LOCAL_MAX_ENTRIES', 1000)}},
+        )
+        self._generation_key = f'tiered:{location}:generation'
+        with _stats_lock:
+            self._stats = _stats.setdefault(location, Counter())
+
+    @property
+    def _shared(self):
+        return caches[self._shared_alias]
+
+    def _count(self, event):
+        with _stats_lock:
+            self._stats[event] += 1
+
+    def stats(self):
+        with _stats_lock:
+            return {event: self._stats[event] for event in ('local_hits', 'shared_hits', 'misses')}
+
+    def reset_stats(self):
+        with _stats_lock:
+            self._stats.clear()
+
+    def _generation(self):
+        if (generation := self._local.get(self._generation_key)) is None:
+            # A generation evicted from the shared tier only clears the alias again.
+            self._shared.add(self._generation_key, time.time_ns(), None)
+            generation = self._shared.get(self._generation_key)
+            self._local.set(self._generation_key, generation, self._local_timeout)
+        return generation
+
+    def make_key(self, key, version=None):
+        return super().make_key(f'{self._generation()}:{key}', version)
+
+    def _local_timeout_for(self, timeout):
+        timeout = self._timeout(timeout)
+        if timeout is None:
+            return self._local_timeout
+        return min(timeout, self._local_timeout)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        if added := self._shared.add(key, value, self._timeout(timeout)):
+            self._local.set(key, value, self._local_timeout_for(timeout))
+        return added
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        sentinel = object()
+        if (value := self._local.get(key, sentinel)) is not sentinel:
+            self._count('local_hits')
+            return value
+        if (value := self._shared.get(key, sentinel)) is not sentinel:
+            self._count('shared_hits')
+            self._local.set(key, value, self._local_timeout)
+            return value
+        self._count('misses')
+        return default
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        self._shared.set(key, value, self._timeout(timeout))
+        self._local.set(key, value, self._local_timeout_for(timeout))
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._shared.touch(key, self._timeout(timeout))
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        self._local.delete(key)
+        return self._shared.delete(key)
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        self._local.delete(key)
+        return self._shared.incr(key, delta)
+
+    def clear(self):
+        """Drop this alias's keys, leaving other aliases and the shared tier's own."""
+        generation = time.time_ns()
+        self._shared.set(self._generation_key, generation, None)
+        self._local.clear()
+        self._local.set(self._generation_key, generation, self._local_timeout)
+
+    def _timeout(self, timeout):
+        # Tiers take timeouts in seconds, like any other cache client.
+        return self.default_timeout if timeout is DEFAULT_TIMEOUT else timeout
+
+
+class CountingLocMemCache(LocMemCache):
+    """In-memory stand-in for the shared tier, used by the test suite.
+
+    It behaves like the file or Redis tier from the point of view of
+    `TieredCache` and counts round-trips so tests can assert on them.
+    """
+
+    def __init__(self, name, params):
+        super().__init__(name, params)
+        with _stats_lock:
+            self.calls = _stats.setdefault(f'shared:{name}', Counter())
+
+    def get(self, key, default=None, version=None):
+        with _stats_lock:
+            self.calls['get'] += 1
+        return super().get(key, default, version)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        with _stats_lock:
+            self.calls['set'] += 1
+        return super().set(key, value, timeout, version)
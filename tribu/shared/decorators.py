@@ -0,0 +1,72 @@
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from django.contrib.messages import get_messages
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+def async_login_required(view_func):
+    """`login_required` for async views that also resolves `request.user`.
+
+    Templates read `request.user` synchronously, which would hit the session
+    and the database from the event loop. Loading it once with `auser()`
+    keeps every query of the view on the async ORM path.
+    """
+
+    @login_required
+    @wraps(view_func)
+    async def wrapper(request, *args, **kwargs):
+        request.user = await request.auser()
+        return await view_func(request, *args, **kwargs)
+
+    return wrapper
+
+
+def viewer_etag(request, *parts):
+    """Weak ETag for `parts` as seen by the current viewer.
+
+    Pages show the viewer's header and owner-only controls, and embed a CSRF
+    token, so the user, their avatar and the CSRF cookie are part of the tag.
+    """
+    user = request.user
+    profile = getattr(user, 'profile', None)
+    csrf_cookie = request.COOKIES.get(settings.CSRF_COOKIE_NAME)
+    viewer = (user.pk, profile and profile.avatar.name, csrf_cookie)
+    digest = hashlib.md5(repr((viewer, parts)).encode(), usedforsecurity=False).hexdigest()
+    return f'W/"{digest}"'
+
+
+def async_condition(validators):
+    """`condition` for async views, computing both validators in one coroutine.
+
+    `validators(request, *args, **kwargs)` returns an `(etag, last_modified)`
+    pair, either of which may be None. Django's `condition` calls its
+    functions synchronously, so they couldn't use the async ORM. Requests with
+    pending messages always get the full page so the messages are shown.
+    """
+
+    def decorator(view_func):
+        @wraps(view_func)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or len(get_messages(request)):
+                return await view_func(request, *args, **kwargs)
+
+            etag, last_modified = await validators(request, *args, **kwargs)
+            etag = quote_etag(etag) if etag else None
+            last_modified = int(last_modified.timestamp()) if last_modified else None
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = await view_func(request, *args, **kwargs)
+
+            if last_modified and not response.has_header('Last-Modified'):
+                response.headers['Last-Modified'] = http_date(last_modified)
+            if etag:
+                response.headers.setdefault('ETag', etag)
+            return response
+
+        return wrapper
+
+    return decorator
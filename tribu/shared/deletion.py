@@ -0,0 +1,183 @@
+"""Two-phase deletion of echos, waves and users.
+
+Deleting a big thread or a prolific account through `Model.delete()` makes
+the collector load and delete every cascaded row (with its signals) in one
+request and one transaction. Instead:
+
+1. `hide_echos()`, `hide_waves()` and `hide_users()` flag the rows with
+   `deleted_at`, which the default managers filter out, and adjust the
+   denormalized counters in bulk. This is a handful of UPDATEs.
+2. `purge()` (`manage.py purge`, or the `shared.purge` job queued by each
+   hide and scheduled in JOBS_SCHEDULE) removes the flagged rows and their cascades
+   in batches of `batch_size`, each in its own short transaction, with raw
+   DELETEs: the counters they would have touched are adjusted per batch, so
+   no signal needs to run.
+
+Waves of a deleted echo are not flagged (that would rewrite the whole
+thread): they can only be reached through their echo, and their authors'
+counters are adjusted as they are purged.
+
+Echos and waves are hidden and purged on every shard (see shards.directory).
+"""
+
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.utils import timezone
+
+from echos.models import ECHO_COUNT_CACHE_KEY, Echo, TimelineEntry
+from jobs.queue import enqueue
+from users.backends import current_user_cache_key
+from users.models import Follow, Profile
+from waves.models import Wave
+
+
+def decrement_counts(rows, fk, model, field, outer='pk', using=DEFAULT_DB_ALIAS):
+    """Subtract from `model.field` how many `rows` point at each instance.
+
+    `model` is updated in database `using`: in one UPDATE if `rows` are there
+    too, otherwise (rows on another shard) with one UPDATE per distinct count.
+    """
+    targets = model.objects.using(using)
+    if rows.db == using:
+        counts = rows.filter(**{fk: OuterRef(outer)}).order_by().values(fk)
+        counts = Subquery(counts.annotate(c=Count('pk')).values('c'))
+        targets = targets.filter(**{f'{outer}__in': rows.values(fk)})
+        return targets.update(**{field: F(field) - counts})
+    by_count = defaultdict(list)
+    for key, count in rows.order_by().values(fk).annotate(c=Count('pk')).values_list(fk, 'c'):
+        by_count[count].append(key)
+    return sum(
+        targets.filter(**{f'{outer}__in': keys}).update(**{field: F(field) - count})
+        for count, keys in by_count.items()
+    )
+
+
+def hide_echos(echos):
+    """Hide `echos` (a queryset) now and leave their waves to `purge()`."""
+    cards = []
+    hidden = 0
+    now = timezone.now()
+    with transaction.atomic():
+        for alias in settings.DATABASE_SHARDS:
+            shard_echos = Echo.objects.using(alias).filter(pk__in=echos.values('pk'))
+            with transaction.atomic(using=alias, savepoint=False):
+                cards += [
+                    Echo(pk=pk, updated_at=updated_at).card_cache_key
+                    for pk, updated_at in shard_echos.values_list('pk', 'updated_at')
+                ]
+                decrement_counts(shard_echos, 'user', Profile, 'echos_count', outer='user')
+                hidden += shard_echos.update(deleted_at=now)
+        enqueue('shared.purge', key='purge')
+    caches['echos'].delete_many([ECHO_COUNT_CACHE_KEY, *cards])
+    return hidden
+
+
+def hide_waves(waves):
+    """Hide `waves` (a queryset) now and leave the rows to `purge()`."""
+    hidden = 0
+    now = timezone.now()
+    with transaction.atomic():
+        for alias in settings.DATABASE_SHARDS:
+            shard_waves = Wave.objects.using(alias).filter(
+                pk__in=waves.values('pk'), echo__deleted_at__isnull=True
+            )
+            with transaction.atomic(using=alias, savepoint=False):
+                decrement_counts(shard_waves, 'echo', Echo, 'waves_count', using=alias)
+                decrement_counts(shard_waves, 'user', Profile, 'waves_count', outer='user')
+                hidden += shard_waves.update(deleted_at=now)
+        enqueue('shared.purge', key='purge')
+    return hidden
+
+
+def hide_users(users):
+    """Deactivate `users` (a queryset) and hide their profiles, echos and waves."""
+    user_ids = list(users.values_list('pk', flat=True))
+    now = timezone.now()
+    with transaction.atomic():
+        get_user_model().objects.filter(pk__in=user_ids).update(is_active=False)
+        # Users without a profile (e.g. created by createsuperuser) get one to carry the flag.
+        Profile.all_objects.bulk_create(
+            [Profile(user_id=pk) for pk in user_ids], ignore_conflicts=True
+        )
+        Profile.all_objects.filter(user_id__in=user_ids).update(
+            deleted_at=now, echos_count=0, waves_count=0
+        )
+        for alias in settings.DATABASE_SHARDS:
+            with transaction.atomic(using=alias, savepoint=False):
+                waves = Wave.objects.using(alias).filter(
+                    user_id__in=user_ids, echo__deleted_at__isnull=True
+                )
+                decrement_counts(waves, 'echo', Echo, 'waves_count', using=alias)
+                Wave.objects.using(alias).filter(user_id__in=user_ids).update(deleted_at=now)
+                Echo.objects.using(alias).filter(user_id__in=user_ids).update(deleted_at=now)
+        enqueue('shared.purge', key='purge')
+    caches['echos'].delete(ECHO_COUNT_CACHE_KEY)
+    caches['users'].delete_many([current_user_cache_key(pk) for pk in user_ids])
+    return len(user_ids)
+
+
+def purge_rows(rows, batch_size, before_delete=None):
+    """Raw-delete `rows` in batches, calling `before_delete(batch)` first in each."""
+    model = rows.model
+    purged = 0
+    while pks := list(rows.values_list('pk', flat=True)[:batch_size]):
+        batch = model._base_manager.using(rows.db).filter(pk__in=pks)
+        with transaction.atomic(using=rows.db):
+            if before_delete:
+                before_delete(batch)
+            purged += batch._raw_delete(batch.db)
+    return purged
+
+
+def discount_waves(batch):
+    # Only waves still counted: hidden ones were discounted when hidden.
+    waves = batch.filter(deleted_at__isnull=True)
+    decrement_counts(waves, 'user', Profile, 'waves_count', outer='user')
+
+
+def discount_follows(batch):
+    decrement_counts(batch, 'followed', Profile, 'followers_count', outer='user')
+
+
+def purge(batch_size=None):
+    """Remove everything hidden so far; return the number of rows deleted per model."""
+    batch_size = batch_size or settings.PURGE_BATCH_SIZE
+    purged = {'echos': 0, 'waves': 0, 'timeline entries': 0, 'follows': 0, 'users': 0}
+
+    for alias in settings.DATABASE_SHARDS:
+        echos = Echo.all_objects.using(alias).filter(deleted_at__isnull=False)
+        for echo_pk in echos.values_list('pk', flat=True):
+            purged['waves'] += purge_rows(
+                Wave.all_objects.using(alias).filter(echo_id=echo_pk), batch_size, discount_waves
+            )
+            purged['timeline entries'] += purge_rows(
+                TimelineEntry.objects.using(DEFAULT_DB_ALIAS).filter(echo_id=echo_pk), batch_size
+            )
+            purged['echos'] += purge_rows(
+                Echo.all_objects.using(alias).filter(pk=echo_pk), batch_size
+            )
+
+        purged['waves'] += purge_rows(
+            Wave.all_objects.using(alias).filter(deleted_at__isnull=False), batch_size
+        )
+
+    users = Profile.all_objects.filter(deleted_at__isnull=False).values_list('user_id', flat=True)
+    for user_pk in users:
+        purged['follows'] += purge_rows(
+            Follow.objects.filter(follower_id=user_pk), batch_size, discount_follows
+        )
+        purged['follows'] += purge_rows(Follow.objects.filter(followed_id=user_pk), batch_size)
+        # Entries of their own echos went with the echos above.
+        purged['timeline entries'] += purge_rows(
+            TimelineEntry.objects.filter(owner_id=user_pk), batch_size
+        )
+        # Only the user and its profile are left: the regular delete is cheap now.
+        get_user_model().objects.filter(pk=user_pk).delete()
+        purged['users'] += 1
+
+    return purged
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from shared.deletion import purge
+
+
+class Command(BaseCommand):
+    help = 'Remove deleted echos, waves and users with their cascades, in bounded batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            help='Rows deleted per statement (defaults to settings.PURGE_BATCH_SIZE)',
+        )
+
+    def handle(self, *args, **options):
+        for label, count in purge(options['batch_size']).items():
+            self.stdout.write(f'{label}: {count} purged')
@@ -0,0 +1,86 @@
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from echos.models import Echo
+from shards import directory
+from users.models import Follow, Profile
+from waves.models import Wave
+
+
+def count_of(model, fk, outer):
+    rows = model.objects.filter(**{fk: OuterRef(outer)}).order_by().values(fk)
+    return Coalesce(Subquery(rows.annotate(c=Count('pk')).values('c')), 0)
+
+
+def totals(model, fk):
+    """How many `model` rows point at each `fk`, over every shard."""
+    counts = Counter()
+    for rows in directory.scatter(model.objects.order_by()):
+        counts.update(dict(rows.values(fk).annotate(c=Count('pk')).values_list(fk, 'c')))
+    return counts
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the denormalized echo/wave/follower counters and report drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Only report drifted counters (exit with error if any) without fixing them',
+        )
+
+    def counters(self):
+        """Yield (label, rows, field, actual) for each counter.
+
+        `actual` is a subquery counting in the same database or, when profiles
+        count the echos and waves of several shards, a dict of counts by user.
+        """
+        sharded = directory.is_sharded()
+        for alias in settings.DATABASE_SHARDS:
+            label = f'Echo.waves_count ({alias})' if sharded else 'Echo.waves_count'
+            yield label, Echo.objects.using(alias), 'waves_count', count_of(Wave, 'echo', 'pk')
+        for model, field in ((Echo, 'echos_count'), (Wave, 'waves_count')):
+            actual = totals(model, 'user') if sharded else count_of(model, 'user', 'user')
+            yield f'Profile.{field}', Profile.objects, field, actual
+        followers = count_of(Follow, 'followed', 'user')
+        yield 'Profile.followers_count', Profile.objects, 'followers_count', followers
+
+    def drift(self, rows, field, actual):
+        """Return how many `rows` drifted and a function fixing them."""
+        if not isinstance(actual, dict):
+            drift = rows.annotate(actual=actual).exclude(**{field: F('actual')}).count()
+            return drift, lambda: rows.update(**{field: actual})
+
+        drifted = defaultdict(list)
+        for user_id, value in rows.values_list('user_id', field):
+            if value != actual[user_id]:
+                drifted[actual[user_id]].append(user_id)
+
+        def fix():
+            for value, user_ids in drifted.items():
+                rows.filter(user_id__in=user_ids).update(**{field: value})
+
+        return sum(map(len, drifted.values())), fix
+
+    def handle(self, *args, **options):
+        total_drift = 0
+        with transaction.atomic():
+            for label, rows, field, actual in self.counters():
+                drift, fix = self.drift(rows, field, actual)
+                total_drift += drift
+                if drift and not options['check']:
+                    fix()
+                    self.stdout.write(self.style.WARNING(f'{label}: fixed {drift} drifted rows'))
+                elif drift:
+                    self.stdout.write(self.style.WARNING(f'{label}: {drift} drifted rows'))
+                else:
+                    self.stdout.write(self.style.SUCCESS(f'{label}: ok'))
+
+        if options['check'] and total_drift:
+            raise CommandError(f'{total_drift} counters have drifted')
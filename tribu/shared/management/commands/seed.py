@@ -0,0 +1,218 @@
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import UTC, datetime, timedelta
+
+import django
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connection, connections, transaction
+from django.utils import timezone
+
+from echos.models import Echo
+from shared.db import manual_timestamps
+from shards import directory
+from users.models import Profile
+from waves.models import Wave
+
+# Users are generated in fixed-size chunks, each with its own RNG derived from
+# the seed, so the dataset is identical whatever the number of workers.
+CHUNK_USERS = 1000
+VOCABULARY_SIZE = 3000
+# Content ends at a fixed moment (not the current time) so a seed always
+# produces the same timestamps.
+EPOCH = datetime(2025, 1, 1, tzinfo=UTC)
+
+
+def vocabulary(seed):
+    try:
+        from faker import Faker
+    except ImportError:
+        raise CommandError('seed needs the "faker" dev dependency (uv sync --group dev)')
+    fake = Faker()
+    fake.seed_instance(seed)
+    return fake.words(VOCABULARY_SIZE), [fake.user_name() for _ in range(CHUNK_USERS)]
+
+
+def username(names, i):
+    return f'{names[i % len(names)]}{i}'
+
+
+def aware_datetime(value):
+    moment = datetime.fromisoformat(value)
+    return moment if timezone.is_aware(moment) else timezone.make_aware(moment)
+
+
+def sentence(rng, words, min_words, max_words):
+    return ' '.join(rng.choices(words, k=rng.randint(min_words, max_words))).capitalize() + '.'
+
+
+def seed_chunk(chunk, options, words, names, password):
+    """Insert the users of `chunk` with their profiles, echos and waves.
+
+    Return the users and echos created, and the number of waves.
+    """
+    rng = random.Random(f'{options["seed"]}:{chunk}')
+    batch_size = options['batch_size']
+    first = chunk * CHUNK_USERS
+    last = min(first + CHUNK_USERS, options['users'])
+    now = options['now']
+    since = now - timedelta(days=options['days'])
+    span = (now - since).total_seconds()
+
+    def moment(after=since):
+        return after + timedelta(seconds=rng.uniform(0, (now - after).total_seconds()))
+
+    User = get_user_model()
+    with transaction.atomic(), manual_timestamps(Echo, Wave):
+        users = User.objects.bulk_create(
+            (
+                User(
+                    username=username(names, i),
+                    password=password,
+                    date_joined=since + timedelta(seconds=span * i / options['users']),
+                )
+                for i in range(first, last)
+            ),
+            batch_size=batch_size,
+        )
+        Profile.objects.bulk_create(
+            (Profile(user=user, bio=sentence(rng, words, 0, 20)) for user in users),
+            batch_size=batch_size,
+        )
+        # bulk_create writes echos and waves to the primary database, whatever
+        # shard a new user would be given.
+        directory.place_users(users, shard=DEFAULT_DB_ALIAS)
+
+        echos = []
+        for user in users:
+            for _ in range(rng.randint(0, 2 * options['echos_per_user'])):
+                created_at = moment()
+                echos.append(
+                    Echo(
+                        user=user,
+                        content=sentence(rng, words, 5, 60),
+                        created_at=created_at,
+                        updated_at=created_at,
+                    )
+                )
+        echos = Echo.objects.bulk_create(echos, batch_size=batch_size)
+
+        waves = 0
+        batch = []
+        for echo in echos:
+            for _ in range(rng.randint(0, 2 * options['waves_per_echo'])):
+                created_at = moment(echo.created_at)
+                batch.append(
+                    Wave(
+                        echo=echo,
+                        user=rng.choice(users),
+                        content=sentence(rng, words, 3, 30),
+                        created_at=created_at,
+                        updated_at=created_at,
+                    )
+                )
+                if len(batch) >= batch_size:
+                    waves += len(Wave.objects.bulk_create(batch))
+                    batch = []
+        waves += len(Wave.objects.bulk_create(batch))
+
+    return users, echos, waves
+
+
+def count_chunk(*args):
+    users, echos, waves = seed_chunk(*args)
+    return len(users), len(echos), waves
+
+
+def init_worker():
+    django.setup()
+
+
+def chunks(options):
+    """Arguments of `seed_chunk` for each chunk of the dataset."""
+    words, names = vocabulary(options['seed'])
+    usernames = [username(names, i) for i in range(options['users'])]
+    User = get_user_model()
+    for start in range(0, len(usernames), options['batch_size']):
+        batch = usernames[start : start + options['batch_size']]
+        existing = User.objects.filter(username__in=batch).values_list('username', flat=True)
+        if taken := existing.first():
+            raise CommandError(
+                f'User {taken!r} of seed {options["seed"]} exists already: '
+                'seed an empty database, or pick another --seed'
+            )
+    password = make_password('1234')
+    count = -(-len(usernames) // CHUNK_USERS)
+    return [(chunk, options, words, names, password) for chunk in range(count)]
+
+
+def generate(users, echos_per_user, waves_per_echo, days=365, batch_size=5000, seed=0, now=EPOCH):
+    """Seed a dataset in this process and return the users and echos created."""
+    options = {
+        'users': users,
+        'echos_per_user': echos_per_user,
+        'waves_per_echo': waves_per_echo,
+        'days': days,
+        'batch_size': batch_size,
+        'seed': seed,
+        'now': now,
+    }
+    created_users, created_echos = [], []
+    for job in chunks(options):
+        chunk_users, chunk_echos, _ = seed_chunk(*job)
+        created_users += chunk_users
+        created_echos += chunk_echos
+    return created_users, created_echos
+
+
+class Command(BaseCommand):
+    help = 'Generate a reproducible synthetic dataset of users, profiles, echos and waves'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument(
+            '--echos-per-user', type=int, default=20, help='Average echos per user'
+        )
+        parser.add_argument(
+            '--waves-per-echo', type=int, default=5, help='Average waves per echo'
+        )
+        parser.add_argument('--days', type=int, default=365, help='Spread content over N days')
+        parser.add_argument(
+            '--now',
+            type=aware_datetime,
+            default=EPOCH,
+            help=f'ISO date the content ends at (defaults to {EPOCH.date()})',
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--workers', type=int, default=1)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        if workers > 1 and connection.vendor == 'sqlite':
+            self.stderr.write('SQLite allows a single writer, seeding with one worker.')
+            workers = 1
+
+        jobs = chunks(options)
+
+        start = time.perf_counter()
+        if workers > 1:
+            connections.close_all()
+            with ProcessPoolExecutor(workers, initializer=init_worker) as pool:
+                totals = list(pool.map(count_chunk, *zip(*jobs)))
+        else:
+            totals = [count_chunk(*job) for job in jobs]
+        elapsed = time.perf_counter() - start
+
+        users, echos, waves = (sum(column) for column in zip(*totals))
+        rows = users * 2 + echos + waves
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Created {users} users, {echos} echos and {waves} waves '
+                f'in {elapsed:.1f}s ({rows / elapsed:,.0f} rows/s)'
+            )
+        )
+        call_command('recount', stdout=self.stdout)
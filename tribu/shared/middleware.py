@@ -0,0 +1,41 @@
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.utils.decorators import sync_and_async_middleware
+
+from .routers import RequestState, request_state
+
+PIN_COOKIE = 'tribu_primary'
+
+
+def pin_response(state, response):
+    if state.wrote:
+        response.set_cookie(
+            PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS, httponly=True, samesite='Lax'
+        )
+    return response
+
+
+@sync_and_async_middleware
+def primary_pin_middleware(get_response):
+    """Read from the primary database after a write (see shared.routers)."""
+    if iscoroutinefunction(get_response):
+
+        async def middleware(request):
+            state = RequestState(pinned=PIN_COOKIE in request.COOKIES)
+            token = request_state.set(state)
+            try:
+                return pin_response(state, await get_response(request))
+            finally:
+                request_state.reset(token)
+
+    else:
+
+        def middleware(request):
+            state = RequestState(pinned=PIN_COOKIE in request.COOKIES)
+            token = request_state.set(state)
+            try:
+                return pin_response(state, get_response(request))
+            finally:
+                request_state.reset(token)
+
+    return middleware
@@ -0,0 +1,157 @@
+import base64
+import heapq
+import json
+from dataclasses import dataclass, field
+from itertools import groupby, islice
+from operator import attrgetter
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(direction, position):
+    created_at, pk = position
+    payload = json.dumps({'d': direction, 't': created_at.isoformat(), 'pk': pk})
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        direction, created_at, pk = payload['d'], parse_datetime(payload['t']), int(payload['pk'])
+    except (ValueError, TypeError, KeyError):
+        raise InvalidCursor(cursor)
+    if direction not in (NEXT, PREVIOUS) or created_at is None:
+        raise InvalidCursor(cursor)
+    return direction, (created_at, pk)
+
+
+@dataclass
+class CursorPage:
+    object_list: list = field(default_factory=list)
+    next_cursor: str | None = None
+    previous_cursor: str | None = None
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class CursorPaginator:
+    """Keyset pagination over (created_at, pk).
+
+    Each page is fetched with a ``WHERE (created_at, pk) < (...) LIMIT n``
+    style query, so its cost doesn't depend on how deep into the listing
+    the client is. Cursors are opaque to clients.
+    """
+
+    def __init__(self, queryset, page_size, descending=True):
+        self.queryset = queryset
+        self.page_size = page_size
+        self.descending = descending
+
+    def _ordering(self, forwards):
+        prefix = '-' if self.descending == forwards else ''
+        return (f'{prefix}created_at', f'{prefix}pk')
+
+    def _after(self, position, forwards):
+        created_at, pk = position
+        lookup = 'lt' if self.descending == forwards else 'gt'
+        return Q(**{f'created_at__{lookup}': created_at}) | Q(
+            created_at=created_at, **{f'pk__{lookup}': pk}
+        )
+
+    def _position(self, cursor):
+        direction, position = decode_cursor(cursor) if cursor else (NEXT, None)
+        return position, direction == NEXT
+
+    def _slice(self, queryset, position, forwards):
+        queryset = queryset.order_by(*self._ordering(forwards))
+        if position is not None:
+            queryset = queryset.filter(self._after(position, forwards))
+        # Fetch one extra row to know whether there is more in this direction.
+        return queryset[: self.page_size + 1]
+
+    def _query(self, cursor):
+        position, forwards = self._position(cursor)
+        return self._slice(self.queryset, position, forwards), position, forwards
+
+    def _page(self, rows, position, forwards):
+        has_more = len(rows) > self.page_size
+        rows = rows[: self.page_size]
+        if not forwards:
+            rows.reverse()
+
+        if forwards:
+            has_next, has_previous = has_more, position is not None
+        else:
+            has_next, has_previous = position is not None, has_more
+
+        page = CursorPage(rows)
+        if rows and has_next:
+            last = rows[-1]
+            page.next_cursor = encode_cursor(NEXT, (last.created_at, last.pk))
+        if rows and has_previous:
+            first = rows[0]
+            page.previous_cursor = encode_cursor(PREVIOUS, (first.created_at, first.pk))
+        return page
+
+    def page(self, cursor=None):
+        queryset, position, forwards = self._query(cursor)
+        return self._page(list(queryset), position, forwards)
+
+    async def apage(self, cursor=None):
+        queryset, position, forwards = self._query(cursor)
+        return self._page([row async for row in queryset], position, forwards)
+
+
+class MergedCursorPaginator(CursorPaginator):
+    """CursorPaginator over several querysets (e.g. one per shard) merged on (created_at, pk).
+
+    Each queryset is paged with the same keyset condition and the pages are
+    merged, so a page costs one query of at most page size + 1 rows per queryset.
+    """
+
+    def __init__(self, querysets, page_size, descending=True):
+        super().__init__(None, page_size, descending)
+        self.querysets = querysets
+
+    def _merge(self, sources, forwards):
+        key = attrgetter('created_at', 'pk')
+        rows = heapq.merge(*sources, key=key, reverse=self.descending == forwards)
+        # A row being moved between shards is briefly found on both.
+        rows = (next(copies) for _, copies in groupby(rows, key))
+        return list(islice(rows, self.page_size + 1))
+
+    def _queries(self, cursor):
+        position, forwards = self._position(cursor)
+        queries = [self._slice(queryset, position, forwards) for queryset in self.querysets]
+        return queries, position, forwards
+
+    def page(self, cursor=None):
+        queries, position, forwards = self._queries(cursor)
+        rows = self._merge([list(query) for query in queries], forwards)
+        return self._page(rows, position, forwards)
+
+    async def apage(self, cursor=None):
+        queries, position, forwards = self._queries(cursor)
+        rows = self._merge([[row async for row in query] for query in queries], forwards)
+        return self._page(rows, position, forwards)
@@ -0,0 +1,47 @@
+"""Send reads to replicas and writes to the primary database.
+
+settings.DATABASE_REPLICAS lists the DATABASES aliases that serve reads; all
+writes go to `default`. Replicas lag behind the primary, so a client that just
+wrote (an echo, a wave, its profile...) would not find its own write on the
+page it is redirected to. `shared.middleware` tracks writes per request:
+once a request writes, the rest of it reads from the primary too, and the
+response sets a cookie that keeps the client's reads on the primary for
+REPLICA_PIN_SECONDS.
+
+Reads outside requests (management commands, the job worker, the shell) and
+reads inside a transaction always go to the primary.
+"""
+
+import random
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+@dataclass
+class RequestState:
+    pinned: bool = False
+    wrote: bool = False
+
+
+# Set by shared.middleware for the duration of a request
+request_state = ContextVar('request_state', default=None)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = request_state.get()
+        if state is None or state.pinned or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        if state := request_state.get():
+            state.pinned = state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary.
+        return True
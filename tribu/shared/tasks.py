@@ -0,0 +1,27 @@
+import io
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.management import call_command
+from django.utils import timezone
+
+from jobs.queue import task
+
+from . import deletion
+
+
+@task(priority=-10)
+def purge(batch_size=None):
+    deletion.purge(batch_size)
+
+
+@task(priority=-20)
+def recount():
+    call_command('recount', stdout=io.StringIO())
+
+
+@task(priority=-20)
+def clear_sessions(batch_size=None):
+    # `manage.py clearsessions` deletes every expired row in one statement.
+    expired = Session.objects.filter(expire_date__lt=timezone.now())
+    deletion.purge_rows(expired, batch_size or settings.PURGE_BATCH_SIZE)
@@ -17,12 +17,14 @@ user = Recipe(
 echo = Recipe(
     'echos.Echo',
     content=partial(fake.paragraph, nb_sentences=10),
+    deleted_at=None,
     _fill_optional=True,
 )
 
 wave = Recipe(
     'waves.Wave',
     content=partial(fake.sentence, nb_words=15),
+    deleted_at=None,
     _fill_optional=True,
 )
 
@@ -31,5 +33,6 @@ profile = Recipe(
     user=foreign_key(user),
     bio=partial(fake.text, max_nb_chars=200),
     avatar='path/to/default/avatar.jpg',
+    deleted_at=None,
     _fill_optional=True,
 )
@@ -2,7 +2,10 @@ import io
 import shutil
 
 import pytest
+from django.core.cache import caches
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from model_bakery import baker
 from PIL import Image
 
@@ -15,9 +18,11 @@ LOGOUT_URL = '/logout/'
 SIGNUP_URL = '/signup/'
 
 ECHO_LIST_URL = '/echos/'
+ECHO_HOME_URL = '/echos/home/'
 ECHO_DETAIL_URL = '/echos/{echo_pk}/'
 ECHO_ADD_URL = '/echos/add/'
 ECHO_WAVES_URL = '/echos/{echo_pk}/waves/'
+ECHO_WAVES_MORE_URL = '/echos/{echo_pk}/waves/more/'
 ECHO_EDIT_URL = '/echos/{echo_pk}/edit/'
 ECHO_DELETE_URL = '/echos/{echo_pk}/delete/'
 
@@ -31,12 +36,59 @@ USER_ECHOS_URL = '/users/{username}/echos/'
 
 PROFILE_ME_URL = '/users/@me/'
 PROFILE_EDIT_URL = '/users/{username}/edit/'
+PROFILE_FOLLOW_URL = '/users/{username}/follow/'
+PROFILE_UNFOLLOW_URL = '/users/{username}/unfollow/'
+
+SEARCH_URL = '/search/'
+
+ADMIN_ECHO_LIST_URL = '/admin/echos/echo/'
+ADMIN_ECHO_CHANGE_URL = '/admin/echos/echo/{echo_pk}/change/'
+ADMIN_WAVE_LIST_URL = '/admin/waves/wave/'
+ADMIN_WAVE_CHANGE_URL = '/admin/waves/wave/{wave_pk}/change/'
+ADMIN_PROFILE_LIST_URL = '/admin/users/profile/'
+
+# ==============================================================================
+# Helpers
+# ==============================================================================
+
+
+def count_queries(client, url):
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(url)
+    assert response.status_code == 200
+    return len(context.captured_queries)
+
+
+def assert_fixed_query_budget(client, url, add_rows):
+    """Check that rendering `url` doesn't cost more queries after `add_rows()`."""
+    budget = count_queries(client, url)
+    add_rows()
+    queries = count_queries(client, url)
+    assert queries <= budget, f'{url} ran {queries} queries, over its budget of {budget}.'
+
 
 # ==============================================================================
 # Fixtures
 # ==============================================================================
 
 
+@pytest.fixture(autouse=True)
+def test_caches(settings):
+    settings.CACHES = {
+        **settings.CACHES,
+        'shared': {
+            'BACKEND': 'shared.cache.CountingLocMemCache',
+            'LOCATION': 'tests',
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        },
+    }
+    for alias in settings.CACHES:
+        caches[alias].clear()
+    yield
+    for alias in settings.CACHES:
+        caches[alias].clear()
+
+
 @pytest.fixture
 def user():
     user = baker.make_recipe('tests.user')
@@ -1,6 +1,11 @@
+import threading
+
 import pytest
+from django.contrib.auth import hashers
+from model_bakery import baker
 from pytest_django.asserts import assertContains, assertNotContains
 
+from accounts import passwords
 from tests import conftest
 
 # ==============================================================================
@@ -84,6 +89,63 @@ def test_login_page_does_not_contains_login_link(client):
     assertNotContains(response, conftest.LOGIN_URL)
 
 
+@pytest.fixture
+def cheap_hashes(settings):
+    settings.PASSWORD_HASH_ITERATIONS = 1000
+
+
+@pytest.mark.django_db
+def test_login_rehashes_passwords_from_another_cost_profile(client, cheap_hashes):
+    user = baker.make_recipe('tests.user')
+    user.password = hashers.PBKDF2PasswordHasher().encode('secret', 'salt', iterations=2000)
+    user.save()
+
+    response = client.post(conftest.LOGIN_URL, {'username': user.username, 'password': 'secret'})
+    assert response.status_code == 302
+    user.refresh_from_db()
+    assert user.password.startswith('pbkdf2_sha256$1000$')
+    assert user.check_password('secret')
+
+
+@pytest.mark.django_db
+def test_login_checks_passwords_on_the_password_pool(client, cheap_hashes, monkeypatch):
+    user = baker.make_recipe('tests.user')
+    user.set_password('secret')
+    user.save()
+    threads = []
+
+    def verify(password, encoded):
+        threads.append(threading.current_thread().name)
+        return hashers.check_password(password, encoded), None
+
+    monkeypatch.setattr(passwords, 'verify', verify)
+    response = client.post(conftest.LOGIN_URL, {'username': user.username, 'password': 'secret'})
+    assert response.status_code == 302
+    assert len(threads) == 1
+    assert threads[0].startswith('passwords')
+
+
+@pytest.mark.django_db
+def test_login_is_turned_away_when_the_password_pool_is_full(client, cheap_hashes, settings):
+    settings.LOGIN_WORKERS, settings.LOGIN_QUEUE_SIZE, settings.LOGIN_RETRY_AFTER = 1, 0, 7
+    user = baker.make_recipe('tests.user')
+    user.set_password('secret')
+    user.save()
+    credentials = {'username': user.username, 'password': 'secret'}
+
+    _, slots = passwords._pool(1, 0)
+    slots.acquire()
+    try:
+        response = client.post(conftest.LOGIN_URL, credentials)
+    finally:
+        slots.release()
+    assert response.status_code == 503
+    assert response['Retry-After'] == '7'
+    assertContains(response, 'try again in a moment', status_code=503)
+
+    assert client.post(conftest.LOGIN_URL, credentials).status_code == 302
+
+
 # ==============================================================================
 # LOGOUT
 # ==============================================================================
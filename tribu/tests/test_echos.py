@@ -1,10 +1,28 @@
+import io
+import json
+import time
+from datetime import timedelta
+
 import pytest
+from asgiref.sync import async_to_sync, iscoroutinefunction, sync_to_async
+from asgiref.testing import ApplicationCommunicator
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.db import connection
 from django.template.defaultfilters import truncatewords
+from django.test import AsyncClient
+from django.test.utils import CaptureQueriesContext
+from django.utils.http import http_date
 from django.utils.timesince import timesince
 from model_bakery import baker
 from pytest_django.asserts import assertContains, assertNotContains
 
-from echos.models import Echo
+from echos import timeline, views
+from echos.models import Echo, TimelineEntry
+from main.asgi import application
+from users.models import Profile
+from waves import live
+from waves.models import Wave
 from tests import conftest
 
 
@@ -129,6 +147,80 @@ def test_echo_list_page_contains_add_echo_link(client, user):
     assertContains(response, conftest.ECHO_ADD_URL)
 
 
+@pytest.mark.django_db
+def test_echo_list_page_is_paginated_with_cursors(client, user, settings):
+    settings.ECHO_LIST_PAGE_SIZE = 4
+    echos = baker.make_recipe('tests.echo', _quantity=10)
+    echos = sorted(echos, key=lambda e: (e.created_at, e.pk), reverse=True)
+
+    client.force_login(user)
+    response = client.get(conftest.ECHO_LIST_URL)
+    assert response.status_code == 200
+    first_page = response.context['echos']
+    assert [echo.pk for echo in first_page] == [echo.pk for echo in echos[:4]]
+    assert not first_page.has_previous
+    assert first_page.has_next
+
+    response = client.get(conftest.ECHO_LIST_URL, {'cursor': first_page.next_cursor})
+    second_page = response.context['echos']
+    assert [echo.pk for echo in second_page] == [echo.pk for echo in echos[4:8]]
+    assert second_page.has_previous
+
+    response = client.get(conftest.ECHO_LIST_URL, {'cursor': second_page.next_cursor})
+    last_page = response.context['echos']
+    assert [echo.pk for echo in last_page] == [echo.pk for echo in echos[8:]]
+    assert not last_page.has_next
+
+    response = client.get(conftest.ECHO_LIST_URL, {'cursor': second_page.previous_cursor})
+    assert [echo.pk for echo in response.context['echos']] == [echo.pk for echo in echos[:4]]
+    assert not response.context['echos'].has_previous
+
+
+@pytest.mark.django_db
+def test_echo_list_page_shows_total_number_of_echos_across_pages(client, user, settings):
+    settings.ECHO_LIST_PAGE_SIZE = 4
+    baker.make_recipe('tests.echo', _quantity=10)
+
+    client.force_login(user)
+    response = client.get(conftest.ECHO_LIST_URL)
+    assert response.status_code == 200
+
+    assertContains(response, 'Tribu has posted 10 echos so far!')
+    assertContains(response, 'Older echos')
+    assertNotContains(response, 'Newer echos')
+
+
+@pytest.mark.django_db
+def test_echo_list_page_updates_total_number_of_echos_when_adding_echos(client, user):
+    baker.make_recipe('tests.echo', _quantity=2)
+
+    client.force_login(user)
+    response = client.get(conftest.ECHO_LIST_URL)
+    assertContains(response, 'Tribu has posted 2 echos so far!')
+
+    client.post(conftest.ECHO_ADD_URL, data={'content': 'One more echo'})
+    response = client.get(conftest.ECHO_LIST_URL)
+    assertContains(response, 'Tribu has posted 3 echos so far!')
+
+
+@pytest.mark.django_db
+def test_echo_list_page_redirects_on_invalid_cursor(client, user):
+    client.force_login(user)
+    response = client.get(conftest.ECHO_LIST_URL, {'cursor': 'not-a-cursor'})
+    assert response.status_code == 302
+    assert response.url == conftest.ECHO_LIST_URL
+
+
+@pytest.mark.django_db
+def test_echo_list_page_has_fixed_query_budget(client, user):
+    baker.make_recipe('tests.echo', _quantity=2)
+
+    client.force_login(user)
+    conftest.assert_fixed_query_budget(
+        client, conftest.ECHO_LIST_URL, lambda: baker.make_recipe('tests.echo', _quantity=10)
+    )
+
+
 # ==============================================================================
 # ADD ECHO
 # ==============================================================================
@@ -290,6 +382,28 @@ def test_echo_detail_page_shows_up_to_limit_waves(client, user, echo):
     assert wave_count == WAVE_LIMIT
 
 
+@pytest.mark.django_db
+def test_echo_detail_page_shows_latest_waves_first(client, user, echo, settings):
+    settings.ECHO_DETAIL_WAVES_LIMIT = 3
+    waves = baker.make_recipe('tests.wave', echo=echo, _quantity=6)
+    waves = sorted(waves, key=lambda w: (w.created_at, w.pk), reverse=True)
+
+    url = conftest.ECHO_DETAIL_URL.format(echo_pk=echo.pk)
+    client.force_login(user)
+    response = client.get(url)
+    assert response.status_code == 200
+
+    content = response.content.decode()
+    last_index = -1
+    for wave in waves[:3]:
+        current_index = content.index(wave.content)
+        assert current_index > last_index
+        last_index = current_index
+    for wave in waves[3:]:
+        assertNotContains(response, wave.content)
+    assertContains(response, 'View all waves')
+
+
 @pytest.mark.django_db
 def test_echo_detail_page_shows_view_all_waves_link_when_exceeding_limit(client, user, echo):
     WAVE_LIMIT = 5
@@ -433,6 +547,18 @@ def test_echo_detail_page_does_not_contain_edit_echo_link_when_logged_user_is_no
     assertNotContains(response, edit_echo_url)
 
 
+@pytest.mark.django_db
+def test_echo_detail_page_has_fixed_query_budget(client, user, echo):
+    baker.make_recipe('tests.wave', echo=echo, _quantity=2)
+
+    client.force_login(user)
+    conftest.assert_fixed_query_budget(
+        client,
+        conftest.ECHO_DETAIL_URL.format(echo_pk=echo.pk),
+        lambda: baker.make_recipe('tests.wave', echo=echo, _quantity=10),
+    )
+
+
 # ==============================================================================
 # ECHO WAVES
 # ==============================================================================
@@ -636,6 +762,127 @@ def test_echo_waves_page_does_not_contain_edit_wave_link_when_logged_user_is_not
     assertNotContains(response, edit_wave_url)
 
 
+@pytest.mark.django_db
+def test_echo_waves_page_is_paginated_in_creation_order(client, user, echo, settings):
+    settings.ECHO_WAVES_PAGE_SIZE = 3
+    waves = baker.make_recipe('tests.wave', echo=echo, _quantity=5)
+    waves = sorted(waves, key=lambda w: (w.created_at, w.pk))
+
+    url = conftest.ECHO_WAVES_URL.format(echo_pk=echo.pk)
+    client.force_login(user)
+    response = client.get(url)
+    assert response.status_code == 200
+
+    page = response.context['waves']
+    assert [wave.pk for wave in page] == [wave.pk for wave in waves[:3]]
+    for wave in waves[3:]:
+        assertNotContains(response, wave.content)
+    assertContains(response, 'Load more waves')
+    assertContains(response, conftest.ECHO_WAVES_MORE_URL.format(echo_pk=echo.pk))
+
+
+@pytest.mark.django_db
+def test_echo_waves_more_returns_only_next_page_fragment(client, user, echo, settings):
+    settings.ECHO_WAVES_PAGE_SIZE = 3
+    waves = baker.make_recipe('tests.wave', echo=echo, _quantity=5)
+    waves = sorted(waves, key=lambda w: (w.created_at, w.pk))
+
+    client.force_login(user)
+    response = client.get(conftest.ECHO_WAVES_URL.format(echo_pk=echo.pk))
+    cursor = response.context['waves'].next_cursor
+
+    url = conftest.ECHO_WAVES_MORE_URL.format(echo_pk=echo.pk)
+    response = client.get(url, {'cursor': cursor})
+    assert response.status_code == 200
+    for wave in waves[3:]:
+        assertContains(response, wave.content)
+    for wave in waves[:3]:
+        assertNotContains(response, wave.content)
+    assertNotContains(response, 'Load more waves')
+    assertNotContains(response, '<html>')
+
+
+@pytest.mark.django_db
+def test_echo_waves_more_rejects_invalid_cursor(client, user, echo):
+    client.force_login(user)
+    url = conftest.ECHO_WAVES_MORE_URL.format(echo_pk=echo.pk)
+    response = client.get(url, {'cursor': 'not-a-cursor'})
+    assert response.status_code == 400
+
+
+def stream_waves(user, echo, between_chunks=None):
+    """GET the streamed waves page through ASGI and return its chunks, read one at a time."""
+    client = AsyncClient()
+    client.force_login(user)
+
+    async def read():
+        response = await client.get(conftest.ECHO_WAVES_URL.format(echo_pk=echo.pk), {'stream': ''})
+        assert response.status_code == 200
+        assert response.is_async
+        chunks = []
+        async for chunk in response.streaming_content:
+            chunks.append(chunk.decode())
+            if between_chunks:
+                await sync_to_async(between_chunks)()
+        return chunks
+
+    return async_to_sync(read)()
+
+
+@pytest.mark.django_db
+def test_echo_waves_page_streams_whole_thread(user, echo, settings):
+    settings.ECHO_WAVES_PAGE_SIZE = 3
+    settings.ECHO_WAVES_STREAM_CHUNK_SIZE = 2
+    waves = baker.make_recipe('tests.wave', echo=echo, _quantity=5)
+    waves = sorted(waves, key=lambda w: (w.created_at, w.pk))
+
+    chunks = stream_waves(user, echo)
+    # Page head, three chunks of waves and the page tail
+    assert len(chunks) == 5
+    content = ''.join(chunks)
+    assert echo.content in content
+    last_index = -1
+    for wave in waves:
+        current_index = content.index(wave.content)
+        assert current_index > last_index
+        last_index = current_index
+    assert 'Load more waves' not in content
+    assert content.rstrip().endswith('</html>')
+
+
+@pytest.mark.django_db
+def test_echo_waves_page_streams_no_waves_message_when_no_waves(user, echo):
+    assert 'No waves yet' in ''.join(stream_waves(user, echo))
+
+
+@pytest.mark.django_db
+def test_echo_waves_stream_sends_the_head_before_fetching_waves(user, echo):
+    baker.make_recipe('tests.wave', echo=echo, content='Early wave')
+    waves = []
+
+    def add_wave():
+        if not waves:
+            waves.append(baker.make_recipe('tests.wave', echo=echo, content='Late wave'))
+
+    head, *rest = stream_waves(user, echo, between_chunks=add_wave)
+    assert echo.content in head
+    assert 'Early wave' not in head
+    # Waves are fetched after the head went out, so the late one is in the stream.
+    assert 'Late wave' in ''.join(rest)
+
+
+@pytest.mark.django_db
+def test_echo_waves_page_has_fixed_query_budget(client, user, echo):
+    baker.make_recipe('tests.wave', echo=echo, _quantity=2)
+
+    client.force_login(user)
+    conftest.assert_fixed_query_budget(
+        client,
+        conftest.ECHO_WAVES_URL.format(echo_pk=echo.pk),
+        lambda: baker.make_recipe('tests.wave', echo=echo, _quantity=10),
+    )
+
+
 # ==============================================================================
 # EDIT ECHO
 # ==============================================================================
@@ -1124,3 +1371,582 @@ def test_delete_wave_shows_confirmation_message_after_done(client, user, wave):
     response = client.get(response.url)
     assert response.status_code == 200
     assertContains(response, 'Wave deleted successfully')
+
+
+# ==============================================================================
+# COUNTERS
+# ==============================================================================
+
+
+@pytest.mark.django_db
+def test_counters_are_updated_when_adding_and_deleting_echos(client, user):
+    client.force_login(user)
+    client.post(conftest.ECHO_ADD_URL, data={'content': 'Counted echo'})
+    user.profile.refresh_from_db()
+    assert user.profile.echos_count == 1
+
+    echo = Echo.objects.get(content='Counted echo')
+    client.get(conftest.ECHO_DELETE_URL.format(echo_pk=echo.pk))
+    user.profile.refresh_from_db()
+    assert user.profile.echos_count == 0
+
+
+@pytest.mark.django_db
+def test_counters_are_updated_when_adding_and_deleting_waves(client, user, echo):
+    client.force_login(user)
+    client.post(conftest.WAVE_ADD_URL.format(echo_pk=echo.pk), data={'content': 'Counted wave'})
+    echo.refresh_from_db()
+    user.profile.refresh_from_db()
+    assert echo.waves_count == 1
+    assert user.profile.waves_count == 1
+
+    wave = echo.waves.get()
+    client.get(conftest.WAVE_DELETE_URL.format(wave_pk=wave.pk))
+    echo.refresh_from_db()
+    user.profile.refresh_from_db()
+    assert echo.waves_count == 0
+    assert user.profile.waves_count == 0
+
+
+@pytest.mark.django_db
+def test_counters_are_updated_on_cascade_deletes(user, another_user, echo):
+    baker.make_recipe('tests.wave', echo=echo, user=another_user, _quantity=3)
+    another_user.profile.refresh_from_db()
+    assert another_user.profile.waves_count == 3
+
+    echo.delete()
+    another_user.profile.refresh_from_db()
+    user.profile.refresh_from_db()
+    assert another_user.profile.waves_count == 0
+    assert user.profile.echos_count == 0
+
+
+@pytest.mark.django_db
+def test_recount_command_fixes_drifted_counters(user, echo):
+    baker.make_recipe('tests.wave', echo=echo, user=user, _quantity=4)
+    Echo.objects.update(waves_count=42)
+    Profile.objects.update(echos_count=0, waves_count=7)
+
+    with pytest.raises(CommandError):
+        call_command('recount', '--check', stdout=io.StringIO())
+
+    call_command('recount', stdout=io.StringIO())
+    echo.refresh_from_db()
+    user.profile.refresh_from_db()
+    assert echo.waves_count == 4
+    assert user.profile.echos_count == 1
+    assert user.profile.waves_count == 4
+
+    call_command('recount', '--check', stdout=io.StringIO())
+
+
+# ==============================================================================
+# ECHO CARDS
+# ==============================================================================
+
+
+@pytest.mark.django_db
+def test_echo_card_is_served_from_cache(client, user, echo):
+    client.force_login(user)
+    client.get(conftest.ECHO_LIST_URL)
+    assert caches['echos'].get(echo.card_cache_key) is not None
+
+    # A bare update doesn't bump updated_at, so the cached card is still served
+    Echo.objects.filter(pk=echo.pk).update(content='Changed behind the cache')
+    response = client.get(conftest.ECHO_LIST_URL)
+    assertContains(response, truncatewords(echo.content, 20))
+    assertNotContains(response, 'Changed behind the cache')
+
+
+@pytest.mark.django_db
+def test_echo_card_is_invalidated_when_editing_echo(client, user, echo):
+    client.force_login(user)
+    client.get(conftest.ECHO_LIST_URL)
+    stale_key = echo.card_cache_key
+
+    client.post(conftest.ECHO_EDIT_URL.format(echo_pk=echo.pk), data={'content': 'Edited echo'})
+    assert caches['echos'].get(stale_key) is None
+
+    response = client.get(conftest.ECHO_LIST_URL)
+    assertContains(response, 'Edited echo')
+    assertNotContains(response, truncatewords(echo.content, 20))
+
+
+@pytest.mark.django_db
+def test_echo_card_is_invalidated_when_deleting_echo(client, user, echo):
+    client.force_login(user)
+    client.get(conftest.ECHO_LIST_URL)
+    key = echo.card_cache_key
+
+    client.get(conftest.ECHO_DELETE_URL.format(echo_pk=echo.pk))
+    assert caches['echos'].get(key) is None
+
+
+@pytest.mark.django_db
+def test_echo_card_keeps_relative_time_out_of_cache(client, user, echo):
+    client.force_login(user)
+    client.get(conftest.ECHO_LIST_URL)
+
+    Echo.objects.filter(pk=echo.pk).update(created_at=echo.created_at - timedelta(days=3))
+    echo.refresh_from_db()
+    response = client.get(conftest.ECHO_LIST_URL)
+    assertContains(response, timesince(echo.created_at))
+
+
+
+# ==============================================================================
+# HOME TIMELINE
+# ==============================================================================
+
+
+def timeline_pks(response):
+    return [echo.pk for echo in response.context['echos']]
+
+
+@pytest.mark.django_db
+def test_home_falls_back_to_echo_list_without_follows(client, user):
+    client.force_login(user)
+    response = client.get(conftest.ECHO_HOME_URL)
+    assert response.status_code == 302
+    assert response.url == conftest.ECHO_LIST_URL
+
+
+@pytest.mark.django_db
+def test_home_shows_own_and_followed_echos(client, user, another_user):
+    stranger = baker.make_recipe('tests.user')
+    followed_echos = baker.make_recipe('tests.echo', user=another_user, _quantity=3)
+    baker.make_recipe('tests.echo', user=stranger, _quantity=2)
+    timeline.follow(user, another_user)
+
+    client.force_login(user)
+    client.post(conftest.ECHO_ADD_URL, data={'content': 'My own echo'})
+    client.force_login(another_user)
+    client.post(conftest.ECHO_ADD_URL, data={'content': 'Fanned out echo'})
+
+    client.force_login(user)
+    response = client.get(conftest.ECHO_HOME_URL)
+    assert response.status_code == 200
+    latest = Echo.objects.filter(content__in=['My own echo', 'Fanned out echo'])
+    expected = sorted([*followed_echos, *latest], key=lambda e: (e.created_at, e.pk), reverse=True)
+    assert timeline_pks(response) == [echo.pk for echo in expected]
+
+
+@pytest.mark.django_db
+def test_home_is_paginated_forwards(client, user, another_user, settings):
+    settings.HOME_TIMELINE_PAGE_SIZE = 4
+    echos = baker.make_recipe('tests.echo', user=another_user, _quantity=6)
+    echos = sorted(echos, key=lambda e: (e.created_at, e.pk), reverse=True)
+    timeline.follow(user, another_user)
+
+    client.force_login(user)
+    response = client.get(conftest.ECHO_HOME_URL)
+    assert timeline_pks(response) == [echo.pk for echo in echos[:4]]
+    assertContains(response, 'Older echos')
+
+    response = client.get(conftest.ECHO_HOME_URL, {'cursor': response.context['echos'].next_cursor})
+    assert timeline_pks(response) == [echo.pk for echo in echos[4:]]
+    assertNotContains(response, 'Older echos')
+    assertContains(response, 'Latest echos')
+
+    response = client.get(conftest.ECHO_HOME_URL, {'cursor': 'not-a-cursor'})
+    assert response.status_code == 302
+    assert response.url == conftest.ECHO_HOME_URL
+
+
+@pytest.mark.django_db
+def test_home_merges_big_accounts_on_read(client, user, another_user, settings):
+    settings.HOME_TIMELINE_FANOUT_LIMIT = 0
+    settings.HOME_TIMELINE_PAGE_SIZE = 3
+    timeline.follow(user, another_user)
+    echos = []
+    for author in (user, another_user, another_user, user, another_user):
+        echo = baker.make_recipe('tests.echo', user=author)
+        timeline.fan_out(echo)
+        echos.append(echo)
+    echos.reverse()
+
+    assert not TimelineEntry.objects.filter(owner=user, author=another_user).exists()
+    client.force_login(user)
+    response = client.get(conftest.ECHO_HOME_URL)
+    assert timeline_pks(response) == [echo.pk for echo in echos[:3]]
+    response = client.get(conftest.ECHO_HOME_URL, {'cursor': response.context['echos'].next_cursor})
+    assert timeline_pks(response) == [echo.pk for echo in echos[3:]]
+
+
+@pytest.mark.django_db
+def test_home_timeline_is_bounded(user, another_user, settings):
+    settings.HOME_TIMELINE_LENGTH = 3
+    timeline.follow(user, another_user)
+    echos = baker.make_recipe('tests.echo', user=another_user, _quantity=5)
+    for echo in echos:
+        timeline.fan_out(echo)
+
+    kept = TimelineEntry.objects.filter(owner=user).values_list('echo_id', flat=True)
+    assert sorted(kept) == sorted(echo.pk for echo in echos[-3:])
+
+
+@pytest.mark.django_db
+def test_fan_out_only_trims_full_timelines(user, another_user, settings):
+    settings.HOME_TIMELINE_LENGTH = 3
+    timeline.follow(user, another_user)
+    echos = baker.make_recipe('tests.echo', user=another_user, _quantity=4)
+
+    def trims(echo):
+        with CaptureQueriesContext(connection) as context:
+            timeline.fan_out(echo)
+        return [query for query in context.captured_queries if 'ROW_NUMBER' in query['sql']]
+
+    # The fourth echo overflows both the author's and the follower's timelines.
+    assert [len(trims(echo)) for echo in echos] == [0, 0, 0, 2]
+    assert TimelineEntry.objects.filter(owner=user).count() == 3
+
+
+@pytest.mark.django_db
+def test_home_has_fixed_query_budget(client, user, another_user):
+    timeline.follow(user, another_user)
+    baker.make_recipe('tests.echo', user=another_user, _quantity=2)
+
+    def add_rows():
+        for echo in baker.make_recipe('tests.echo', user=another_user, _quantity=10):
+            timeline.fan_out(echo)
+
+    client.force_login(user)
+    conftest.assert_fixed_query_budget(client, conftest.ECHO_HOME_URL, add_rows)
+
+
+
+# ==============================================================================
+# ASYNC VIEWS
+# ==============================================================================
+
+
+@pytest.mark.parametrize('view', ['echo_list', 'echo_detail', 'echo_waves'])
+def test_read_views_are_async(view):
+    assert iscoroutinefunction(getattr(views, view))
+
+
+@pytest.mark.django_db
+def test_read_views_render_through_asgi(user, another_user):
+    echo = baker.make_recipe('tests.echo', user=user, content='Served by the async ORM')
+    baker.make_recipe('tests.wave', echo=echo, user=another_user, _quantity=3)
+    client = AsyncClient()
+    client.force_login(user)
+    urls = [
+        conftest.ECHO_LIST_URL,
+        conftest.ECHO_DETAIL_URL.format(echo_pk=echo.pk),
+        conftest.ECHO_WAVES_URL.format(echo_pk=echo.pk),
+        conftest.USER_DETAIL_URL.format(username=user.username),
+        conftest.USER_ECHOS_URL.format(username=user.username),
+    ]
+    for url in urls:
+        response = async_to_sync(client.get)(url)
+        assert response.status_code == 200
+        assertContains(response, echo.content)
+        assertContains(response, user.profile.avatar.url)
+
+
+
+# ==============================================================================
+# CONDITIONAL GET
+# ==============================================================================
+
+
+def revalidate(client, url):
+    """Fetch `url` and then revalidate it with the ETag it returned."""
+    etag = client.get(url)['ETag']
+    return etag, client.get(url, headers={'if-none-match': etag})
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('url', [conftest.ECHO_DETAIL_URL, conftest.ECHO_WAVES_URL])
+def test_thread_pages_are_not_modified_on_revalidation(client, user, echo, url):
+    baker.make_recipe('tests.wave', echo=echo, user=user, _quantity=2)
+    url = url.format(echo_pk=echo.pk)
+    client.force_login(user)
+
+    response = client.get(url)
+    assert response.has_header('ETag')
+    assert not response.has_header('Last-Modified')
+
+    _, response = revalidate(client, url)
+    assert response.status_code == 304
+    assert not response.templates
+    assert response.content == b''
+
+
+@pytest.mark.django_db
+def test_thread_page_etag_changes_with_waves(client, user, echo):
+    wave = baker.make_recipe('tests.wave', echo=echo, user=user)
+    url = conftest.ECHO_DETAIL_URL.format(echo_pk=echo.pk)
+    client.force_login(user)
+
+    etag, _ = revalidate(client, url)
+    wave.content = 'Edited wave'
+    wave.save()
+    response = client.get(url, headers={'if-none-match': etag})
+    assert response.status_code == 200
+    assertContains(response, 'Edited wave')
+
+    etag = response['ETag']
+    wave.delete()
+    response = client.get(url, headers={'if-none-match': etag})
+    assert response.status_code == 200
+    assertNotContains(response, 'Edited wave')
+
+
+@pytest.mark.django_db
+def test_thread_page_is_modified_when_its_latest_wave_is_deleted(client, user, echo):
+    baker.make_recipe('tests.wave', echo=echo, user=user, content='Older wave')
+    latest = baker.make_recipe('tests.wave', echo=echo, user=user, content='Latest wave')
+    url = conftest.ECHO_DETAIL_URL.format(echo_pk=echo.pk)
+    client.force_login(user)
+
+    etag = client.get(url)['ETag']
+    latest.delete()
+    # As sent by a client that cached the page before the deletion
+    since = http_date(time.time())
+    for headers in ({'if-modified-since': since}, {'if-none-match': etag}):
+        response = client.get(url, headers=headers)
+        assert response.status_code == 200
+        assertNotContains(response, 'Latest wave')
+
+
+@pytest.mark.django_db
+def test_thread_page_etag_varies_per_viewer(client, user, another_user, echo):
+    url = conftest.ECHO_DETAIL_URL.format(echo_pk=echo.pk)
+    client.force_login(user)
+    etag, _ = revalidate(client, url)
+
+    client.force_login(another_user)
+    response = client.get(url, headers={'if-none-match': etag})
+    assert response.status_code == 200
+    assertNotContains(response, conftest.ECHO_EDIT_URL.format(echo_pk=echo.pk))
+
+
+@pytest.mark.django_db
+def test_thread_page_is_rendered_when_messages_are_pending(client, user, echo):
+    url = conftest.ECHO_DETAIL_URL.format(echo_pk=echo.pk)
+    client.force_login(user)
+    etag, _ = revalidate(client, url)
+
+    # Editing the profile leaves the thread validators alone but queues a message
+    client.post(conftest.PROFILE_EDIT_URL.format(username=user.username), data={'bio': 'New'})
+    response = client.get(url, headers={'if-none-match': etag})
+    assert response.status_code == 200
+    assertContains(response, 'Profile updated successfully')
+
+
+
+# ==============================================================================
+# LIVE WAVES
+# ==============================================================================
+
+
+def live_scope(client, echo_pk, origin='http://testserver'):
+    headers = [(b'host', b'testserver'), (b'origin', origin.encode())]
+    if 'sessionid' in client.cookies:
+        headers.append((b'cookie', f'sessionid={client.cookies["sessionid"].value}'.encode()))
+    return {'type': 'websocket', 'path': live.live_waves_url(echo_pk), 'headers': headers}
+
+
+def connect(scope):
+    async def handshake():
+        communicator = ApplicationCommunicator(application, scope)
+        await communicator.send_input({'type': 'websocket.connect'})
+        return await communicator.receive_output(1)
+
+    return async_to_sync(handshake)()
+
+
+@pytest.mark.django_db
+def test_live_waves_pushes_wave_changes(client, user, echo, django_capture_on_commit_callbacks):
+    client.force_login(user)
+
+    def write(method, url, data=None):
+        with django_capture_on_commit_callbacks(execute=True):
+            getattr(client, method)(url, data)
+
+    async def scenario():
+        communicator = ApplicationCommunicator(application, live_scope(client, echo.pk))
+        await communicator.send_input({'type': 'websocket.connect'})
+        assert (await communicator.receive_output(1))['type'] == 'websocket.accept'
+
+        async def next_event():
+            return json.loads((await communicator.receive_output(1))['text'])
+
+        add_url = conftest.WAVE_ADD_URL.format(echo_pk=echo.pk)
+        await sync_to_async(write)('post', add_url, {'content': 'Live wave'})
+        added = await next_event()
+        wave = await echo.waves.aget()
+        assert added['event'] == 'added'
+        assert added['wave'] == wave.pk
+        assert 'Live wave' in added['html']
+        # Cards are pushed as any reader sees them, without the author's controls.
+        assert conftest.WAVE_EDIT_URL.format(wave_pk=wave.pk) not in added['html']
+
+        edit_url = conftest.WAVE_EDIT_URL.format(wave_pk=wave.pk)
+        await sync_to_async(write)('post', edit_url, {'content': 'Edited live wave'})
+        edited = await next_event()
+        assert (edited['event'], edited['wave']) == ('edited', wave.pk)
+        assert 'Edited live wave' in edited['html']
+
+        await sync_to_async(write)('get', conftest.WAVE_DELETE_URL.format(wave_pk=wave.pk))
+        assert await next_event() == {'event': 'deleted', 'wave': wave.pk}
+
+        await communicator.send_input({'type': 'websocket.disconnect', 'code': 1000})
+        await communicator.wait(1)
+
+    async_to_sync(scenario)()
+
+
+@pytest.mark.django_db
+def test_live_waves_rejects_anonymous_and_cross_site_clients(client, user, echo):
+    assert connect(live_scope(client, echo.pk)) == {'type': 'websocket.close', 'code': 4403}
+
+    client.force_login(user)
+    scope = live_scope(client, echo.pk, origin='https://evil.example')
+    assert connect(scope) == {'type': 'websocket.close', 'code': 4403}
+
+
+@pytest.mark.django_db
+def test_live_waves_rejects_unknown_echos(client, user):
+    client.force_login(user)
+    assert connect(live_scope(client, 999)) == {'type': 'websocket.close', 'code': 4404}
+
+
+@pytest.mark.django_db
+def test_thread_pages_subscribe_to_live_waves(client, user, echo):
+    client.force_login(user)
+    for url in (conftest.ECHO_DETAIL_URL, conftest.ECHO_WAVES_URL):
+        response = client.get(url.format(echo_pk=echo.pk))
+        assertContains(response, f'data-live="{live.live_waves_url(echo.pk)}"')
+
+
+@pytest.mark.django_db
+def test_unreachable_broker_does_not_fail_wave_writes(
+    client, user, echo, monkeypatch, django_capture_on_commit_callbacks
+):
+    def publish(channel, message):
+        raise ConnectionRefusedError(111, 'Connection refused')
+
+    monkeypatch.setattr(live.get_broker(), 'publish', publish)
+    client.force_login(user)
+
+    with django_capture_on_commit_callbacks(execute=True) as callbacks:
+        response = client.post(
+            conftest.WAVE_ADD_URL.format(echo_pk=echo.pk), {'content': 'Offline wave'}
+        )
+    assert response.status_code == 302
+    assert len(callbacks) == 1
+    wave = echo.waves.get(content='Offline wave')
+
+    with django_capture_on_commit_callbacks(execute=True):
+        response = client.post(
+            conftest.WAVE_EDIT_URL.format(wave_pk=wave.pk), {'content': 'Still offline'}
+        )
+    assert response.status_code == 302
+    wave.refresh_from_db()
+    assert wave.content == 'Still offline'
+
+
+# ==============================================================================
+# ADMIN
+# ==============================================================================
+
+
+def run_action(client, url, action, objects):
+    selected = [obj.pk for obj in objects]
+    return client.post(url, {'action': action, '_selected_action': selected})
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    'url, recipe',
+    [(conftest.ADMIN_ECHO_LIST_URL, 'tests.echo'), (conftest.ADMIN_WAVE_LIST_URL, 'tests.wave')],
+)
+def test_admin_changelist_has_fixed_query_budget(admin_client, echo, url, recipe):
+    def add_rows():
+        for _ in range(5):
+            author = baker.make_recipe('tests.user')
+            extra = {'echo': baker.make_recipe('tests.echo')} if recipe == 'tests.wave' else {}
+            baker.make_recipe(recipe, user=author, **extra)
+
+    conftest.assert_fixed_query_budget(admin_client, url, add_rows)
+
+
+@pytest.mark.django_db
+def test_admin_changelist_truncates_content(admin_client, user):
+    baker.make_recipe('tests.echo', user=user, content='word ' * 100)
+    response = admin_client.get(conftest.ADMIN_ECHO_LIST_URL)
+    assertContains(response, 'word word')
+    assertNotContains(response, 'word ' * 20)
+
+
+@pytest.mark.django_db
+def test_admin_change_forms_use_raw_id_widgets(admin_client, wave):
+    for url in (
+        conftest.ADMIN_ECHO_CHANGE_URL.format(echo_pk=wave.echo_id),
+        conftest.ADMIN_WAVE_CHANGE_URL.format(wave_pk=wave.pk),
+    ):
+        response = admin_client.get(url)
+        assertContains(response, 'vForeignKeyRawIdAdminField')
+        assertNotContains(response, '<select name="user"')
+        assertNotContains(response, '<select name="echo"')
+
+
+@pytest.mark.django_db
+def test_admin_search_uses_full_text_and_exact_usernames(admin_client, user, another_user):
+    match = baker.make_recipe('tests.echo', user=another_user, content='A lighthouse at dawn')
+    other = baker.make_recipe('tests.echo', user=user, content='Nothing to see')
+
+    response = admin_client.get(conftest.ADMIN_ECHO_LIST_URL, {'q': 'lighth'})
+    assert [echo.pk for echo in response.context['cl'].result_list] == [match.pk]
+
+    response = admin_client.get(conftest.ADMIN_ECHO_LIST_URL, {'q': f'@{user.username}'})
+    assert [echo.pk for echo in response.context['cl'].result_list] == [other.pk]
+
+
+@pytest.mark.django_db
+def test_admin_deletes_by_hiding_without_collecting_cascades(admin_client, user, echo):
+    baker.make_recipe('tests.wave', echo=echo, user=user, _quantity=3)
+    url = conftest.ADMIN_ECHO_LIST_URL
+
+    response = run_action(admin_client, url, 'delete_selected', [echo])
+    assertContains(response, str(echo))
+    assertNotContains(response, 'Wave:')
+
+    response = admin_client.post(
+        url, {'action': 'delete_selected', '_selected_action': [echo.pk], 'post': 'yes'}
+    )
+    assert response.status_code == 302
+    assert not Echo.objects.exists()
+    assert Echo.all_objects.get().deleted_at is not None
+    assert Wave.objects.count() == 3
+
+
+@pytest.mark.django_db
+def test_admin_deletes_waves_by_hiding(admin_client, user, another_user, echo):
+    waves = baker.make_recipe('tests.wave', echo=echo, user=another_user, _quantity=3)
+
+    admin_client.post(
+        conftest.ADMIN_WAVE_LIST_URL,
+        {'action': 'delete_selected', '_selected_action': [w.pk for w in waves[:2]], 'post': 'yes'},
+    )
+
+    assert list(Wave.objects.all()) == waves[2:]
+    echo.refresh_from_db()
+    another_user.profile.refresh_from_db()
+    assert echo.waves_count == 1
+    assert another_user.profile.waves_count == 1
+    call_command('recount', '--check', stdout=io.StringIO())
+
+
+@pytest.mark.django_db
+def test_admin_recounts_selected_echos(admin_client, echo, user):
+    baker.make_recipe('tests.wave', echo=echo, user=user, _quantity=2)
+    Echo.objects.update(waves_count=42)
+
+    run_action(admin_client, conftest.ADMIN_ECHO_LIST_URL, 'recount_waves', [echo])
+
+    echo.refresh_from_db()
+    assert echo.waves_count == 2
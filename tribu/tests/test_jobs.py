@@ -0,0 +1,235 @@
+import io
+from datetime import datetime, timedelta
+
+import pytest
+from django.contrib.sessions.models import Session
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.utils import timezone
+from model_bakery import baker
+from PIL import Image
+
+from echos.models import Echo
+from jobs import cron, queue
+from jobs.models import Job
+from users.models import Profile
+
+from tests import conftest
+
+CALLS = []
+
+
+@queue.task
+def record(value):
+    CALLS.append(value)
+
+
+@queue.task(max_attempts=2)
+def explode():
+    raise RuntimeError('boom')
+
+
+@pytest.fixture(autouse=True)
+def calls():
+    CALLS.clear()
+    return CALLS
+
+
+# ==============================================================================
+# QUEUE
+# ==============================================================================
+
+
+@pytest.mark.django_db
+def test_enqueued_jobs_run_and_are_removed(calls):
+    record.enqueue(value='a')
+    queue.enqueue('tests.record', value='b')
+
+    assert queue.run_pending() == 2
+    assert calls == ['a', 'b']
+    assert not Job.objects.exists()
+
+
+@pytest.mark.django_db
+def test_jobs_run_by_priority_then_due_time(calls):
+    record.enqueue(value='low', priority=-1)
+    record.enqueue(value='first')
+    record.enqueue(value='high', priority=5)
+    record.enqueue(value='second')
+
+    queue.run_pending()
+    assert calls == ['high', 'first', 'second', 'low']
+
+
+@pytest.mark.django_db
+def test_scheduled_jobs_wait_until_due(calls):
+    job = record.enqueue(value='later', delay=60)
+
+    assert queue.run_pending() == 0
+    Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+    assert queue.run_pending() == 1
+    assert calls == ['later']
+
+
+@pytest.mark.django_db
+def test_jobs_with_a_queued_key_are_not_queued_twice():
+    assert record.enqueue(value='a', key='once') is not None
+    assert record.enqueue(value='b', key='once') is None
+    assert Job.objects.count() == 1
+
+
+@pytest.mark.django_db
+def test_failed_jobs_are_retried_with_backoff_then_kept(settings):
+    settings.JOBS_RETRY_DELAY = 10
+    explode.enqueue()
+
+    assert queue.run_pending() == 1
+    job = Job.objects.get()
+    assert (job.status, job.attempts) == (Job.QUEUED, 1)
+    assert job.run_at > timezone.now() + timedelta(seconds=5)
+    assert 'RuntimeError: boom' in job.last_error
+
+    Job.objects.update(run_at=timezone.now())
+    queue.run_pending()
+    job = Job.objects.get()
+    assert (job.status, job.attempts) == (Job.FAILED, 2)
+    assert queue.run_pending() == 0
+
+
+@pytest.mark.django_db
+def test_claimed_jobs_are_not_claimed_again():
+    record.enqueue(value='a')
+    job = queue.claim()
+    assert (job.status, job.attempts) == (Job.RUNNING, 1)
+    assert queue.claim() is None
+
+
+@pytest.mark.django_db
+def test_jobs_of_dead_workers_are_requeued(settings, calls):
+    settings.JOBS_LEASE = 60
+    record.enqueue(value='a')
+    queue.claim()
+
+    assert queue.requeue_expired() == 0
+    Job.objects.update(locked_at=timezone.now() - timedelta(seconds=61))
+    assert queue.requeue_expired() == 1
+    queue.run_pending()
+    assert calls == ['a']
+
+
+@pytest.mark.django_db
+def test_runworker_runs_jobs_in_burst_mode(calls, settings):
+    settings.JOBS_SCHEDULE = {}
+    record.enqueue(value='a')
+    explode.enqueue()
+
+    stdout, stderr = io.StringIO(), io.StringIO()
+    call_command('runworker', burst=True, stdout=stdout, stderr=stderr)
+    assert calls == ['a']
+    assert 'Ran 2 jobs (1 failed)' in stdout.getvalue()
+    assert 'tests.explode' in stderr.getvalue()
+
+
+# ==============================================================================
+# SCHEDULE
+# ==============================================================================
+
+
+@pytest.mark.parametrize(
+    'expression, after, expected',
+    [
+        ('*/15 * * * *', datetime(2026, 3, 2, 10, 7), datetime(2026, 3, 2, 10, 15)),
+        ('0 4 * * *', datetime(2026, 3, 2, 4, 0), datetime(2026, 3, 3, 4, 0)),
+        ('30 9 * * 1-5', datetime(2026, 3, 6, 10, 0), datetime(2026, 3, 9, 9, 30)),
+        ('0 0 1 1,7 *', datetime(2026, 3, 2, 0, 0), datetime(2026, 7, 1, 0, 0)),
+        ('0 12 * * 7', datetime(2026, 3, 2, 0, 0), datetime(2026, 3, 8, 12, 0)),
+    ],
+)
+def test_cron_next_run(expression, after, expected):
+    after = timezone.make_aware(after)
+    assert cron.next_run(expression, after) == timezone.make_aware(expected)
+
+
+@pytest.mark.parametrize('expression', ['* * * *', '60 * * * *', '0 0 31 2 *'])
+def test_cron_rejects_invalid_expressions(expression):
+    with pytest.raises(ValueError):
+        cron.next_run(expression, timezone.now())
+
+
+@pytest.mark.django_db
+def test_schedule_queues_the_next_run_once(settings):
+    settings.JOBS_SCHEDULE = {
+        'ping': {'task': 'tests.record', 'cron': '0 * * * *', 'kwargs': {'value': 'ping'}},
+    }
+
+    queue.schedule()
+    queue.schedule()
+
+    job = Job.objects.get()
+    assert (job.key, job.kwargs) == ('schedule:ping', {'value': 'ping'})
+    assert job.run_at == cron.next_run('0 * * * *', timezone.now())
+
+
+# ==============================================================================
+# TASKS
+# ==============================================================================
+
+
+@pytest.mark.django_db
+def test_deleting_an_echo_queues_its_purge(client, user, echo):
+    baker.make_recipe('tests.wave', echo=echo, user=user, _quantity=3)
+    client.force_login(user)
+    another_echo = baker.make_recipe('tests.echo', user=user)
+    client.get(conftest.ECHO_DELETE_URL.format(echo_pk=echo.pk))
+    client.get(conftest.ECHO_DELETE_URL.format(echo_pk=another_echo.pk))
+
+    assert list(Job.objects.values_list('task', flat=True)) == ['shared.purge']
+    queue.run_pending()
+    assert not Echo.all_objects.exists()
+
+
+@pytest.mark.django_db
+def test_uploaded_avatars_are_resized_in_the_background(client, user, uploads_folder, settings):
+    settings.AVATAR_SIZE = 64
+    client.force_login(user)
+    buffer = io.BytesIO()
+    Image.new('RGB', (300, 200), 'red').save(buffer, format='JPEG')
+    upload = SimpleUploadedFile('avatar.jpg', buffer.getvalue(), content_type='image/jpeg')
+    url = conftest.PROFILE_EDIT_URL.format(username=user.username)
+    client.post(url, {'avatar': upload, 'bio': ''})
+
+    profile = Profile.objects.get(user=user)
+    original = profile.avatar.name
+    assert Job.objects.get().task == 'users.process_avatar'
+
+    queue.run_pending()
+    profile.refresh_from_db()
+    assert profile.avatar.name != original
+    assert not profile.avatar.storage.exists(original)
+    with Image.open(profile.avatar.path) as image:
+        assert image.size == (64, 64)
+
+
+@pytest.mark.django_db
+def test_avatar_job_skips_replaced_avatars(user, uploads_folder):
+    Profile.objects.filter(user=user).update(avatar='avatars/newer.png')
+    queue.enqueue('users.process_avatar', profile_pk=user.profile.pk, name='avatars/older.png')
+
+    assert queue.run_pending() == 1
+    assert Profile.objects.get(user=user).avatar.name == 'avatars/newer.png'
+
+
+@pytest.mark.django_db
+def test_expired_sessions_are_cleared_in_batches(client, user):
+    client.force_login(user)
+    now = timezone.now()
+    Session.objects.bulk_create(
+        Session(session_key=f'expired{i}', session_data='', expire_date=now - timedelta(days=1))
+        for i in range(5)
+    )
+
+    queue.enqueue('shared.clear_sessions', batch_size=2)
+    queue.run_pending()
+    assert list(Session.objects.values_list('session_key', flat=True)) == [
+        client.session.session_key
+    ]
@@ -0,0 +1,129 @@
+import pytest
+from model_bakery import baker
+from pytest_django.asserts import assertContains, assertNotContains
+
+from tests import conftest
+
+
+@pytest.mark.django_db
+def test_search_page_requires_authentication(client, user):
+    response = client.get(conftest.SEARCH_URL)
+    assert response.status_code == 302
+    assert response.url == f'/login/?next={conftest.SEARCH_URL}'
+
+    client.force_login(user)
+    response = client.get(conftest.SEARCH_URL)
+    assert response.status_code == 200
+
+
+@pytest.mark.django_db
+def test_search_finds_echos_by_content(client, user):
+    match = baker.make_recipe('tests.echo', content='The wombat migration starts today')
+    other = baker.make_recipe('tests.echo', content='Nothing to see here')
+
+    client.force_login(user)
+    response = client.get(conftest.SEARCH_URL, {'q': 'wombat'})
+    assert response.status_code == 200
+
+    assert [result.object for result in response.context['results']] == [match]
+    assertContains(response, '<mark>wombat</mark>')
+    assertContains(response, conftest.ECHO_DETAIL_URL.format(echo_pk=match.pk))
+    assertNotContains(response, conftest.ECHO_DETAIL_URL.format(echo_pk=other.pk))
+
+
+@pytest.mark.django_db
+def test_search_ranks_better_matches_first(client, user):
+    weak = baker.make_recipe(
+        'tests.echo', content='A wombat once walked through a very long and winding valley'
+    )
+    strong = baker.make_recipe('tests.echo', content='Wombat wombat wombat')
+
+    client.force_login(user)
+    response = client.get(conftest.SEARCH_URL, {'q': 'wombat'})
+
+    assert [result.object for result in response.context['results']] == [strong, weak]
+
+
+@pytest.mark.django_db
+def test_search_matches_all_terms_and_prefixes(client, user):
+    match = baker.make_recipe('tests.echo', content='Wombats love carrots')
+    baker.make_recipe('tests.echo', content='Wombats love grass')
+
+    client.force_login(user)
+    response = client.get(conftest.SEARCH_URL, {'q': 'wombats carr'})
+
+    assert [result.object for result in response.context['results']] == [match]
+
+
+@pytest.mark.django_db
+def test_search_finds_waves_and_links_to_their_thread(client, user, echo):
+    wave = baker.make_recipe('tests.wave', echo=echo, content='A wave about platypus')
+
+    client.force_login(user)
+    response = client.get(conftest.SEARCH_URL, {'q': 'platypus', 'in': 'waves'})
+
+    assert [result.object for result in response.context['results']] == [wave]
+    assertContains(response, conftest.ECHO_DETAIL_URL.format(echo_pk=echo.pk))
+
+
+@pytest.mark.django_db
+def test_search_index_follows_edits_and_deletes(client, user, echo):
+    client.force_login(user)
+    client.post(conftest.ECHO_EDIT_URL.format(echo_pk=echo.pk), data={'content': 'Now about kiwis'})
+
+    response = client.get(conftest.SEARCH_URL, {'q': 'kiwis'})
+    assert [result.object for result in response.context['results']] == [echo]
+
+    client.get(conftest.ECHO_DELETE_URL.format(echo_pk=echo.pk))
+    response = client.get(conftest.SEARCH_URL, {'q': 'kiwis'})
+    assert list(response.context['results']) == []
+    assertContains(response, 'No results for')
+
+
+@pytest.mark.django_db
+def test_search_escapes_content_in_snippets(client, user):
+    baker.make_recipe('tests.echo', content='<script>alert("wombat")</script>')
+
+    client.force_login(user)
+    response = client.get(conftest.SEARCH_URL, {'q': 'wombat'})
+
+    assertNotContains(response, '<script>alert')
+    assertContains(response, '<mark>wombat</mark>')
+
+
+@pytest.mark.django_db
+def test_search_tolerates_query_syntax_characters(client, user):
+    client.force_login(user)
+    response = client.get(conftest.SEARCH_URL, {'q': '"wombat* AND (NOT -'})
+    assert response.status_code == 200
+
+
+@pytest.mark.django_db
+def test_search_is_paginated(client, user, settings):
+    settings.SEARCH_PAGE_SIZE = 2
+    baker.make_recipe('tests.echo', content='wombat', _quantity=3)
+
+    client.force_login(user)
+    response = client.get(conftest.SEARCH_URL, {'q': 'wombat'})
+    assert len(response.context['results']) == 2
+    assert response.context['results'].has_next
+
+    response = client.get(conftest.SEARCH_URL, {'q': 'wombat', 'page': 2})
+    assert len(response.context['results']) == 1
+    assert not response.context['results'].has_next
+    assert response.context['results'].has_previous
+
+
+@pytest.mark.django_db
+def test_search_pages_are_capped(client, user, settings):
+    settings.SEARCH_PAGE_SIZE = 1
+    settings.SEARCH_MAX_PAGES = 2
+    baker.make_recipe('tests.echo', content='wombat', _quantity=3)
+
+    client.force_login(user)
+    for page in (3, 99999999999999999999):
+        response = client.get(conftest.SEARCH_URL, {'q': 'wombat', 'page': page})
+        assert response.status_code == 200
+        assert response.context['results'].number == 2
+        assert len(response.context['results']) == 1
+        assert not response.context['results'].has_next
@@ -0,0 +1,287 @@
+import io
+
+import pytest
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import OperationalError, connections, transaction
+from django.test.utils import CaptureQueriesContext
+from model_bakery import baker
+from pytest_django.asserts import assertContains
+
+from echos import timeline
+from echos.models import Echo
+from search.engine import find
+from shared.deletion import purge
+from shards import directory
+from shards.models import Placement
+from shards.moves import copy_rows
+from waves.models import Wave
+
+from tests import conftest
+
+SHARDS = ['default', 'shard1', 'shard2']
+
+sharded = pytest.mark.django_db(transaction=True, databases=SHARDS)
+
+
+@pytest.fixture(scope='module')
+def shard_databases(django_db_setup, tmp_path_factory):
+    # Added after the test databases are set up, and before the tests check
+    # the aliases they use exist.
+    folder = tmp_path_factory.mktemp('shards')
+    for alias in SHARDS[1:]:
+        connections.settings[alias] = {
+            **connections['default'].settings_dict,
+            'NAME': str(folder / f'{alias}.sqlite3'),
+        }
+    yield [connections[alias] for alias in SHARDS[1:]]
+    for alias in SHARDS[1:]:
+        connections[alias].close()
+        del connections[alias]
+        del connections.settings[alias]
+
+
+@pytest.fixture
+def shards(shard_databases, settings):
+    """Spread echos over the primary database and two more SQLite files."""
+    connections['default'].ensure_connection()
+    for database in shard_databases:
+        database.ensure_connection()
+        # Same schema as the (empty) primary database
+        connections['default'].connection.backup(database.connection)
+    settings.DATABASE_SHARDS = SHARDS
+    settings.DATABASE_ROUTERS = ['shards.routers.ShardRouter']
+    return SHARDS
+
+
+def place(user, alias):
+    Placement.objects.filter(user=user).update(shard=alias)
+
+
+def stored_on(model, pk):
+    return [alias for alias in SHARDS if model.all_objects.using(alias).filter(pk=pk).exists()]
+
+
+# ==============================================================================
+# PLACEMENT
+# ==============================================================================
+
+
+@sharded
+def test_new_users_are_placed_and_copied_to_every_shard(shards, user):
+    assert Placement.objects.get(user=user).shard == directory.choose(user.pk)
+    for alias in SHARDS:
+        assert type(user).objects.using(alias).filter(username=user.username).exists()
+    # Copies are only there to be joined.
+    assert not type(user).objects.using('shard1').get(pk=user.pk).has_usable_password()
+
+
+@pytest.mark.django_db
+def test_users_are_placed_on_the_primary_database_without_shards(user):
+    assert Placement.objects.get(user=user).shard == 'default'
+    assert directory.shard_of(user.pk) == 'default'
+
+
+@sharded
+def test_echos_are_stored_on_the_shard_of_their_author(shards, client, user):
+    place(user, 'shard1')
+    client.force_login(user)
+
+    response = client.post(conftest.ECHO_ADD_URL, {'content': 'Sharded echo'}, follow=True)
+    assert response.status_code == 200
+    assertContains(response, 'Sharded echo')
+
+    echo = Echo.objects.using('shard1').get(content='Sharded echo')
+    assert stored_on(Echo, echo.pk) == ['shard1']
+
+
+@sharded
+def test_ids_are_unique_across_shards(shards, user, another_user):
+    place(user, 'shard1')
+    place(another_user, 'shard2')
+    echos = [baker.make_recipe('tests.echo', user=author) for author in [user, another_user] * 3]
+
+    assert {echo._state.db for echo in echos} == {'shard1', 'shard2'}
+    assert len({echo.pk for echo in echos}) == len(echos)
+
+
+@sharded
+def test_failed_posts_leave_no_echo_and_no_reused_id(shards, client, user, monkeypatch):
+    place(user, 'shard1')
+    client.force_login(user)
+
+    def fan_out(echo):
+        raise OperationalError('database is locked')
+
+    monkeypatch.setattr(timeline, 'fan_out', fan_out)
+    with pytest.raises(OperationalError):
+        client.post(conftest.ECHO_ADD_URL, {'content': 'Lost echo'})
+    assert not Echo.all_objects.using('shard1').exists()
+
+    # Ids taken inside a primary transaction would be handed out again.
+    with pytest.raises(transaction.TransactionManagementError), transaction.atomic():
+        Echo(user=user, content='Orphan').save()
+
+    monkeypatch.undo()
+    client.post(conftest.ECHO_ADD_URL, {'content': 'Kept echo'})
+    echos = [baker.make_recipe('tests.echo', user=user) for _ in range(3)]
+    pks = list(Echo.all_objects.using('shard1').values_list('pk', flat=True))
+    assert len(pks) == len(set(pks)) == 4
+    assert {echo.pk for echo in echos} < set(pks)
+
+
+@sharded
+def test_waves_are_stored_with_their_echo(shards, client, user, another_user):
+    place(user, 'shard1')
+    place(another_user, 'shard2')
+    echo = baker.make_recipe('tests.echo', user=user)
+
+    client.force_login(another_user)
+    client.post(conftest.WAVE_ADD_URL.format(echo_pk=echo.pk), {'content': 'Sharded wave'})
+
+    wave = directory.first(Wave.objects.filter(echo=echo))
+    assert stored_on(Wave, wave.pk) == ['shard1']
+    assert Echo.objects.using('shard1').get(pk=echo.pk).waves_count == 1
+    response = client.get(conftest.ECHO_DETAIL_URL.format(echo_pk=echo.pk))
+    assertContains(response, 'Sharded wave')
+
+
+
+@sharded
+def test_seeded_users_are_placed_with_their_echos(shards):
+    call_command('seed', users=6, echos_per_user=2, stdout=io.StringIO())
+
+    for user in User.objects.all():
+        assert directory.shard_of(user.pk) == 'default'
+        echos = directory.for_user(Echo.objects.filter(user=user), user.pk)
+        assert echos.count() == Echo.objects.using('default').filter(user=user).count()
+    assert Echo.objects.using('default').exists()
+
+# ==============================================================================
+# READS
+# ==============================================================================
+
+
+@sharded
+def test_echo_list_page_merges_the_shards(shards, client, user, settings):
+    settings.ECHO_LIST_PAGE_SIZE = 4
+    echos = baker.make_recipe('tests.echo', _quantity=10)
+    assert len({echo._state.db for echo in echos}) > 1
+    echos = sorted(echos, key=lambda e: (e.created_at, e.pk), reverse=True)
+
+    client.force_login(user)
+    response = client.get(conftest.ECHO_LIST_URL)
+    assertContains(response, 'Tribu has posted 10 echos so far!')
+    seen = [echo.pk for echo in response.context['echos']]
+    while (page := response.context['echos']).has_next:
+        response = client.get(conftest.ECHO_LIST_URL, {'cursor': page.next_cursor})
+        seen += [echo.pk for echo in response.context['echos']]
+    assert seen == [echo.pk for echo in echos]
+
+
+@sharded
+def test_user_echos_page_reads_a_single_shard(shards, client, user, another_user):
+    place(another_user, 'shard2')
+    baker.make_recipe('tests.echo', user=another_user, _quantity=3)
+
+    client.force_login(user)
+    url = conftest.USER_ECHOS_URL.format(username=another_user.username)
+    with (
+        CaptureQueriesContext(connections['shard1']) as shard1,
+        CaptureQueriesContext(connections['shard2']) as shard2,
+    ):
+        response = client.get(url)
+    assert len(response.context['echos']) == 3
+    assert not shard1.captured_queries
+    assert shard2.captured_queries
+
+
+@sharded
+def test_search_merges_the_shards(shards, user, another_user):
+    place(user, 'shard1')
+    place(another_user, 'shard2')
+    baker.make_recipe('tests.echo', user=user, content='sharded search')
+    baker.make_recipe('tests.echo', user=another_user, content='sharded search')
+
+    results = find('sharded', page_size=1)
+    assert len(results.results) == 1
+    assert results.has_next
+    assert len(find('sharded').results) == 2
+
+
+# ==============================================================================
+# MOVES
+# ==============================================================================
+
+
+@sharded
+def test_reshard_moves_a_user_with_their_threads(shards, client, user, another_user):
+    place(user, 'shard1')
+    echo = baker.make_recipe('tests.echo', user=user)
+    wave = baker.make_recipe('tests.wave', echo=echo, user=another_user)
+
+    call_command('reshard', user.username, '--to', 'shard2', '--batch-size', 1)
+
+    assert Placement.objects.get(user=user).shard == 'shard2'
+    assert stored_on(Echo, echo.pk) == ['shard2']
+    assert stored_on(Wave, wave.pk) == ['shard2']
+    moved = Echo.objects.using('shard2').get(pk=echo.pk)
+    assert (moved.created_at, moved.waves_count) == (echo.created_at, 1)
+
+    client.force_login(user)
+    response = client.get(conftest.ECHO_DETAIL_URL.format(echo_pk=echo.pk))
+    assertContains(response, wave.content)
+    client.post(conftest.ECHO_ADD_URL, {'content': 'After the move'})
+    assert Echo.objects.using('shard2').filter(content='After the move').exists()
+
+
+@sharded
+def test_reshard_moves_echos_left_behind_on_another_shard(shards, user):
+    place(user, 'shard2')
+    straggler = baker.make_recipe('tests.echo', user=user, _using='shard1')
+
+    call_command('reshard', user.username, '--to', 'shard2')
+
+    assert stored_on(Echo, straggler.pk) == ['shard2']
+
+
+@sharded
+def test_reshard_rebalances_the_shards(shards, user, another_user):
+    place(user, 'shard1')
+    place(another_user, 'shard1')
+    baker.make_recipe('tests.echo', user=user, _quantity=4)
+    baker.make_recipe('tests.echo', user=another_user, _quantity=2)
+
+    call_command('reshard', '--rebalance')
+
+    # The larger user would only move the imbalance to another shard.
+    counts = {alias: Echo.objects.using(alias).count() for alias in SHARDS}
+    assert counts == {'default': 2, 'shard1': 4, 'shard2': 0}
+
+
+@sharded
+def test_rows_found_on_two_shards_are_listed_once(shards, client, user):
+    place(user, 'shard1')
+    echo = baker.make_recipe('tests.echo', user=user, content='moving echo')
+    # Halfway through a move
+    copy_rows(Echo.objects.using('shard1'), 'shard2', 100)
+
+    client.force_login(user)
+    response = client.get(conftest.ECHO_LIST_URL)
+    assert [row.pk for row in response.context['echos']] == [echo.pk]
+    assert len(find('moving').results) == 1
+
+
+@sharded
+def test_purge_removes_deleted_echos_from_every_shard(shards, client, user):
+    place(user, 'shard1')
+    echo = baker.make_recipe('tests.echo', user=user)
+    baker.make_recipe('tests.wave', echo=echo, user=user)
+
+    client.force_login(user)
+    client.post(conftest.ECHO_DELETE_URL.format(echo_pk=echo.pk))
+    assert client.get(conftest.ECHO_DETAIL_URL.format(echo_pk=echo.pk)).status_code == 404
+
+    purge()
+    assert not stored_on(Echo, echo.pk)
+    assert not Wave.all_objects.using('shard1').exists()
@@ -1,5 +1,30 @@
+import asyncio
+import io
+import socketserver
+import threading
+from datetime import UTC, datetime, timedelta
+
+import pytest
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.cached_db import SessionStore
+from django.contrib.sessions.models import Session
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.db import connection, connections, transaction
+from django.db.models import Max, Min
+from django.test.utils import CaptureQueriesContext
+from model_bakery import baker
 from pytest_django.asserts import assertContains
 
+from echos import timeline
+from echos.models import Echo, TimelineEntry
+from shared import deletion
+from shared.broker import InProcessBroker, RedisBroker, encode_command
+from shared.middleware import PIN_COOKIE
+from shared.routers import ReplicaRouter, RequestState, request_state
+from users.models import Follow, Profile
+from waves.models import Wave
+
 from tests import conftest
 
 
@@ -13,3 +38,490 @@ def test_index_contains_link_to_echo_list(client):
     response = client.get('/')
     assert response.status_code == 200
     assertContains(response, conftest.ECHO_LIST_URL)
+
+
+# ==============================================================================
+# CACHE
+# ==============================================================================
+
+
+def test_tiered_cache_serves_hot_keys_from_local_tier():
+    cache = caches['echos']
+    cache.reset_stats()
+    cache.set('key', 'value')
+    shared_gets = caches['shared'].calls['get']
+
+    assert cache.get('key') == 'value'
+    assert cache.get('key') == 'value'
+    assert caches['shared'].calls['get'] == shared_gets
+    assert cache.stats() == {'local_hits': 2, 'shared_hits': 0, 'misses': 0}
+
+
+def test_tiered_cache_falls_back_to_shared_tier():
+    cache = caches['echos']
+    cache.reset_stats()
+    cache.set('key', 'value')
+    cache._local.clear()
+
+    assert cache.get('key') == 'value'
+    assert cache.get('missing') is None
+    assert cache.stats() == {'local_hits': 0, 'shared_hits': 1, 'misses': 1}
+
+
+def test_tiered_cache_namespaces_keys_per_app():
+    caches['echos'].set('count', 1)
+    caches['users'].set('count', 2)
+
+    assert caches['echos'].get('count') == 1
+    assert caches['users'].get('count') == 2
+    assert caches['waves'].get('count') is None
+
+
+@pytest.mark.django_db
+def test_tiered_cache_clear_only_drops_its_own_alias():
+    session = SessionStore()
+    session['kept'] = True
+    session.create()
+    caches['echos'].set('count', 1)
+    caches['users'].set('count', 2)
+
+    caches['echos'].clear()
+
+    assert caches['echos'].get('count') is None
+    caches['users']._local.clear()
+    assert caches['users'].get('count') == 2
+    assert caches['shared'].get(session.cache_key) == {'kept': True}
+
+
+def test_tiered_cache_delete_drops_both_tiers():
+    cache = caches['echos']
+    cache.set('key', 'value')
+    cache.delete('key')
+    cache._local.clear()
+
+    assert cache.get('key') is None
+
+
+def test_tiered_cache_local_tier_is_size_bounded():
+    cache = caches['waves']
+    for i in range(cache._local._max_entries + 50):
+        cache.set(f'key-{i}', i)
+
+    assert len(cache._local._cache) <= cache._local._max_entries
+    assert cache.get('key-0') == 0
+
+
+# ==============================================================================
+# SEED
+# ==============================================================================
+
+
+def seed(*args, **options):
+    call_command(
+        'seed', *args, users=5, echos_per_user=3, waves_per_echo=2, stdout=io.StringIO(), **options
+    )
+
+
+@pytest.mark.django_db
+def test_seed_command_creates_consistent_dataset():
+    seed()
+
+    assert User.objects.count() == 5
+    assert User.objects.filter(profile__isnull=True).count() == 0
+    for echo in Echo.objects.all():
+        assert echo.waves_count == echo.waves.count()
+        assert all(wave.created_at >= echo.created_at for wave in echo.waves.all())
+    for user in User.objects.select_related('profile'):
+        assert user.profile.echos_count == user.echos.count()
+    call_command('recount', '--check', stdout=io.StringIO())
+
+
+@pytest.mark.django_db
+def test_seed_command_is_reproducible():
+    def snapshot():
+        return (
+            list(User.objects.order_by('pk').values_list('username', 'date_joined')),
+            list(
+                Echo.objects.order_by('pk').values_list('user__username', 'content', 'created_at')
+            ),
+            list(Wave.objects.order_by('pk').values_list('echo__content', 'content', 'created_at')),
+        )
+
+    seed(seed=7)
+    first = snapshot()
+    User.objects.all().delete()
+    seed(seed=7)
+    assert snapshot() == first
+
+    User.objects.all().delete()
+    seed(seed=8)
+    assert snapshot() != first
+
+
+@pytest.mark.django_db
+def test_seed_command_ends_content_at_now():
+    seed('--now', '2024-06-01T12:00:00+00:00', days=30)
+
+    now = datetime(2024, 6, 1, 12, tzinfo=UTC)
+    first, last = Echo.objects.aggregate(Min('created_at'), Max('created_at')).values()
+    assert now - timedelta(days=30) <= first <= last <= now
+
+
+@pytest.mark.django_db
+def test_seed_command_refuses_to_seed_twice():
+    seed(seed=7)
+
+    with pytest.raises(CommandError, match='of seed 7 exists already'):
+        seed(seed=7)
+    assert User.objects.count() == 5
+
+
+# ==============================================================================
+# BROKER
+# ==============================================================================
+
+
+class RedisStandIn(socketserver.ThreadingTCPServer):
+    """Just enough of the Redis protocol (SUBSCRIBE/PUBLISH) to test against."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), RedisStandInHandler)
+        self.subscribers = {}
+        self.lock = threading.Lock()
+
+
+class RedisStandInHandler(socketserver.StreamRequestHandler):
+    def read_command(self):
+        if not (header := self.rfile.readline()):
+            return None
+        args = []
+        for _ in range(int(header[1:])):
+            size = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(size + 2)[:-2])
+        return args
+
+    def handle(self):
+        server = self.server
+        channels = []
+        try:
+            while (command := self.read_command()) is not None:
+                name, channel = command[0].upper(), command[1]
+                if name == b'SUBSCRIBE':
+                    with server.lock:
+                        server.subscribers.setdefault(channel, []).append(self.wfile)
+                    channels.append(channel)
+                    # Confirmation: ['subscribe', channel, number of subscriptions]
+                    self.wfile.write(b'*3\r\n$9\r\nsubscribe\r\n$%d\r\n%s\r\n:%d\r\n' % (
+                        len(channel), channel, len(channels)
+                    ))
+                elif name == b'PUBLISH':
+                    with server.lock:
+                        subscribers = list(server.subscribers.get(channel, []))
+                    for wfile in subscribers:
+                        wfile.write(encode_command('message', channel, command[2]))
+                    self.wfile.write(b':%d\r\n' % len(subscribers))
+        finally:
+            with server.lock:
+                for channel in channels:
+                    server.subscribers[channel].remove(self.wfile)
+
+
+@pytest.fixture
+def redis_stand_in():
+    server = RedisStandIn()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'redis://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+    server.server_close()
+
+
+def exchange(broker, channel='echo:1:waves'):
+    async def scenario():
+        async with broker.subscribe(channel) as messages:
+            delivered = await asyncio.to_thread(broker.publish, channel, 'hello')
+            received = await asyncio.wait_for(messages.get(), 1)
+        return delivered, received
+
+    return asyncio.run(scenario())
+
+
+def test_in_process_broker_delivers_to_subscribers():
+    broker = InProcessBroker(None, {})
+    assert exchange(broker) == (1, 'hello')
+    assert broker.publish('echo:1:waves', 'nobody listens') == 0
+
+
+def test_in_process_broker_bounds_pending_messages():
+    broker = InProcessBroker(None, {'MAX_PENDING': 2})
+
+    async def scenario():
+        async with broker.subscribe('channel') as messages:
+            for i in range(5):
+                broker.publish('channel', str(i))
+            await asyncio.sleep(0)
+            return [messages.get_nowait() for _ in range(messages.qsize())]
+
+    assert asyncio.run(scenario()) == ['0', '1']
+
+
+def test_redis_broker_delivers_through_redis_protocol_server(redis_stand_in):
+    broker = RedisBroker(redis_stand_in, {})
+    assert exchange(broker) == (1, 'hello')
+    assert broker.publish('echo:2:waves', 'nobody listens') == 0
+
+
+
+# ==============================================================================
+# DELETION
+# ==============================================================================
+
+
+@pytest.mark.django_db
+def test_deleted_echo_is_hidden_then_purged_in_batches(client, user, another_user, echo):
+    baker.make_recipe('tests.wave', echo=echo, user=another_user, _quantity=5)
+    timeline.follow(another_user, user)
+    client.force_login(user)
+
+    client.get(conftest.ECHO_DELETE_URL.format(echo_pk=echo.pk))
+    assert client.get(conftest.ECHO_DETAIL_URL.format(echo_pk=echo.pk)).status_code == 404
+    user.profile.refresh_from_db()
+    assert user.profile.echos_count == 0
+    # The waves are left to the purge.
+    assert Wave.objects.filter(echo_id=echo.pk).count() == 5
+
+    purged = deletion.purge(batch_size=2)
+    assert purged['echos'] == 1
+    assert purged['waves'] == 5
+    assert not Echo.all_objects.exists()
+    assert not TimelineEntry.objects.exists()
+    another_user.profile.refresh_from_db()
+    assert another_user.profile.waves_count == 0
+    call_command('recount', '--check', stdout=io.StringIO())
+
+
+@pytest.mark.django_db
+def test_purge_cost_depends_on_batches_not_rows(user):
+    def purge_thread(waves, batch_size):
+        echo = baker.make_recipe('tests.echo', user=user)
+        baker.make_recipe('tests.wave', echo=echo, user=user, _quantity=waves)
+        deletion.hide_echos(Echo.objects.filter(pk=echo.pk))
+        with CaptureQueriesContext(connection) as context:
+            deletion.purge(batch_size=batch_size)
+        assert not Wave.all_objects.exists()
+        return len(context.captured_queries)
+
+    assert purge_thread(waves=4, batch_size=2) == purge_thread(waves=40, batch_size=20)
+
+
+@pytest.mark.django_db
+def test_deleted_user_is_hidden_then_purged(client, user, another_user, echo):
+    own_echo = baker.make_recipe('tests.echo', user=another_user)
+    baker.make_recipe('tests.wave', echo=own_echo, user=user, _quantity=2)
+    baker.make_recipe('tests.wave', echo=echo, user=another_user, _quantity=3)
+    timeline.follow(another_user, user)
+    timeline.follow(user, another_user)
+    client.force_login(another_user)
+
+    deletion.hide_users(User.objects.filter(pk=another_user.pk))
+
+    # Logged out, unlisted, and their content is gone from other threads.
+    assert client.get(conftest.ECHO_LIST_URL).status_code == 302
+    client.force_login(user)
+    username = another_user.username
+    assert client.get(conftest.USER_DETAIL_URL.format(username=username)).status_code == 404
+    assert not Echo.objects.filter(user=another_user).exists()
+    echo.refresh_from_db()
+    assert echo.waves_count == 0
+
+    call_command('purge', batch_size=2, stdout=io.StringIO())
+    assert not User.objects.filter(pk=another_user.pk).exists()
+    assert not Follow.objects.exists()
+    assert not Wave.all_objects.exists()
+    user.profile.refresh_from_db()
+    assert user.profile.followers_count == 0
+    assert user.profile.waves_count == 0
+    call_command('recount', '--check', stdout=io.StringIO())
+
+
+@pytest.mark.django_db
+def test_admin_deletes_users_by_hiding(admin_client, user):
+    response = admin_client.post(
+        f'/admin/auth/user/{user.pk}/delete/', {'post': 'yes'}
+    )
+    assert response.status_code == 302
+    user.refresh_from_db()
+    assert not user.is_active
+    assert not Profile.objects.filter(user=user).exists()
+
+
+
+# ==============================================================================
+# SQLITE TUNING
+# ==============================================================================
+
+
+def sqlite_pragmas(path, *pragmas):
+    from django.db.backends.sqlite3.base import DatabaseWrapper
+
+    wrapper = DatabaseWrapper({**connection.settings_dict, 'NAME': str(path)}, alias='tuning')
+    try:
+        with wrapper.cursor() as cursor:
+            return {
+                pragma: cursor.execute(f'PRAGMA {pragma}').fetchone()[0] for pragma in pragmas
+            }
+    finally:
+        wrapper.close()
+
+
+@pytest.mark.django_db
+def test_sqlite_connections_get_the_tuning_profile(tmp_path):
+    pragmas = sqlite_pragmas(
+        tmp_path / 'tuned.sqlite3',
+        'journal_mode', 'synchronous', 'busy_timeout', 'temp_store', 'cache_size',
+    )
+    assert pragmas == {
+        'journal_mode': 'wal',
+        'synchronous': 1,
+        'busy_timeout': 5000,
+        'temp_store': 2,
+        'cache_size': -64000,
+    }
+    assert connection.transaction_mode == 'IMMEDIATE'
+
+
+@pytest.mark.django_db
+def test_sqlite_tuning_profile_can_be_disabled(tmp_path, settings):
+    settings.SQLITE_PRAGMAS = {}
+    pragmas = sqlite_pragmas(tmp_path / 'plain.sqlite3', 'journal_mode', 'synchronous')
+    assert pragmas == {'journal_mode': 'delete', 'synchronous': 2}
+
+
+# ==============================================================================
+# REPLICAS
+# ==============================================================================
+
+
+@pytest.fixture(scope='module')
+def replica_database(tmp_path_factory):
+    # Module-scoped so that the alias exists before the test database setup.
+    connections.settings['replica'] = {
+        **connections['default'].settings_dict,
+        'NAME': str(tmp_path_factory.mktemp('replica') / 'replica.sqlite3'),
+    }
+    yield connections['replica']
+    connections['replica'].close()
+    del connections['replica']
+    del connections.settings['replica']
+
+
+@pytest.fixture
+def replica(replica_database, settings):
+    """Serve reads from a second SQLite file; call the fixture to sync it with the primary."""
+    settings.DATABASE_REPLICAS = ['replica']
+    settings.DATABASE_ROUTERS = ['shared.routers.ReplicaRouter']
+
+    def replicate():
+        connections['default'].ensure_connection()
+        replica_database.ensure_connection()
+        connections['default'].connection.backup(replica_database.connection)
+
+    return replicate
+
+
+@pytest.mark.django_db(transaction=True, databases=['default', 'replica'])
+def test_requests_read_from_the_replica(client, user, replica):
+    client.force_login(user)
+    replica()
+    echo = baker.make_recipe('tests.echo', user=user)
+
+    # The replica lags behind the primary.
+    response = client.get(conftest.ECHO_DETAIL_URL.format(echo_pk=echo.pk))
+    assert response.status_code == 404
+    assert PIN_COOKIE not in response.cookies
+    replica()
+    assert client.get(conftest.ECHO_DETAIL_URL.format(echo_pk=echo.pk)).status_code == 200
+
+
+@pytest.mark.django_db(transaction=True, databases=['default', 'replica'])
+def test_clients_read_their_own_writes_from_the_primary(client, user, replica, settings):
+    settings.REPLICA_PIN_SECONDS = 5
+    client.force_login(user)
+    replica()
+
+    response = client.post(conftest.ECHO_ADD_URL, {'content': 'Fresh echo'}, follow=True)
+    assert response.status_code == 200
+    assertContains(response, 'Fresh echo')
+    assert client.cookies[PIN_COOKIE]['max-age'] == 5
+
+    # Once the pin expires, reads go back to the (still lagging) replica.
+    del client.cookies[PIN_COOKIE]
+    echo = Echo.objects.get(content='Fresh echo')
+    assert client.get(conftest.ECHO_DETAIL_URL.format(echo_pk=echo.pk)).status_code == 404
+
+
+@pytest.mark.django_db(transaction=True)
+def test_reads_stay_on_the_primary_outside_requests_and_in_transactions(settings):
+    settings.DATABASE_REPLICAS = ['replica']
+    router = ReplicaRouter()
+    assert router.db_for_read(Echo) == 'default'
+
+    token = request_state.set(RequestState())
+    try:
+        assert router.db_for_read(Echo) == 'replica'
+        with transaction.atomic():
+            assert router.db_for_read(Echo) == 'default'
+        assert router.db_for_write(Echo) == 'default'
+        assert router.db_for_read(Echo) == 'default'
+    finally:
+        request_state.reset(token)
+
+
+# ==============================================================================
+# SESSIONS
+# ==============================================================================
+
+
+def session_queries(client, method, url, data=None):
+    with CaptureQueriesContext(connection) as context:
+        response = getattr(client, method)(url, data)
+    queries = context.captured_queries
+    return response, [query for query in queries if 'django_session' in query['sql']]
+
+
+@pytest.mark.django_db
+def test_sessions_are_read_from_the_cache(client, user):
+    client.force_login(user)
+    response, queries = session_queries(client, 'get', conftest.ECHO_LIST_URL)
+    assert response.context['user'] == user
+    assert not queries
+
+    # A cache miss falls back to the database.
+    caches['shared'].clear()
+    response, queries = session_queries(client, 'get', conftest.ECHO_LIST_URL)
+    assert response.context['user'] == user
+    assert len(queries) == 1
+
+
+@pytest.mark.django_db
+def test_flash_messages_are_kept_out_of_the_session(client, user):
+    client.force_login(user)
+    response, queries = session_queries(client, 'post', conftest.ECHO_ADD_URL, {'content': 'New'})
+    assert 'messages' in response.cookies
+    assert not queries
+
+    response, queries = session_queries(client, 'get', response.url)
+    assertContains(response, 'Echo added successfully')
+    assert not queries
+
+
+@pytest.mark.django_db
+def test_sessions_can_live_in_signed_cookies(client, user, settings):
+    settings.SESSION_ENGINE = 'django.contrib.sessions.backends.signed_cookies'
+    client.force_login(user)
+    response, queries = session_queries(client, 'get', conftest.ECHO_LIST_URL)
+    assert response.context['user'] == user
+    assert not queries
+    assert not Session.objects.exists()
@@ -1,9 +1,20 @@
+import io
+import json
+
 import pytest
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
 from django.template.defaultfilters import truncatewords
+from django.test.utils import CaptureQueriesContext
 from django.utils.timesince import timesince
 from model_bakery import baker
 from pytest_django.asserts import assertContains, assertNotContains
 
+from echos.models import TimelineEntry
+from shards.models import Placement
+from users.models import Follow, Profile
 from tests import conftest
 
 # ==============================================================================
@@ -32,6 +43,16 @@ def test_user_list_page_contains_expected_contents(client, user, django_user_mod
         assertContains(response, conftest.USER_DETAIL_URL.format(username=user.username))
 
 
+@pytest.mark.django_db
+def test_user_list_page_has_fixed_query_budget(client, user):
+    client.force_login(user)
+    conftest.assert_fixed_query_budget(
+        client,
+        conftest.USER_LIST_URL,
+        lambda: [baker.make_recipe('tests.profile') for _ in range(10)],
+    )
+
+
 # ==============================================================================
 # USER DETAIL
 # ==============================================================================
@@ -157,6 +178,20 @@ def test_user_detail_page_contains_echos_in_expected_order(client, user, another
         last_index = current_index
 
 
+@pytest.mark.django_db
+def test_user_detail_page_only_fetches_latest_echos(client, user, another_user, settings):
+    settings.PROFILE_ECHOS_LIMIT = 3
+    baker.make_recipe('tests.echo', user=another_user, _quantity=8)
+
+    client.force_login(user)
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(conftest.USER_DETAIL_URL.format(username=another_user.username))
+    assert len(response.context['echos']) == 3
+    echo_query = next(q['sql'] for q in queries if 'FROM "echos_echo"' in q['sql'])
+    assert 'LIMIT 3' in echo_query
+    assert 'COUNT' not in ' '.join(q['sql'] for q in queries)
+
+
 @pytest.mark.django_db
 def test_user_detail_page_shows_expected_message_when_no_echos(client, user, another_user):
     client.force_login(user)
@@ -178,6 +213,43 @@ def test_user_detail_page_shows_404_for_nonexistent_user(client, user):
     assert response.status_code == 404
 
 
+@pytest.mark.django_db
+def test_user_detail_page_has_fixed_query_budget(client, user, another_user):
+    baker.make_recipe('tests.echo', user=another_user, _quantity=2)
+
+    client.force_login(user)
+    conftest.assert_fixed_query_budget(
+        client,
+        conftest.USER_DETAIL_URL.format(username=another_user.username),
+        lambda: baker.make_recipe('tests.echo', user=another_user, _quantity=10),
+    )
+
+
+@pytest.mark.django_db
+def test_user_detail_page_is_not_modified_on_revalidation(client, user, another_user):
+    baker.make_recipe('tests.echo', user=another_user, _quantity=2)
+    url = conftest.USER_DETAIL_URL.format(username=another_user.username)
+    client.force_login(user)
+    client.get(url)
+
+    etag = client.get(url)['ETag']
+    response = client.get(url, headers={'if-none-match': etag})
+    assert response.status_code == 304
+    assert not response.templates
+
+    another_user.profile.bio = 'A brand new bio'
+    another_user.profile.save()
+    response = client.get(url, headers={'if-none-match': etag})
+    assert response.status_code == 200
+    assertContains(response, 'A brand new bio')
+
+    etag = response['ETag']
+    client.post(conftest.PROFILE_FOLLOW_URL.format(username=another_user.username))
+    response = client.get(url, headers={'if-none-match': etag})
+    assert response.status_code == 200
+    assertContains(response, 'Unfollow')
+
+
 # ==============================================================================
 # USER ECHOS
 # ==============================================================================
@@ -270,6 +342,37 @@ def test_user_echos_page_contains_echos_in_expected_order(client, user, another_
         last_index = current_index
 
 
+@pytest.mark.django_db
+def test_user_echos_page_is_paginated_with_cursors(client, user, another_user, settings):
+    settings.PROFILE_ECHOS_PAGE_SIZE = 4
+    echos = baker.make_recipe('tests.echo', user=another_user, _quantity=6)
+    baker.make_recipe('tests.echo', user=user, _quantity=3)
+    echos = sorted(echos, key=lambda e: (e.created_at, e.pk), reverse=True)
+    url = conftest.USER_ECHOS_URL.format(username=another_user.username)
+
+    client.force_login(user)
+    response = client.get(url)
+    first_page = response.context['echos']
+    assert [echo.pk for echo in first_page] == [echo.pk for echo in echos[:4]]
+    assertContains(response, 'Older echos')
+
+    response = client.get(url, {'cursor': first_page.next_cursor})
+    last_page = response.context['echos']
+    assert [echo.pk for echo in last_page] == [echo.pk for echo in echos[4:]]
+    assert not last_page.has_next
+    assertContains(response, 'Newer echos')
+
+
+@pytest.mark.django_db
+def test_user_echos_page_redirects_on_invalid_cursor(client, user, another_user):
+    url = conftest.USER_ECHOS_URL.format(username=another_user.username)
+
+    client.force_login(user)
+    response = client.get(url, {'cursor': 'not-a-cursor'})
+    assert response.status_code == 302
+    assert response.url == url
+
+
 @pytest.mark.django_db
 def test_user_echos_page_shows_expected_message_when_no_echos(client, user, another_user):
     client.force_login(user)
@@ -291,6 +394,18 @@ def test_user_echos_page_shows_404_for_nonexistent_user(client, user):
     assert response.status_code == 404
 
 
+@pytest.mark.django_db
+def test_user_echos_page_has_fixed_query_budget(client, user, another_user):
+    baker.make_recipe('tests.echo', user=another_user, _quantity=2)
+
+    client.force_login(user)
+    conftest.assert_fixed_query_budget(
+        client,
+        conftest.USER_ECHOS_URL.format(username=another_user.username),
+        lambda: baker.make_recipe('tests.echo', user=another_user, _quantity=10),
+    )
+
+
 # ==============================================================================
 # ME PROFILE
 # ==============================================================================
@@ -388,3 +503,221 @@ def test_edit_profile_shows_confirmation_message_after_done(client, user):
 
     assert response.status_code == 200
     assertContains(response, 'Profile updated successfully')
+
+
+# ==============================================================================
+# FOLLOW
+# ==============================================================================
+
+
+@pytest.mark.django_db
+def test_follow_backfills_timeline_and_counts_followers(client, user, another_user):
+    echos = baker.make_recipe('tests.echo', user=another_user, _quantity=3)
+    client.force_login(user)
+
+    url = conftest.PROFILE_FOLLOW_URL.format(username=another_user.username)
+    response = client.post(url)
+    assert response.status_code == 302
+    assert response.url == conftest.USER_DETAIL_URL.format(username=another_user.username)
+    assert Follow.objects.filter(follower=user, followed=another_user).exists()
+    assert sorted(TimelineEntry.objects.filter(owner=user).values_list('echo_id', flat=True)) == (
+        sorted(echo.pk for echo in echos)
+    )
+
+    client.post(url)
+    another_user.profile.refresh_from_db()
+    assert another_user.profile.followers_count == 1
+
+    response = client.get(conftest.USER_DETAIL_URL.format(username=another_user.username))
+    assertContains(response, '1 follower')
+    assertContains(response, conftest.PROFILE_UNFOLLOW_URL.format(username=another_user.username))
+
+
+@pytest.mark.django_db
+def test_unfollow_clears_timeline_and_counts_followers(client, user, another_user):
+    baker.make_recipe('tests.echo', user=another_user, _quantity=3)
+    client.force_login(user)
+    client.post(conftest.PROFILE_FOLLOW_URL.format(username=another_user.username))
+
+    client.post(conftest.PROFILE_UNFOLLOW_URL.format(username=another_user.username))
+    assert not Follow.objects.exists()
+    assert not TimelineEntry.objects.filter(owner=user).exists()
+    another_user.profile.refresh_from_db()
+    assert another_user.profile.followers_count == 0
+
+
+@pytest.mark.django_db
+def test_follow_requires_post_and_another_user(client, user):
+    client.force_login(user)
+    url = conftest.PROFILE_FOLLOW_URL.format(username=user.username)
+    assert client.get(url).status_code == 405
+    assert client.post(url).status_code == 403
+
+
+# ==============================================================================
+# CURRENT USER
+# ==============================================================================
+
+
+@pytest.mark.django_db
+def test_current_user_is_loaded_with_its_profile_in_one_query(client, user, settings):
+    settings.CURRENT_USER_CACHE_TIMEOUT = 0
+    client.force_login(user)
+
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get('/')
+    assertContains(response, user.profile.avatar.url)
+    sql = [query['sql'] for query in queries]
+    assert len([q for q in sql if 'FROM "auth_user"' in q]) == 1
+    assert not [q for q in sql if 'FROM "users_profile"' in q]
+
+
+@pytest.mark.django_db
+def test_current_user_is_served_from_cache(client, user):
+    client.force_login(user)
+    client.get('/')
+
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get('/')
+    assertContains(response, user.profile.avatar.url)
+    assert not [query for query in queries if 'auth_user' in query['sql']]
+
+
+@pytest.mark.django_db
+def test_current_user_cache_is_invalidated_when_editing_profile(
+    client,
+    user,
+    image,
+    uploads_folder,  # noqa F811
+):
+    client.force_login(user)
+    client.get('/')
+
+    client.post(conftest.PROFILE_EDIT_URL.format(username=user.username), {'avatar': image})
+    user.profile.refresh_from_db()
+
+    response = client.get('/')
+    assertContains(response, user.profile.avatar.url)
+    assert response.wsgi_request.user.profile.avatar == user.profile.avatar
+
+
+# ==============================================================================
+# ADMIN
+# ==============================================================================
+
+
+@pytest.mark.django_db
+def test_admin_profile_changelist_has_fixed_query_budget(admin_client, user):
+    def add_rows():
+        for _ in range(5):
+            baker.make_recipe('tests.profile')
+
+    conftest.assert_fixed_query_budget(admin_client, conftest.ADMIN_PROFILE_LIST_URL, add_rows)
+
+
+@pytest.mark.django_db
+def test_admin_profile_search_matches_exact_usernames(admin_client, user, another_user):
+    response = admin_client.get(conftest.ADMIN_PROFILE_LIST_URL, {'q': user.username})
+    assert [profile.user for profile in response.context['cl'].result_list] == [user]
+
+    response = admin_client.get(conftest.ADMIN_PROFILE_LIST_URL, {'q': user.username[:3]})
+    assert list(response.context['cl'].result_list) == []
+
+
+@pytest.mark.django_db
+def test_admin_recounts_selected_profiles(admin_client, user, another_user):
+    echo = baker.make_recipe('tests.echo', user=user)
+    baker.make_recipe('tests.wave', echo=echo, user=user, _quantity=2)
+    Follow.objects.create(follower=another_user, followed=user)
+    Profile.objects.update(echos_count=9, waves_count=9, followers_count=9)
+
+    admin_client.post(
+        conftest.ADMIN_PROFILE_LIST_URL,
+        {'action': 'recount', '_selected_action': [user.profile.pk]},
+    )
+
+    user.profile.refresh_from_db()
+    assert (user.profile.echos_count, user.profile.waves_count) == (1, 2)
+    assert user.profile.followers_count == 1
+
+
+# ==============================================================================
+# IMPORT
+# ==============================================================================
+
+
+@pytest.fixture
+def fast_hashing(settings):
+    settings.PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+
+def import_users(path, **options):
+    stdout = io.StringIO()
+    call_command('import_users', str(path), stdout=stdout, **options)
+    return stdout.getvalue()
+
+
+@pytest.mark.django_db
+def test_import_users_creates_users_with_profiles(tmp_path, fast_hashing):
+    path = tmp_path / 'users.csv'
+    path.write_text(
+        'username,password,email,bio\n'
+        'ada,s3cret,ada@example.com,Countess\n'
+        'alan,en1gma,,\n'
+        'nopassword,,,\n'
+    )
+
+    output = import_users(path, workers=1, batch_size=2)
+
+    assert 'Imported 3 users' in output
+    ada = get_user_model().objects.get(username='ada')
+    assert ada.check_password('s3cret')
+    assert (ada.email, ada.profile.bio) == ('ada@example.com', 'Countess')
+    assert not get_user_model().objects.get(username='nopassword').has_usable_password()
+    assert Profile.objects.count() == 3
+    assert Placement.objects.count() == 3
+
+
+@pytest.mark.django_db
+def test_import_users_skips_existing_duplicated_and_invalid_usernames(
+    tmp_path, fast_hashing, user
+):
+    path = tmp_path / 'users.ndjson'
+    lines = [
+        {'username': user.username, 'password': 'x'},
+        {'username': 'grace', 'password': 'c0b0l'},
+        {'username': 'grace', 'password': 'again'},
+        {'username': 'not valid!', 'password': 'x'},
+        {'password': 'x'},
+    ]
+    path.write_text('\n'.join(json.dumps(line) for line in lines) + '\n')
+
+    output = import_users(path, workers=1)
+
+    assert 'Imported 1 users' in output
+    assert 'skipped 2 existing and 2 invalid' in output
+    assert get_user_model().objects.get(username='grace').check_password('c0b0l')
+
+
+@pytest.mark.django_db
+def test_import_users_hashes_passwords_in_worker_processes(tmp_path, fast_hashing):
+    path = tmp_path / 'users.jsonl'
+    path.write_text(
+        ''.join(json.dumps({'username': f'user{i}', 'password': f'pw{i}'}) + '\n' for i in range(5))
+    )
+
+    import_users(path, workers=2, batch_size=2)
+
+    users = get_user_model().objects.order_by('username')
+    assert [user.check_password(f'pw{i}') for i, user in enumerate(users)] == [True] * 5
+
+
+@pytest.mark.django_db
+def test_import_users_rejects_unknown_formats_and_bad_lines(tmp_path):
+    with pytest.raises(CommandError, match='--format'):
+        import_users(tmp_path / 'users.txt')
+
+    path = tmp_path / 'users.ndjson'
+    path.write_text('{"username": "ok"}\n{broken\n')
+    with pytest.raises(CommandError, match='Line 2'):
+        import_users(path, workers=1)
@@ -1,7 +1,45 @@
 from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.utils.text import Truncator
 
-from .models import Profile
+from echos.models import Echo
+from shared.admin import EXCERPT_LENGTH, HideOnDeleteMixin
+from shared.deletion import hide_users
+from shared.management.commands.recount import count_of
+from waves.models import Wave
+
+from .models import Follow, Profile
+
+User = get_user_model()
+
+admin.site.unregister(User)
+
+@admin.register(User)
+class UserAdmin(HideOnDeleteMixin, BaseUserAdmin):
+    hide = staticmethod(hide_users)
 
 @admin.register(Profile)
 class ProfileAdmin(admin.ModelAdmin):
-    list_display = ('pk', 'user', 'bio', 'avatar')
\ No newline at end of file
+    list_display = ('pk', 'user', 'bio_excerpt', 'avatar', 'echos_count', 'waves_count')
+    list_select_related = ('user',)
+    raw_id_fields = ('user',)
+    # Usernames are unique: an exact match is an index lookup.
+    search_fields = ('user__username__exact',)
+    search_help_text = 'Exact username.'
+    show_full_result_count = False
+    actions = ('recount',)
+
+    @admin.display(description='bio')
+    def bio_excerpt(self, obj):
+        return Truncator(obj.bio).chars(EXCERPT_LENGTH)
+
+    @admin.action(permissions=['change'], description='Recount echos, waves and followers')
+    def recount(self, request, queryset):
+        updated = Profile.objects.filter(pk__in=queryset.values('pk')).update(
+            echos_count=count_of(Echo, 'user', 'user'),
+            waves_count=count_of(Wave, 'user', 'user'),
+            followers_count=count_of(Follow, 'followed', 'user'),
+        )
+        self.message_user(request, f'Recounted {updated} profiles.')
+
@@ -0,0 +1,76 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.hashers import make_password
+from django.core.cache import caches
+
+from accounts import passwords
+
+CURRENT_USER_CACHE_KEY = 'current:{pk}'
+
+
+def current_user_cache_key(pk):
+    return CURRENT_USER_CACHE_KEY.format(pk=pk)
+
+
+class ProfileModelBackend(ModelBackend):
+    """ModelBackend that loads the session user together with its profile.
+
+    Every page renders the header avatar, so fetching the profile in the same
+    query as the user saves one query per authenticated request. With
+    CURRENT_USER_CACHE_TIMEOUT set, the pair is also kept in the `users` cache
+    and dropped whenever the user or its profile is saved.
+
+    Async logins hash on the password pool of accounts.passwords rather than
+    the single thread Django's `aauthenticate()` shares with all sync code.
+    """
+
+    async def aauthenticate(self, request, username=None, password=None, **kwargs):
+        UserModel = get_user_model()
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = await UserModel._default_manager.aget_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # Hash anyway, so response times don't tell which usernames exist.
+            await passwords.run(make_password, password)
+            return None
+        if await passwords.averify(user, password) and self.user_can_authenticate(user):
+            return user
+        return None
+
+    def get_user(self, user_id):
+        timeout = settings.CURRENT_USER_CACHE_TIMEOUT
+        if timeout:
+            key = current_user_cache_key(user_id)
+            if (user := caches['users'].get(key)) is not None:
+                return user if self.user_can_authenticate(user) else None
+
+        UserModel = get_user_model()
+        try:
+            user = UserModel._default_manager.select_related('profile').get(pk=user_id)
+        except UserModel.DoesNotExist:
+            return None
+
+        if timeout:
+            caches['users'].set(key, user, timeout)
+        return user if self.user_can_authenticate(user) else None
+
+    async def aget_user(self, user_id):
+        timeout = settings.CURRENT_USER_CACHE_TIMEOUT
+        if timeout:
+            key = current_user_cache_key(user_id)
+            if (user := await caches['users'].aget(key)) is not None:
+                return user if self.user_can_authenticate(user) else None
+
+        UserModel = get_user_model()
+        try:
+            user = await UserModel._default_manager.select_related('profile').aget(pk=user_id)
+        except UserModel.DoesNotExist:
+            return None
+
+        if timeout:
+            await caches['users'].aset(key, user, timeout)
+        return user if self.user_can_authenticate(user) else None
@@ -0,0 +1,164 @@
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from pathlib import Path
+
+import django
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from shards import directory
+from users.models import Profile
+
+FORMATS = {'.csv': 'csv', '.ndjson': 'ndjson', '.jsonl': 'ndjson'}
+USER_FIELDS = ('email', 'first_name', 'last_name')
+
+
+def read_csv(file):
+    yield from csv.DictReader(file)
+
+
+def read_ndjson(file):
+    for number, line in enumerate(file, 1):
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as error:
+                raise CommandError(f'Line {number} is not valid JSON: {error}')
+
+
+READERS = {'csv': read_csv, 'ndjson': read_ndjson}
+
+
+def batches(records, size):
+    records = iter(records)
+    while batch := list(islice(records, size)):
+        yield batch
+
+
+def init_worker():
+    django.setup()
+
+
+class Command(BaseCommand):
+    help = (
+        'Create users and their profiles from a CSV or NDJSON file with username, password '
+        'and optional email, first_name, last_name and bio columns'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File to import, or - for standard input')
+        parser.add_argument(
+            '--format', choices=READERS, help='Input format (defaults to the file extension)'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000, help='Users created per transaction'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count(),
+            help='Processes hashing passwords (defaults to one per core)',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not (format := options['format'] or FORMATS.get(Path(path).suffix.lower())):
+            raise CommandError('Give the input --format (csv or ndjson)')
+        self.workers = options['workers']
+        self.verbosity = options['verbosity']
+        self.counts = {'imported': 0, 'existing': 0, 'invalid': 0}
+        self.seen = set()
+
+        start = time.perf_counter()
+        if path == '-':
+            self.run(READERS[format](sys.stdin), options['batch_size'])
+        else:
+            with open(path, newline='', encoding='utf-8') as file:
+                self.run(READERS[format](file), options['batch_size'])
+        elapsed = time.perf_counter() - start
+
+        imported, existing, invalid = self.counts.values()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Imported {imported} users in {elapsed:.1f}s ({imported / elapsed:,.0f} users/s), '
+                f'skipped {existing} existing and {invalid} invalid'
+            )
+        )
+
+    def run(self, records, batch_size):
+        """Hash each batch in the pool while the previous one is inserted."""
+        pool = None
+        if self.workers > 1:
+            pool = ProcessPoolExecutor(self.workers, initializer=init_worker)
+        try:
+            pending = None
+            for batch in batches(records, batch_size):
+                if not (fresh := self.new_records(batch)):
+                    continue
+                # Users without a password get an unusable one.
+                passwords = [record.get('password') or None for record in fresh]
+                if pool:
+                    chunksize = -(-len(passwords) // self.workers)
+                    hashes = pool.map(make_password, passwords, chunksize=chunksize)
+                else:
+                    hashes = map(make_password, passwords)
+                if pending:
+                    self.insert(*pending)
+                pending = fresh, hashes
+            if pending:
+                self.insert(*pending)
+        finally:
+            if pool:
+                pool.shutdown(cancel_futures=True)
+
+    def new_records(self, batch):
+        """The records of `batch` with a valid username not seen or stored yet."""
+        username_field = get_user_model()._meta.get_field('username')
+        records = []
+        for record in batch:
+            username = (record.get('username') or '').strip()
+            try:
+                username_field.run_validators(username)
+            except ValidationError:
+                username = ''
+            if not username:
+                self.counts['invalid'] += 1
+            elif username in self.seen:
+                self.counts['existing'] += 1
+            else:
+                self.seen.add(username)
+                records.append({**record, 'username': username})
+
+        users = get_user_model().objects.filter(username__in=[r['username'] for r in records])
+        existing = set(users.values_list('username', flat=True))
+        self.counts['existing'] += len(existing)
+        return [record for record in records if record['username'] not in existing]
+
+    def insert(self, records, hashes):
+        User = get_user_model()
+        users = [
+            User(
+                username=record['username'],
+                password=password,
+                **{field: record.get(field) or '' for field in USER_FIELDS},
+            )
+            for record, password in zip(records, hashes)
+        ]
+        with transaction.atomic():
+            users = User.objects.bulk_create(users)
+            Profile.objects.bulk_create(
+                Profile(user=user, bio=record.get('bio') or '')
+                for user, record in zip(users, records)
+            )
+            directory.place_users(users)
+        self.counts['imported'] += len(users)
+        if self.verbosity > 1:
+            self.stdout.write(f'{self.counts["imported"]} users imported')
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:31
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_counts(apps, schema_editor):
+    Profile = apps.get_model('users', 'Profile')
+    Echo = apps.get_model('echos', 'Echo')
+    Wave = apps.get_model('waves', 'Wave')
+
+    def count(model):
+        rows = model.objects.filter(user=OuterRef('user')).order_by().values('user')
+        return Coalesce(Subquery(rows.annotate(c=Count('pk')).values('c')), 0)
+
+    Profile.objects.update(echos_count=count(Echo), waves_count=count(Wave))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+        ('echos', '0001_initial'),
+        ('waves', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='echos_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='waves_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_counts, migrations.RunPython.noop),
+    ]
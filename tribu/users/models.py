@@ -1,6 +1,21 @@
 from django.db import models
 from django.conf import settings
 
+
+class ProfileQuerySet(models.QuerySet):
+    def for_directory(self):
+        return self.select_related('user').only('user__username')
+
+    def for_profile(self):
+        return self.select_related('user')
+
+
+class ProfileManager(models.Manager.from_queryset(ProfileQuerySet)):
+    def get_queryset(self):
+        # Profiles of deleted users are hidden until `manage.py purge` removes the user.
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
 class Profile(models.Model):
     user = models.OneToOneField(
         settings.AUTH_USER_MODEL, 
@@ -11,4 +26,33 @@ class Profile(models.Model):
     avatar = models.ImageField(
         upload_to='avatars', 
         default='avatars/noavatar.png'
-    )
\ No newline at end of file
+    )
+    echos_count = models.PositiveIntegerField(default=0, editable=False)
+    waves_count = models.PositiveIntegerField(default=0, editable=False)
+    followers_count = models.PositiveIntegerField(default=0, editable=False)
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    objects = ProfileManager()
+    all_objects = ProfileQuerySet.as_manager()
+
+
+class Follow(models.Model):
+    follower = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        related_name='following',
+        on_delete=models.CASCADE
+    )
+    followed = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        related_name='followers',
+        on_delete=models.CASCADE
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['follower', 'followed'], name='unique_follow'),
+            models.CheckConstraint(
+                condition=~models.Q(follower=models.F('followed')), name='no_self_follow'
+            ),
+        ]
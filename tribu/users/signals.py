@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .backends import current_user_cache_key
+from .models import Follow, Profile
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def invalidate_current_user_on_user_change(sender, instance, **kwargs):
+    caches['users'].delete(current_user_cache_key(instance.pk))
+
+
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+def invalidate_current_user_on_profile_change(sender, instance, **kwargs):
+    caches['users'].delete(current_user_cache_key(instance.user_id))
+
+
+@receiver(post_save, sender=Follow)
+def increment_followers_count(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        Profile.objects.filter(user_id=instance.followed_id).update(
+            followers_count=F('followers_count') + 1
+        )
+
+
+@receiver(post_delete, sender=Follow)
+def decrement_followers_count(sender, instance, **kwargs):
+    Profile.objects.filter(user_id=instance.followed_id, followers_count__gt=0).update(
+        followers_count=F('followers_count') - 1
+    )
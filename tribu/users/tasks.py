@@ -0,0 +1,36 @@
+import io
+from pathlib import PurePath
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+from jobs.queue import task
+
+from .backends import current_user_cache_key
+from .models import Profile
+
+
+@task(priority=10)
+def process_avatar(profile_pk, name):
+    """Crop and shrink the uploaded avatar `name` to an AVATAR_SIZE square PNG."""
+    # Skip avatars replaced (or profiles deleted) since the upload.
+    if (profile := Profile.objects.filter(pk=profile_pk, avatar=name).first()) is None:
+        return
+    size = settings.AVATAR_SIZE
+    with profile.avatar.open('rb') as upload, Image.open(upload) as image:
+        image = ImageOps.fit(ImageOps.exif_transpose(image), (size, size))
+        buffer = io.BytesIO()
+        image.save(buffer, format='PNG', optimize=True)
+
+    storage = profile.avatar.storage
+    processed = storage.save(
+        f'avatars/{PurePath(name).stem}-{size}.png', ContentFile(buffer.getvalue())
+    )
+    # Another upload may have landed while resizing: only replace the original.
+    if Profile.objects.filter(pk=profile_pk, avatar=name).update(avatar=processed):
+        storage.delete(name)
+        caches['users'].delete(current_user_cache_key(profile.user_id))
+    else:
+        storage.delete(processed)
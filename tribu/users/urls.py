@@ -9,5 +9,7 @@ urlpatterns = [
     path('@me/', views.my_user_detail, name='me'),
     path('<str:username>/', views.user_detail, name='profile'),
     path('<str:username>/echos/', views.user_echos, name='user-echos'),
-    path('<str:username>/edit/', views.edit_profile, name='user-edit')
+    path('<str:username>/edit/', views.edit_profile, name='user-edit'),
+    path('<str:username>/follow/', views.follow_user, name='follow'),
+    path('<str:username>/unfollow/', views.unfollow_user, name='unfollow'),
 ]
\ No newline at end of file
@@ -1,32 +1,97 @@
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.http import HttpResponse
-from django.shortcuts import get_object_or_404, render, redirect
+from django.shortcuts import aget_object_or_404, get_object_or_404, render, redirect
 from django.core.exceptions import PermissionDenied
+from django.views.decorators.http import require_POST
 from django.http import HttpResponseNotFound
-from .models import Profile
+from .models import Follow, Profile
 from .forms import EditProfileForm
+from .tasks import process_avatar
 from django.contrib import messages
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from echos import timeline
+from echos.models import Echo
+from shared.decorators import async_condition, async_login_required, viewer_etag
+from shared.pagination import CursorPaginator, InvalidCursor
+from shards import directory
 
 
 @login_required
 def user_list(request):
-    try:
-        users = Profile.objects.all()
-    except Profile.DoesNotExist:
-        return HttpResponse('There are no users currently!')
-
+    users = Profile.objects.for_directory()
     return render(request, 'users/list.html', {'profiles': users})
 
 
+async def profile_validators(request, username):
+    # Profiles have no timestamp, so the ETag covers everything the page shows.
+    following = Follow.objects.filter(follower=request.user, followed=OuterRef('user'))
+    profile = await (
+        Profile.objects.filter(user__username=username)
+        .annotate(is_following=Exists(following))
+        .values(
+            'user_id', 'bio', 'avatar', 'echos_count', 'followers_count', 'is_following',
+            'user__first_name', 'user__last_name', 'user__email',
+        )
+        .afirst()
+    )
+    if profile is None:
+        return None, None
+    latest = await directory.afor_user(Echo.objects, profile['user_id'])
+    latest = latest.filter(user_id=profile['user_id']).order_by('-created_at', '-pk')
+    echos = [
+        echo async for echo in latest.values_list('pk', 'updated_at')[: settings.PROFILE_ECHOS_LIMIT]
+    ]
+    return viewer_etag(request, request.path, profile, echos), None
+
+@async_login_required
+@async_condition(profile_validators)
+async def user_detail(request, username):
+    profile = await aget_object_or_404(Profile.objects.for_profile(), user__username=username)
+    latest = await directory.afor_user(Echo.objects.for_feed(), profile.user_id)
+    latest = latest.filter(user_id=profile.user_id)[: settings.PROFILE_ECHOS_LIMIT]
+    echos = [echo async for echo in latest]
+    is_following = await Follow.objects.filter(
+        follower=request.user, followed_id=profile.user_id
+    ).aexists()
+    return render(
+        request,
+        'users/profile/profile.html',
+        {'profile': profile, 'echos': echos, 'is_following': is_following},
+    )
+
+@async_login_required
+async def user_echos(request, username):
+    profile = await aget_object_or_404(Profile.objects.for_profile(), user__username=username)
+    echos = await directory.afor_user(Echo.objects.for_feed(), profile.user_id)
+    paginator = CursorPaginator(
+        echos.filter(user_id=profile.user_id), settings.PROFILE_ECHOS_PAGE_SIZE
+    )
+    try:
+        echos = await paginator.apage(request.GET.get('cursor'))
+    except InvalidCursor:
+        return redirect('users:user-echos', username=username)
+    return render(
+        request, 'users/profile/profile-echos.html', {'profile': profile, 'echos': echos}
+    )
+
 @login_required
-def user_detail(request, username):
-    profile = get_object_or_404(Profile, user__username=username)
-    return render(request, 'users/profile/profile.html', {'profile': profile})
+@require_POST
+def follow_user(request, username):
+    profile = get_object_or_404(Profile.objects.for_profile(), user__username=username)
+    if profile.user_id == request.user.pk:
+        raise PermissionDenied
+    with transaction.atomic():
+        timeline.follow(request.user, profile.user)
+    return redirect('users:profile', username=username)
 
 @login_required
-def user_echos(request, username):
-    profile = get_object_or_404(Profile, user__username=username)
-    return render(request, 'users/profile/profile-echos.html', {'profile': profile})
+@require_POST
+def unfollow_user(request, username):
+    profile = get_object_or_404(Profile.objects.for_profile(), user__username=username)
+    with transaction.atomic():
+        timeline.unfollow(request.user, profile.user)
+    return redirect('users:profile', username=username)
 
 @login_required
 def my_user_detail(request):
@@ -37,13 +102,16 @@ def my_user_detail(request):
 def edit_profile(request, username):
     profile = get_object_or_404(Profile, user__username=username)
     
-    if profile.user != request.user:
+    if profile.user_id != request.user.pk:
         raise PermissionDenied
 
     if request.method == 'POST':
         if (form := EditProfileForm(request.POST,request.FILES, instance=profile)).is_valid():
             profile = form.save(commit=False)
-            profile.save()
+            with transaction.atomic():
+                profile.save()
+                if 'avatar' in form.changed_data:
+                    process_avatar.enqueue(profile_pk=profile.pk, name=profile.avatar.name)
             messages.success(request, 'Profile updated successfully')  
         return redirect('users:me')
     else:
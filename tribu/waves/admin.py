@@ -1,7 +1,15 @@
 from django.contrib import admin
 
+from shared.admin import ContentAdmin
+from shared.deletion import hide_waves
+
 from .models import Wave
 
 @admin.register(Wave)
-class WaveAdmin(admin.ModelAdmin):
-    list_display = ('pk', 'content', 'created_at', 'updated_at', 'user', 'echo')
\ No newline at end of file
+class WaveAdmin(ContentAdmin):
+    list_display = ('pk', 'content_excerpt', 'created_at', 'updated_at', 'user', 'echo')
+    list_select_related = ('user', 'echo')
+    raw_id_fields = ('user', 'echo')
+    search_kind = 'waves'
+    ordering = ('-created_at',)
+    hide = staticmethod(hide_waves)
@@ -0,0 +1,109 @@
+"""Live wave updates for echo threads.
+
+Browsers viewing an echo open a WebSocket on `/ws/echos/<pk>/waves/` (served
+by `main.asgi`). Whenever a wave of that echo is added, edited or deleted the
+view publishes an event on the echo's channel, and every subscriber receives
+it as JSON: `{"event": "added" | "edited" | "deleted", "wave": pk, "html": ...}`.
+The HTML is the wave card as seen by a reader who isn't its author.
+"""
+
+import asyncio
+import json
+import re
+from importlib import import_module
+from types import SimpleNamespace
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib import auth
+from django.db import transaction
+from django.http import parse_cookie
+from django.template.loader import render_to_string
+
+from echos.models import Echo
+from shared.broker import get_broker
+from shards import directory
+
+LIVE_WAVES_URL = '/ws/echos/{echo_pk}/waves/'
+LIVE_WAVES_PATH = re.compile(r'^/ws/echos/(?P<echo_pk>\d+)/waves/$')
+
+ADDED = 'added'
+EDITED = 'edited'
+DELETED = 'deleted'
+
+
+def channel(echo_pk):
+    return f'echo:{echo_pk}:waves'
+
+
+def live_waves_url(echo_pk):
+    return LIVE_WAVES_URL.format(echo_pk=echo_pk)
+
+
+def publish(event, wave):
+    """Publish `event` for `wave` once the current transaction commits.
+
+    A broker that can't be reached only costs subscribers the update: the
+    failure is logged and the write stands.
+    """
+    message = {'event': event, 'wave': wave.pk}
+    if event != DELETED:
+        message['html'] = render_to_string('echos/echo/wave.html', {'wave': wave})
+    echo_pk = wave.echo_id
+    transaction.on_commit(
+        lambda: get_broker().publish(channel(echo_pk), json.dumps(message)),
+        using=wave._state.db,
+        robust=True,
+    )
+
+
+async def authenticate(scope):
+    headers = dict(scope['headers'])
+    # Browsers always send Origin on WebSockets: refuse pages from other sites.
+    if (origin := headers.get(b'origin')) and urlsplit(origin.decode()).netloc != (
+        headers.get(b'host', b'').decode()
+    ):
+        return None
+    cookies = parse_cookie(headers.get(b'cookie', b'').decode())
+    engine = import_module(settings.SESSION_ENGINE)
+    session = engine.SessionStore(cookies.get(settings.SESSION_COOKIE_NAME))
+    user = await auth.aget_user(SimpleNamespace(session=session))
+    return user if user.is_authenticated else None
+
+
+async def application(scope, receive, send):
+    """ASGI application for the live waves WebSocket."""
+    if (await receive())['type'] != 'websocket.connect':
+        return
+    match = LIVE_WAVES_PATH.match(scope['path'])
+    if match is None or await authenticate(scope) is None:
+        await send({'type': 'websocket.close', 'code': 4403})
+        return
+    echo_pk = int(match['echo_pk'])
+    if await directory.afirst(Echo.objects.filter(pk=echo_pk).values('pk')) is None:
+        await send({'type': 'websocket.close', 'code': 4404})
+        return
+
+    # Subscribe before accepting so no event published after the handshake is missed.
+    async with get_broker().subscribe(channel(echo_pk)) as messages:
+        await send({'type': 'websocket.accept'})
+        incoming = asyncio.ensure_future(receive())
+        while True:
+            outgoing = asyncio.ensure_future(messages.get())
+            done, _ = await asyncio.wait(
+                {incoming, outgoing}, return_when=asyncio.FIRST_COMPLETED
+            )
+            if outgoing in done:
+                if (message := outgoing.result()) is None:
+                    await send({'type': 'websocket.close', 'code': 1011})
+                    incoming.cancel()
+                    return
+                await send({'type': 'websocket.send', 'text': message})
+            else:
+                outgoing.cancel()
+            if incoming in done:
+                if incoming.result()['type'] == 'websocket.disconnect':
+                    outgoing.cancel()
+                    return
+                # Clients have nothing to say: ignore anything they send.
+                incoming = asyncio.ensure_future(receive())
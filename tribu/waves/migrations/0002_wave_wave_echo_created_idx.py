@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:32
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('echos', '0003_echo_echo_feed_idx_echo_echo_user_created_idx'),
+        ('waves', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='wave',
+            index=models.Index(fields=['echo', 'created_at', 'id'], name='wave_echo_created_idx'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:50
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('echos', '0004_timelineentry'),
+        ('waves', '0002_wave_wave_echo_created_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='wave',
+            index=models.Index(fields=['echo', '-updated_at'], name='wave_echo_updated_idx'),
+        ),
+    ]
@@ -1,7 +1,24 @@
 from django.db import models
 from django.conf import settings
 
-class Wave(models.Model):
+from shards.models import ShardedModel
+
+
+class WaveQuerySet(models.QuerySet):
+    def for_thread(self):
+        return self.select_related('user').only(
+            'content', 'created_at', 'updated_at', 'echo', 'user__username'
+        )
+
+
+class WaveManager(models.Manager.from_queryset(WaveQuerySet)):
+    def get_queryset(self):
+        # Waves of a deleted echo stay visible here until purged: they are
+        # only reachable through their (hidden) echo.
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
+class Wave(ShardedModel):
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -19,6 +36,26 @@ class Wave(models.Model):
         null=True,
     )
 
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    objects = WaveManager()
+    all_objects = WaveQuerySet.as_manager()
 
     def __str__(self):
         return f'Pk: {self.pk}'
+
+    class Meta:
+        indexes = [
+            # Waves of a thread, in creation order (and newest first on detail).
+            models.Index(fields=['echo', 'created_at', 'id'], name='wave_echo_created_idx'),
+            # Latest change in a thread, for the conditional GET validators.
+            models.Index(fields=['echo', '-updated_at'], name='wave_echo_updated_idx'),
+            # Admin changelist: newest first and its date hierarchy.
+            models.Index(fields=['-created_at', '-id'], name='wave_created_idx'),
+            # Rows waiting for `manage.py purge`, usually none.
+            models.Index(
+                fields=['deleted_at'],
+                name='wave_deleted_idx',
+                condition=models.Q(deleted_at__isnull=False),
+            ),
+        ]
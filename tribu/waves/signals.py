@@ -0,0 +1,31 @@
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from echos.models import Echo
+from users.models import Profile
+
+from .models import Wave
+
+
+@receiver(post_save, sender=Wave)
+def increment_wave_counters(sender, instance, created, raw=False, using=None, **kwargs):
+    # Fixtures (raw saves) are recounted in bulk with `manage.py recount`.
+    if created and not raw:
+        # The echo is on the wave's shard.
+        Echo.objects.db_manager(using).filter(pk=instance.echo_id).update(waves_count=F('waves_count') + 1)
+        Profile.objects.filter(user_id=instance.user_id).update(
+            waves_count=F('waves_count') + 1
+        )
+
+
+@receiver(post_delete, sender=Wave)
+def decrement_wave_counters(sender, instance, origin=None, using=None, **kwargs):
+    # When the whole echo is being deleted its counter goes away with it.
+    if not (isinstance(origin, Echo) and origin.pk == instance.echo_id):
+        Echo.objects.db_manager(using).filter(pk=instance.echo_id, waves_count__gt=0).update(
+            waves_count=F('waves_count') - 1
+        )
+    Profile.objects.filter(user_id=instance.user_id, waves_count__gt=0).update(
+        waves_count=F('waves_count') - 1
+    )
@@ -1,24 +1,29 @@
-from django.shortcuts import get_object_or_404, render, redirect
+from django.shortcuts import render, redirect
 from django.core.exceptions import PermissionDenied
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.db import transaction
 from .forms import EditWaveForm
+from . import live
+
+from shards import directory
 
-from echos.models import Echo
 from .models import Wave
 
 
 @login_required
 def edit_wave(request, wave_pk):
-    wave = get_object_or_404(Wave, pk=wave_pk)
-    if wave.user != request.user:
+    wave = directory.get_object_or_404(Wave.objects.select_related('echo', 'user'), pk=wave_pk)
+    if wave.user_id != request.user.pk:
         raise PermissionDenied
         
     echo = wave.echo
     if request.method == 'POST':
         if (form := EditWaveForm(request.POST, instance=wave)).is_valid():
             wave = form.save(commit=False)
-            wave.save()
+            with transaction.atomic(using=wave._state.db):
+                wave.save()
+                live.publish(live.EDITED, wave)
             messages.success(request, 'Wave updated successfully')  
             return redirect('echos:echo-detail', echo_pk=echo.pk)
     else:
@@ -28,12 +33,14 @@ def edit_wave(request, wave_pk):
 
 @login_required
 def delete_wave(request, wave_pk):
-    wave = get_object_or_404(Wave, pk=wave_pk)
-    if wave.user != request.user:
+    wave = directory.get_object_or_404(Wave.objects, pk=wave_pk)
+    if wave.user_id != request.user.pk:
         raise PermissionDenied
     
-    echo_pk = wave.echo.pk
-    wave.delete()
+    echo_pk = wave.echo_id
+    with transaction.atomic(using=wave._state.db):
+        live.publish(live.DELETED, wave)
+        wave.delete()
     messages.success(request, 'Wave deleted successfully')  
 
     return redirect('echos:echo-detail', echo_pk=echo_pk)